@@ -17,8 +17,15 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 from app.core.config import settings
 
 # Import Base and all models so Alembic can detect them
-from app.core.database import Base
-from app.models import Product, MachineState, Defect
+from app.core.database import Base, CONNECT_OPTIONS
+from app.models import (
+    Product,
+    MachineState,
+    Defect,
+    DatasetIngestion,
+    MachineHourlyRollup,
+    MachineDefectHourlyRollup,
+)
 
 # this is the Alembic Config object
 config = context.config
@@ -74,6 +81,8 @@ def run_migrations_online() -> None:
         configuration,
         prefix="sqlalchemy.",
         poolclass=pool.NullPool,
+        # Views and rollups bucket timestamps in the session time zone
+        connect_args={"options": CONNECT_OPTIONS},
     )
 
     with connectable.connect() as connection:
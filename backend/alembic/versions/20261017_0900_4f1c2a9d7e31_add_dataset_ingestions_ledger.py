@@ -0,0 +1,41 @@
+"""add dataset_ingestions ledger
+
+Revision ID: 4f1c2a9d7e31
+Revises: ebbb2c3e363a
+Create Date: 2026-10-17 09:00:00.000000+00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4f1c2a9d7e31'
+down_revision = 'ebbb2c3e363a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('dataset_ingestions',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('dataset_hash', sa.String(length=64), nullable=False),
+    sa.Column('source_url', sa.String(length=2048), nullable=True),
+    sa.Column('s3_uri', sa.String(length=512), nullable=True),
+    sa.Column('size_bytes', sa.BigInteger(), nullable=True),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('products', sa.Integer(), nullable=False),
+    sa.Column('machine_states', sa.Integer(), nullable=False),
+    sa.Column('defects', sa.Integer(), nullable=False),
+    sa.Column('started_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('loaded_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_dataset_ingestions_hash_status', 'dataset_ingestions', ['dataset_hash', 'status'], unique=False)
+    op.create_index('idx_dataset_ingestions_status_loaded', 'dataset_ingestions', ['status', 'loaded_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_dataset_ingestions_status_loaded', table_name='dataset_ingestions')
+    op.drop_index('idx_dataset_ingestions_hash_status', table_name='dataset_ingestions')
+    op.drop_table('dataset_ingestions')
@@ -0,0 +1,24 @@
+"""add load mode to dataset_ingestions
+
+Revision ID: 8a2d6e0b5c47
+Revises: 4f1c2a9d7e31
+Create Date: 2026-10-17 10:00:00.000000+00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8a2d6e0b5c47'
+down_revision = '4f1c2a9d7e31'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('dataset_ingestions', sa.Column('mode', sa.String(length=20), nullable=False, server_default='replace'))
+
+
+def downgrade() -> None:
+    op.drop_column('dataset_ingestions', 'mode')
@@ -0,0 +1,65 @@
+"""add hourly rollup tables
+
+Revision ID: c3e8b1f27a90
+Revises: 8a2d6e0b5c47
+Create Date: 2026-10-17 11:00:00.000000+00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3e8b1f27a90'
+down_revision = '8a2d6e0b5c47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('machine_hourly_rollups',
+    sa.Column('molding_machine_id', sa.String(length=50), nullable=False),
+    sa.Column('hour', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('total_products', sa.Integer(), nullable=False),
+    sa.Column('rejected_products', sa.Integer(), nullable=False),
+    sa.Column('defective_products', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('molding_machine_id', 'hour')
+    )
+    op.create_index('idx_machine_hourly_rollups_hour', 'machine_hourly_rollups', ['hour'], unique=False)
+
+    op.create_table('machine_defect_hourly_rollups',
+    sa.Column('molding_machine_id', sa.String(length=50), nullable=False),
+    sa.Column('defect_type', sa.String(length=50), nullable=False),
+    sa.Column('hour', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('defect_count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('molding_machine_id', 'defect_type', 'hour')
+    )
+    op.create_index('idx_machine_defect_hourly_rollups_hour', 'machine_defect_hourly_rollups', ['hour'], unique=False)
+
+    # Backfill from data loaded before rollups existed
+    op.execute("""
+        INSERT INTO machine_hourly_rollups
+            (molding_machine_id, hour, total_products, rejected_products, defective_products)
+        SELECT molding_machine_id,
+               date_trunc('hour', timestamp),
+               count(*),
+               sum(CASE WHEN overall_reject THEN 1 ELSE 0 END),
+               sum(CASE WHEN defect_count > 0 THEN 1 ELSE 0 END)
+        FROM products
+        GROUP BY molding_machine_id, date_trunc('hour', timestamp)
+    """)
+    op.execute("""
+        INSERT INTO machine_defect_hourly_rollups
+            (molding_machine_id, defect_type, hour, defect_count)
+        SELECT p.molding_machine_id, d.defect_type, date_trunc('hour', p.timestamp), count(*)
+        FROM defects d
+        JOIN products p ON p.id = d.product_id
+        GROUP BY p.molding_machine_id, d.defect_type, date_trunc('hour', p.timestamp)
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_machine_defect_hourly_rollups_hour', table_name='machine_defect_hourly_rollups')
+    op.drop_table('machine_defect_hourly_rollups')
+    op.drop_index('idx_machine_hourly_rollups_hour', table_name='machine_hourly_rollups')
+    op.drop_table('machine_hourly_rollups')
@@ -0,0 +1,27 @@
+"""cover defect_count in the products machine/timestamp index
+
+Revision ID: 5b7d9e4c1f63
+Revises: c3e8b1f27a90
+Create Date: 2026-10-17 12:00:00.000000+00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b7d9e4c1f63'
+down_revision = 'c3e8b1f27a90'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # The new index has the old one as its prefix, so it replaces it.
+    op.create_index('idx_products_machine_timestamp_defects', 'products', ['molding_machine_id', 'timestamp', 'defect_count'], unique=False)
+    op.drop_index('idx_products_machine_timestamp', table_name='products')
+
+
+def downgrade() -> None:
+    op.create_index('idx_products_machine_timestamp', 'products', ['molding_machine_id', 'timestamp'], unique=False)
+    op.drop_index('idx_products_machine_timestamp_defects', table_name='products')
@@ -0,0 +1,139 @@
+"""partition products, machine_states and defects by month
+
+Revision ID: 9e4a7c2b6d18
+Revises: 5b7d9e4c1f63
+Create Date: 2026-10-17 13:00:00.000000+00:00
+
+"""
+from datetime import date, datetime, timezone
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9e4a7c2b6d18'
+down_revision = '5b7d9e4c1f63'
+branch_labels = None
+depends_on = None
+
+# Parents first; each table's partition key.
+TABLES = {
+    'products': 'timestamp',
+    'machine_states': 'product_timestamp',
+    'defects': 'product_timestamp',
+}
+
+INDEXES = {
+    'products': [
+        ('idx_products_machine_timestamp_defects', ['molding_machine_id', 'timestamp', 'defect_count'], False),
+        ('idx_products_reject_timestamp', ['overall_reject', 'timestamp'], False),
+        ('ix_products_molding_machine_id', ['molding_machine_id'], False),
+        ('ix_products_overall_reject', ['overall_reject'], False),
+        ('ix_products_timestamp', ['timestamp'], False),
+        ('ix_products_version', ['version'], False),
+    ],
+    'machine_states': [
+        ('idx_machine_states_barrel_temps', ['barrel_1', 'barrel_2', 'barrel_3'], False),
+        ('idx_machine_states_cycle_time', ['cycle_time'], False),
+        ('idx_machine_states_shot_count', ['shot_count'], False),
+    ],
+    'defects': [
+        ('idx_defects_product_type', ['product_id', 'defect_type'], False),
+        ('idx_defects_severity', ['pixel_severity_value'], False),
+        ('idx_defects_type_reject', ['defect_type', 'reject'], False),
+        ('ix_defects_defect_type', ['defect_type'], False),
+        ('ix_defects_product_id', ['product_id'], False),
+        ('ix_defects_reject', ['reject'], False),
+    ],
+}
+
+
+def _next_month(month):
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def _months():
+    """Every month holding a product, plus the current one."""
+    first, last = op.get_bind().execute(sa.text('SELECT min(timestamp), max(timestamp) FROM products')).one()
+    now = datetime.now(timezone.utc)
+    month = date((first or now).year, (first or now).month, 1)
+    end = max(date((last or now).year, (last or now).month, 1), date(now.year, now.month, 1))
+
+    months = []
+    while month <= end:
+        months.append(month)
+        month = _next_month(month)
+    return months
+
+
+def _swap_in(new_suffix):
+    """Move sequences to the new tables, drop the old ones and take their names."""
+    for table in TABLES:
+        op.execute(f'ALTER SEQUENCE {table}_id_seq OWNED BY {table}{new_suffix}.id')
+    for table in reversed(list(TABLES)):
+        op.execute(f'DROP TABLE {table}')
+    for table in TABLES:
+        op.rename_table(f'{table}{new_suffix}', table)
+
+
+def upgrade() -> None:
+    for table, key in TABLES.items():
+        extra = '' if table == 'products' else ', product_timestamp TIMESTAMP WITH TIME ZONE NOT NULL'
+        op.execute(
+            f'CREATE TABLE {table}_partitioned (LIKE {table} INCLUDING DEFAULTS{extra}) '
+            f'PARTITION BY RANGE ({key})'
+        )
+
+    # Partitions are named after the final parent so the rename leaves them right
+    for month in _months():
+        bounds = f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_next_month(month).isoformat()}')"
+        for table in TABLES:
+            op.execute(f'CREATE TABLE {table}_{month:%Y_%m} PARTITION OF {table}_partitioned {bounds}')
+
+    op.execute('INSERT INTO products_partitioned SELECT * FROM products')
+    for table in ('machine_states', 'defects'):
+        op.execute(
+            f'INSERT INTO {table}_partitioned '
+            f'SELECT {table}.*, products.timestamp FROM {table} '
+            f'JOIN products ON products.id = {table}.product_id'
+        )
+
+    _swap_in('_partitioned')
+
+    op.create_primary_key('products_pkey', 'products', ['id', 'timestamp'])
+    for table in ('machine_states', 'defects'):
+        op.create_primary_key(f'{table}_pkey', table, ['id', 'product_timestamp'])
+        op.create_foreign_key(
+            f'{table}_product_id_fkey', table, 'products',
+            ['product_id', 'product_timestamp'], ['id', 'timestamp'], ondelete='CASCADE',
+        )
+    op.create_index('uq_machine_states_product', 'machine_states', ['product_id', 'product_timestamp'], unique=True)
+    for table, indexes in INDEXES.items():
+        for name, columns, unique in indexes:
+            op.create_index(name, table, columns, unique=unique)
+        op.execute(f'ANALYZE {table}')
+
+
+def downgrade() -> None:
+    for table in TABLES:
+        op.execute(f'CREATE TABLE {table}_unpartitioned (LIKE {table} INCLUDING DEFAULTS)')
+        op.execute(f'INSERT INTO {table}_unpartitioned SELECT * FROM {table}')
+        if table != 'products':
+            op.drop_column(f'{table}_unpartitioned', 'product_timestamp')
+
+    # Dropping a partitioned table drops its partitions with it
+    _swap_in('_unpartitioned')
+
+    for table in TABLES:
+        op.create_primary_key(f'{table}_pkey', table, ['id'])
+    for table in ('machine_states', 'defects'):
+        op.create_foreign_key(
+            f'{table}_product_id_fkey', table, 'products',
+            ['product_id'], ['id'], ondelete='CASCADE',
+        )
+    op.create_index('ix_machine_states_product_id', 'machine_states', ['product_id'], unique=True)
+    for table, indexes in INDEXES.items():
+        for name, columns, unique in indexes:
+            op.create_index(name, table, columns, unique=unique)
+        op.execute(f'ANALYZE {table}')
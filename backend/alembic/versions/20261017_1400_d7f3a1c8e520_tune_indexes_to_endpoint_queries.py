@@ -0,0 +1,67 @@
+"""replace unused indexes with BRIN and covering indexes
+
+Revision ID: d7f3a1c8e520
+Revises: 9e4a7c2b6d18
+Create Date: 2026-10-17 14:00:00.000000+00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd7f3a1c8e520'
+down_revision = '9e4a7c2b6d18'
+branch_labels = None
+depends_on = None
+
+# No endpoint filters or sorts on these (see scripts/audit_indexes.py);
+# ix_products_molding_machine_id is a prefix of the machine/timestamp index.
+UNUSED_INDEXES = {
+    'products': [
+        ('idx_products_reject_timestamp', ['overall_reject', 'timestamp'], False),
+        ('ix_products_molding_machine_id', ['molding_machine_id'], False),
+        ('ix_products_overall_reject', ['overall_reject'], False),
+        ('ix_products_timestamp', ['timestamp'], False),
+        ('ix_products_version', ['version'], False),
+    ],
+    'machine_states': [
+        ('idx_machine_states_barrel_temps', ['barrel_1', 'barrel_2', 'barrel_3'], False),
+        ('idx_machine_states_cycle_time', ['cycle_time'], False),
+        ('idx_machine_states_shot_count', ['shot_count'], False),
+    ],
+    'defects': [
+        ('idx_defects_product_type', ['product_id', 'defect_type'], False),
+        ('idx_defects_severity', ['pixel_severity_value'], False),
+        ('idx_defects_type_reject', ['defect_type', 'reject'], False),
+        ('ix_defects_defect_type', ['defect_type'], False),
+        ('ix_defects_product_id', ['product_id'], False),
+        ('ix_defects_reject', ['reject'], False),
+    ],
+}
+
+
+def upgrade() -> None:
+    op.create_index('idx_products_timestamp_id', 'products', ['timestamp', 'id'], unique=False)
+    op.create_index('brin_products_timestamp', 'products', ['timestamp'], unique=False, postgresql_using='brin')
+    op.create_index('idx_defects_product_covering', 'defects', ['product_id', 'product_timestamp'], unique=False, postgresql_include=['defect_type'])
+
+    op.drop_index('uq_machine_states_product', table_name='machine_states')
+    op.create_index('uq_machine_states_product', 'machine_states', ['product_id', 'product_timestamp'], unique=True, postgresql_include=['cycle_time'])
+
+    for table, indexes in UNUSED_INDEXES.items():
+        for name, _, _ in indexes:
+            op.drop_index(name, table_name=table)
+
+
+def downgrade() -> None:
+    for table, indexes in UNUSED_INDEXES.items():
+        for name, columns, unique in indexes:
+            op.create_index(name, table, columns, unique=unique)
+
+    op.drop_index('uq_machine_states_product', table_name='machine_states')
+    op.create_index('uq_machine_states_product', 'machine_states', ['product_id', 'product_timestamp'], unique=True)
+
+    op.drop_index('idx_defects_product_covering', table_name='defects')
+    op.drop_index('brin_products_timestamp', table_name='products')
+    op.drop_index('idx_products_timestamp_id', table_name='products')
@@ -0,0 +1,39 @@
+"""copy the product machine onto defects
+
+Revision ID: a6c2e9f14b37
+Revises: d7f3a1c8e520
+Create Date: 2026-10-17 15:00:00.000000+00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6c2e9f14b37'
+down_revision = 'd7f3a1c8e520'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # defects.product_timestamp already copies the product timestamp
+    op.add_column('defects', sa.Column('molding_machine_id', sa.String(length=50), nullable=True))
+    op.execute("""
+        UPDATE defects
+        SET molding_machine_id = products.molding_machine_id
+        FROM products
+        WHERE products.id = defects.product_id
+          AND products.timestamp = defects.product_timestamp
+    """)
+    op.alter_column('defects', 'molding_machine_id', nullable=False)
+
+    op.create_index('idx_defects_machine_timestamp', 'defects', ['molding_machine_id', 'product_timestamp'], unique=False, postgresql_include=['defect_type', 'product_id'])
+    op.create_index('brin_defects_product_timestamp', 'defects', ['product_timestamp'], unique=False, postgresql_using='brin')
+    op.execute('ANALYZE defects')
+
+
+def downgrade() -> None:
+    op.drop_index('brin_defects_product_timestamp', table_name='defects')
+    op.drop_index('idx_defects_machine_timestamp', table_name='defects')
+    op.drop_column('defects', 'molding_machine_id')
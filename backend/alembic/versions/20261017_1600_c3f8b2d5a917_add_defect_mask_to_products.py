@@ -0,0 +1,61 @@
+"""add the defect bitmask to products
+
+Revision ID: c3f8b2d5a917
+Revises: a6c2e9f14b37
+Create Date: 2026-10-17 16:00:00.000000+00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3f8b2d5a917'
+down_revision = 'a6c2e9f14b37'
+branch_labels = None
+depends_on = None
+
+# defect_registry.DEFECT_TYPES as of this revision; a type's position is its bit.
+DEFECT_TYPES = (
+    "discoloration_defect",
+    "discoloration_patch_defect",
+    "flash_defect",
+    "short_defect",
+    "contamination_defect",
+    "splay_defect",
+    "burn_mark_defect",
+    "jetting_defect",
+    "flow_mark_defect",
+    "sink_mark_defect",
+    "knit_line_defect",
+    "void_defect",
+    "ejector_pin_mark_defect",
+)
+
+
+def upgrade() -> None:
+    op.add_column('products', sa.Column('defect_mask', sa.Integer(), nullable=False, server_default='0'))
+
+    bits = "\n".join(
+        f"            WHEN '{defect_type}' THEN {1 << bit}"
+        for bit, defect_type in enumerate(DEFECT_TYPES)
+    )
+    op.execute(f"""
+        UPDATE products
+        SET defect_mask = m.mask
+        FROM (
+            SELECT product_id, product_timestamp, bit_or(CASE defect_type
+{bits}
+            ELSE 0 END) AS mask
+            FROM defects
+            GROUP BY product_id, product_timestamp
+        ) AS m
+        WHERE products.id = m.product_id
+          AND products.timestamp = m.product_timestamp
+    """)
+    op.alter_column('products', 'defect_mask', server_default=None)
+    op.execute('ANALYZE products')
+
+
+def downgrade() -> None:
+    op.drop_column('products', 'defect_mask')
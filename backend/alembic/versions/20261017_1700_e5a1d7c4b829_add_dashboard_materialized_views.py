@@ -0,0 +1,57 @@
+"""add materialized views for the default dashboard
+
+Revision ID: e5a1d7c4b829
+Revises: c3f8b2d5a917
+Create Date: 2026-10-17 17:00:00.000000+00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a1d7c4b829'
+down_revision = 'c3f8b2d5a917'
+branch_labels = None
+depends_on = None
+
+# materialized_views.VIEW_QUERIES as of this revision, with each view's unique key.
+VIEWS = {
+    'mv_machine_comparison': ("""
+        SELECT molding_machine_id,
+               count(*) AS total_products,
+               sum(CASE WHEN overall_reject THEN 1 ELSE 0 END) AS rejected_products
+        FROM products
+        GROUP BY molding_machine_id""", 'molding_machine_id'),
+    'mv_machine_defect_heatmap': ("""
+        SELECT molding_machine_id, defect_type, count(*) AS defect_count
+        FROM defects
+        GROUP BY molding_machine_id, defect_type""", 'molding_machine_id, defect_type'),
+    'mv_daily_defect_rate': ("""
+        SELECT date_trunc('day', timestamp) AS day,
+               molding_machine_id,
+               count(*) AS total_products,
+               sum(CASE WHEN overall_reject THEN 1 ELSE 0 END) AS rejected_products
+        FROM products
+        GROUP BY 1, 2""", 'day, molding_machine_id'),
+}
+
+
+def upgrade() -> None:
+    op.add_column('dataset_ingestions', sa.Column('views_refreshed_at', sa.DateTime(timezone=True), nullable=True))
+
+    for name, (query, key) in VIEWS.items():
+        op.execute(f"CREATE MATERIALIZED VIEW IF NOT EXISTS {name} AS {query} WITH DATA")
+        op.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS uq_{name} ON {name} ({key})")
+
+    # The views were just built from the current data
+    op.execute("""
+        UPDATE dataset_ingestions SET views_refreshed_at = now()
+        WHERE id = (SELECT max(id) FROM dataset_ingestions WHERE status IN ('completed', 'failed'))
+    """)
+
+
+def downgrade() -> None:
+    for name in reversed(list(VIEWS)):
+        op.execute(f"DROP MATERIALIZED VIEW IF EXISTS {name}")
+    op.drop_column('dataset_ingestions', 'views_refreshed_at')
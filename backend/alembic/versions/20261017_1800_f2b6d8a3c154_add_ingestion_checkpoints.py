@@ -0,0 +1,37 @@
+"""add per-shard ingestion checkpoints
+
+Revision ID: f2b6d8a3c154
+Revises: e5a1d7c4b829
+Create Date: 2026-10-17 18:00:00.000000+00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2b6d8a3c154'
+down_revision = 'e5a1d7c4b829'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('ingestion_checkpoints',
+    sa.Column('ingestion_id', sa.Integer(), nullable=False),
+    sa.Column('shard_index', sa.Integer(), nullable=False),
+    sa.Column('byte_offset', sa.BigInteger(), nullable=False),
+    sa.Column('products', sa.Integer(), nullable=False),
+    sa.Column('machine_states', sa.Integer(), nullable=False),
+    sa.Column('defects', sa.Integer(), nullable=False),
+    sa.Column('updated', sa.Integer(), nullable=False),
+    sa.Column('unchanged', sa.Integer(), nullable=False),
+    sa.Column('first_timestamp', sa.Float(), nullable=True),
+    sa.Column('last_timestamp', sa.Float(), nullable=True),
+    sa.ForeignKeyConstraint(['ingestion_id'], ['dataset_ingestions.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('ingestion_id', 'shard_index')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('ingestion_checkpoints')
@@ -2,16 +2,25 @@
 Analytics API endpoints for manufacturing quality data.
 Location: backend/app/api/endpoints/analytics.py
 """
+import logging
+import math
+import random
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 from fastapi import APIRouter, Depends, Query, HTTPException
-from sqlalchemy import func, case, text
-from sqlalchemy.orm import Session
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Float, and_, func, case, cast, select, text
+from sqlalchemy.orm import Session, aliased, joinedload, selectinload, sessionmaker
 
-from app.core.database import get_db
+from app.core.cache import ResponseCache, create_backend
+from app.core.config import settings
+from app.core.database import SessionLocal, get_db, get_session_factory
 from app.models.product import Product
-from app.models.defect import Defect
 from app.models.machine_state import MachineState
+from app.models.hourly_rollups import MachineHourlyRollup, MachineDefectHourlyRollup
+from app.services import defect_registry, ingestion_ledger, materialized_views, product_export, rollups
+from app.services.hot_store import HeatmapRow, HotStore, top_defect_rows
 from app.schemas.analytics import (
     DefectRateTrendResponse,
     DefectRateDataPoint,
@@ -19,15 +28,32 @@ from app.schemas.analytics import (
     HeatmapCell
 )
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(prefix="/analytics", tags=["analytics"])
 
+response_cache = ResponseCache(
+    create_backend(),
+    version_loader=ingestion_ledger.dataset_version,
+    version_ttl=settings.CACHE_VERSION_CHECK_SECONDS,
+    enabled=settings.CACHE_ENABLED,
+)
+
+hot_store = HotStore(
+    SessionLocal,
+    version_loader=response_cache.version,
+    days=settings.HOT_STORE_DAYS,
+    enabled=settings.HOT_STORE_ENABLED,
+)
+
 
 # ============================================================================
 # DEFECT RATE TREND (Time Series Line Chart)
 # ============================================================================
 
 @router.get("/defect-rate-trend", response_model=DefectRateTrendResponse)
-async def get_defect_rate_trend(
+@response_cache.cached("defect-rate-trend")
+def get_defect_rate_trend(
     db: Session = Depends(get_db),
     start_date: Optional[datetime] = Query(None, description="Start date (ISO format)"),
     end_date: Optional[datetime] = Query(None, description="End date (ISO format)"),
@@ -46,33 +72,66 @@ async def get_defect_rate_trend(
     - Uses PostgreSQL date_trunc() for time bucketing
     - Aggregates reject counts
     - Calculates rate as rejected/total
+    - Sums the daily materialized view when there is no date filter and
+      the interval is a day or a week
+    - Sums hourly rollups instead of scanning products when the date
+      filters fall on hour boundaries
+    - Answered from the in-process hot store, without SQL, when the window
+      lies within it
     """
 
-    # Build base query with time truncation
-    trunc_format = {
-        "hour": "hour",
-        "day": "day",
-        "week": "week"
-    }[interval]
-
-    query = db.query(
-        func.date_trunc(trunc_format, Product.timestamp).label("time_bucket"),
-        func.count(Product.id).label("total"),
-        func.sum(case((Product.overall_reject == True, 1), else_=0)).label("rejected")
-    )
-
-    # Apply filters
-    if start_date:
-        query = query.filter(Product.timestamp >= start_date)
-    if end_date:
-        query = query.filter(Product.timestamp <= end_date)
-    if machine_id:
-        query = query.filter(Product.molding_machine_id == machine_id)
-
-    # Group and order
-    query = query.group_by("time_bucket").order_by("time_bucket")
-
-    results = query.all()
+    snapshot = hot_store.covering(db, start_date)
+    if snapshot is not None:
+        results = snapshot.defect_rate_trend(interval, start_date, end_date, machine_id)
+    else:
+        # Build base query with time truncation
+        trunc_format = {
+            "hour": "hour",
+            "day": "day",
+            "week": "week"
+        }[interval]
+
+        daily = materialized_views.daily_defect_rate
+        if (
+            start_date is None and end_date is None and interval != "hour"
+            and materialized_views.available(db)
+        ):
+            time_column = daily.c.day
+            machine_column = daily.c.molding_machine_id
+            query = db.query(
+                func.date_trunc(trunc_format, daily.c.day).label("time_bucket"),
+                func.sum(daily.c.total_products).label("total"),
+                func.sum(daily.c.rejected_products).label("rejected")
+            )
+        elif rollups.available(db) and rollups.is_hour_aligned(start_date, end_date):
+            time_column = MachineHourlyRollup.hour
+            machine_column = MachineHourlyRollup.molding_machine_id
+            query = db.query(
+                func.date_trunc(trunc_format, MachineHourlyRollup.hour).label("time_bucket"),
+                func.sum(MachineHourlyRollup.total_products).label("total"),
+                func.sum(MachineHourlyRollup.rejected_products).label("rejected")
+            )
+        else:
+            time_column = Product.timestamp
+            machine_column = Product.molding_machine_id
+            query = db.query(
+                func.date_trunc(trunc_format, Product.timestamp).label("time_bucket"),
+                func.count(Product.id).label("total"),
+                func.sum(case((Product.overall_reject == True, 1), else_=0)).label("rejected")
+            )
+
+        # Apply filters
+        if start_date:
+            query = query.filter(time_column >= start_date)
+        if end_date:
+            query = query.filter(time_column <= end_date)
+        if machine_id:
+            query = query.filter(machine_column == machine_id)
+
+        # Group and order
+        query = query.group_by("time_bucket").order_by("time_bucket")
+
+        results = query.all()
 
     # Transform to response format
     data_points = []
@@ -104,12 +163,14 @@ async def get_defect_rate_trend(
 
 
 
+
 # ============================================================================
 # MACHINE-DEFECT HEATMAP (Machine × Defect Type)
 # ============================================================================
 
 @router.get("/machine-defect-heatmap")
-async def get_machine_defect_heatmap(
+@response_cache.cached("machine-defect-heatmap")
+def get_machine_defect_heatmap(
     db: Session = Depends(get_db),
     start_date: Optional[datetime] = Query(None),
     end_date: Optional[datetime] = Query(None)
@@ -119,22 +180,60 @@ async def get_machine_defect_heatmap(
     Much more actionable than arbitrary product IDs!
 
     Example insight: "Machine 2 produces 80% of all flash defects → check mold clamping"
-    """
 
-    query = db.query(
-        Product.molding_machine_id,
-        Defect.defect_type,
-        func.count(Defect.id).label("count")
-    ).join(Product, Defect.product_id == Product.id)
-
-    # Apply filters
-    if start_date:
-        query = query.filter(Product.timestamp >= start_date)
-    if end_date:
-        query = query.filter(Product.timestamp <= end_date)
+    Counts come from each product's defect bitmask in a single scan of
+    products, or from hourly rollups when the date filters fall on hour
+    boundaries. Without date filters they are read from a materialized
+    view. Answered from the in-process hot store, without SQL, when the
+    window lies within it.
+    """
 
-    query = query.group_by(Product.molding_machine_id, Defect.defect_type)
-    results = query.all()
+    snapshot = hot_store.covering(db, start_date)
+    if snapshot is not None:
+        results = snapshot.machine_defect_heatmap(start_date, end_date)
+    else:
+        if start_date is None and end_date is None and materialized_views.available(db):
+            view = materialized_views.machine_defect_heatmap
+            results = [
+                HeatmapRow(row.molding_machine_id, row.defect_type, int(row.defect_count))
+                for row in db.execute(
+                    select(view).order_by(view.c.molding_machine_id, view.c.defect_type)
+                )
+            ]
+        elif rollups.available(db) and rollups.is_hour_aligned(start_date, end_date):
+            query = db.query(
+                MachineDefectHourlyRollup.molding_machine_id,
+                MachineDefectHourlyRollup.defect_type,
+                func.sum(MachineDefectHourlyRollup.defect_count).label("count")
+            )
+            if start_date:
+                query = query.filter(MachineDefectHourlyRollup.hour >= start_date)
+            if end_date:
+                query = query.filter(MachineDefectHourlyRollup.hour <= end_date)
+
+            query = query.group_by(
+                MachineDefectHourlyRollup.molding_machine_id,
+                MachineDefectHourlyRollup.defect_type
+            )
+            results = query.all()
+        else:
+            # One pass over products: a count per defect bit, per machine
+            query = db.query(
+                Product.molding_machine_id,
+                *defect_registry.sql_type_counts(Product.defect_mask)
+            ).filter(Product.defect_mask != 0)
+            if start_date:
+                query = query.filter(Product.timestamp >= start_date)
+            if end_date:
+                query = query.filter(Product.timestamp <= end_date)
+
+            query = query.group_by(Product.molding_machine_id).order_by(Product.molding_machine_id)
+            results = [
+                HeatmapRow(row.molding_machine_id, defect_type, int(count))
+                for row in query
+                for defect_type, count in sorted(zip(defect_registry.DEFECT_TYPES, row[1:]))
+                if count
+            ]
 
     if not results:
         return {
@@ -180,7 +279,7 @@ async def get_machine_defect_heatmap(
 # ============================================================================
 
 @router.get("/product/{product_id}/defects")
-async def get_product_defects(
+def get_product_defects(
     product_id: int,
     db: Session = Depends(get_db)
 ):
@@ -190,18 +289,15 @@ async def get_product_defects(
     Used when clicking a heatmap cell to show details in a modal.
     """
 
-    # Get product info
-    product = db.query(Product).filter(Product.id == product_id).first()
+    product = db.query(Product).options(
+        joinedload(Product.machine_state),
+        selectinload(Product.defects),
+    ).filter(Product.id == product_id).first()
     if not product:
         return {"error": "Product not found"}
 
-    # Get all defects for this product
-    defects = db.query(Defect).filter(Defect.product_id == product_id).all()
-
-    # Get machine state
-    machine_state = db.query(MachineState).filter(
-        MachineState.product_id == product_id
-    ).first()
+    defects = product.defects
+    machine_state = product.machine_state
 
     return {
         "product": {
@@ -226,12 +322,73 @@ async def get_product_defects(
     }
 
 
+MAX_DETAIL_PRODUCTS = 500
+
+
+@router.get("/products/details")
+def get_products_details(
+    db: Session = Depends(get_db),
+    ids: List[int] = Query(..., description="Product ids, e.g. ?ids=1&ids=2")
+):
+    """
+    Product, defects and full machine state for many products at once.
+
+    For clients listing many products, instead of one
+    /product/{product_id}/defects request per product. Products come back
+    in the order requested; unknown ids are listed in ``missing``.
+
+    **Query Pattern:**
+    - Two queries whatever the number of ids: products joined to their
+      machine state, then every defect for those products via selectinload
+    """
+    if len(ids) > MAX_DETAIL_PRODUCTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {MAX_DETAIL_PRODUCTS} product ids per request"
+        )
+
+    unique_ids = list(dict.fromkeys(ids))
+    products = {
+        product.id: product
+        for product in db.query(Product).options(
+            joinedload(Product.machine_state),
+            selectinload(Product.defects),
+        ).filter(Product.id.in_(unique_ids))
+    }
+
+    return {
+        "products": [
+            {
+                "product": {
+                    "id": product.id,
+                    "timestamp": product.timestamp,
+                    "machine_id": product.molding_machine_id,
+                    "overall_reject": product.overall_reject,
+                    "defect_count": len(product.defects)
+                },
+                "defects": [
+                    {
+                        "defect_type": d.defect_type,
+                        "severity": d.pixel_severity_value,
+                        "reject": d.reject
+                    }
+                    for d in product.defects
+                ],
+                "machine_state": product.machine_state.to_dict() if product.machine_state else None
+            }
+            for product in (products[product_id] for product_id in unique_ids if product_id in products)
+        ],
+        "missing": [product_id for product_id in unique_ids if product_id not in products]
+    }
+
+
 # ============================================================================
 # TOP DEFECTS (Bar Chart)
 # ============================================================================
 
 @router.get("/top-defects")
-async def get_top_defects(
+@response_cache.cached("top-defects")
+def get_top_defects(
     db: Session = Depends(get_db),
     start_date: Optional[datetime] = Query(None),
     end_date: Optional[datetime] = Query(None),
@@ -240,35 +397,84 @@ async def get_top_defects(
 ):
     """
     Get top N most common defect types with counts and percentages.
-    """
-
-    # Build base query
-    query = db.query(
-        Defect.defect_type,
-        func.count(Defect.id).label("count")
-    ).join(Product, Defect.product_id == Product.id)
 
-    # Apply filters
-    if start_date:
-        query = query.filter(Product.timestamp >= start_date)
-    if end_date:
-        query = query.filter(Product.timestamp <= end_date)
-    if machine_id:
-        query = query.filter(Product.molding_machine_id == machine_id)
-
-    # Group and order
-    query = query.group_by(Defect.defect_type).order_by(func.count(Defect.id).desc()).limit(limit)
-
-    results = query.all()
+    **Query Pattern:**
+    - One pass over the filtered products: a count per bit of
+      defect_mask, plus the count of products with any defect; ranking
+      and the total over all types happen in Python
+    - Reads hourly rollups instead when the date filters fall on hour
+      boundaries, in one statement with a window sum for total_defects
+    - Answered from the in-process hot store, without SQL, when the window
+      lies within it
+    """
 
-    # Calculate totals for percentages
-    total_defects = sum(r.count for r in results)
-    affected_products = db.query(func.count(func.distinct(Defect.product_id))).scalar()
+    snapshot = hot_store.covering(db, start_date)
+    if snapshot is not None:
+        results = snapshot.top_defects(limit, start_date, end_date, machine_id)
+    else:
+        if rollups.available(db) and rollups.is_hour_aligned(start_date, end_date):
+            filters = []
+            if start_date:
+                filters.append(MachineDefectHourlyRollup.hour >= start_date)
+            if end_date:
+                filters.append(MachineDefectHourlyRollup.hour <= end_date)
+            if machine_id:
+                filters.append(MachineDefectHourlyRollup.molding_machine_id == machine_id)
+
+            per_type = select(
+                MachineDefectHourlyRollup.defect_type,
+                func.sum(MachineDefectHourlyRollup.defect_count).label("count")
+            ).where(*filters).group_by(MachineDefectHourlyRollup.defect_type).cte("per_type")
+
+            product_filters = []
+            if start_date:
+                product_filters.append(MachineHourlyRollup.hour >= start_date)
+            if end_date:
+                product_filters.append(MachineHourlyRollup.hour <= end_date)
+            if machine_id:
+                product_filters.append(MachineHourlyRollup.molding_machine_id == machine_id)
+
+            affected = select(
+                func.coalesce(func.sum(MachineHourlyRollup.defective_products), 0)
+            ).where(*product_filters).scalar_subquery()
+
+            # The window total is computed before LIMIT, so it covers every type
+            query = select(
+                per_type.c.defect_type,
+                per_type.c.count,
+                func.sum(per_type.c.count).over().label("total_defects"),
+                affected.label("affected_products")
+            ).order_by(per_type.c.count.desc(), per_type.c.defect_type).limit(limit)
+
+            results = db.execute(query).all()
+        else:
+            # One pass over products: a count per defect bit
+            query = select(
+                *defect_registry.sql_type_counts(Product.defect_mask),
+                func.count().label("affected_products")
+            ).where(Product.defect_mask != 0)
+            if start_date:
+                query = query.where(Product.timestamp >= start_date)
+            if end_date:
+                query = query.where(Product.timestamp <= end_date)
+            if machine_id:
+                query = query.where(Product.molding_machine_id == machine_id)
+
+            row = db.execute(query).one()
+            results = top_defect_rows(
+                {defect_type: row._mapping[defect_type] or 0 for defect_type in defect_registry.DEFECT_TYPES},
+                row.affected_products,
+                limit,
+            )
+
+    # Every path reports totals over all types, not just the top ``limit``
+    total_defects = int(results[0].total_defects) if results else 0
+    affected_products = int(results[0].affected_products) if results else 0
 
     defects = [
         {
             "defect_type": r.defect_type,
-            "count": r.count,
+            "count": int(r.count),
             "percentage": (r.count / total_defects * 100) if total_defects > 0 else 0
         }
         for r in results
@@ -279,7 +485,7 @@ async def get_top_defects(
         "summary": {
             "total_defects": total_defects,
             "most_common": defects[0]["defect_type"] if defects else "N/A",
-            "affected_products": affected_products or 0
+            "affected_products": affected_products
         }
     }
 
@@ -289,18 +495,41 @@ async def get_top_defects(
 # ============================================================================
 
 @router.get("/machine-comparison")
-async def get_machine_comparison(db: Session = Depends(get_db)):
+@response_cache.cached("machine-comparison")
+def get_machine_comparison(db: Session = Depends(get_db)):
     """
     Compare performance across all machines.
+
+    Answered from the in-process hot store when it holds all data, else
+    read from a materialized view refreshed after each load, or summed
+    from hourly rollups until the view has caught up with the latest load.
     """
 
-    query = db.query(
-        Product.molding_machine_id,
-        func.count(Product.id).label("total"),
-        func.sum(case((Product.overall_reject == True, 1), else_=0)).label("rejected")
-    ).group_by(Product.molding_machine_id)
+    snapshot = hot_store.covering(db, None)
+    if snapshot is not None:
+        results = snapshot.machine_comparison()
+    else:
+        if materialized_views.available(db):
+            view = materialized_views.machine_comparison
+            query = db.query(
+                view.c.molding_machine_id,
+                view.c.total_products.label("total"),
+                view.c.rejected_products.label("rejected")
+            )
+        elif rollups.available(db):
+            query = db.query(
+                MachineHourlyRollup.molding_machine_id,
+                func.sum(MachineHourlyRollup.total_products).label("total"),
+                func.sum(MachineHourlyRollup.rejected_products).label("rejected")
+            ).group_by(MachineHourlyRollup.molding_machine_id)
+        else:
+            query = db.query(
+                Product.molding_machine_id,
+                func.count(Product.id).label("total"),
+                func.sum(case((Product.overall_reject == True, 1), else_=0)).label("rejected")
+            ).group_by(Product.molding_machine_id)
 
-    results = query.all()
+        results = query.all()
 
     machines = [
         {
@@ -321,7 +550,8 @@ async def get_machine_comparison(db: Session = Depends(get_db)):
 # ============================================================================
 
 @router.get("/defect-distribution")
-async def get_defect_distribution(
+@response_cache.cached("defect-distribution")
+def get_defect_distribution(
     db: Session = Depends(get_db),
     start_date: Optional[datetime] = Query(None),
     end_date: Optional[datetime] = Query(None),
@@ -331,45 +561,45 @@ async def get_defect_distribution(
     Get distribution of products by defect count (0, 1, 2, 3, 4, 5+ defects).
     Much more useful than simple accept/reject pie chart.
     Shows: How many products have exactly N defects?
-    """
 
-    # Subquery to count defects per product
-    defect_counts = db.query(
-        Product.id,
-        func.count(Defect.id).label("defect_count")
-    ).outerjoin(Defect, Product.id == Defect.product_id)
+    **Query Pattern:**
+    - Buckets the denormalized products.defect_count server-side (5+ folded
+      into one bucket) in a single GROUP BY; the defects table is not read
+    - idx_products_machine_timestamp_defects covers the filter columns and
+      defect_count, so PostgreSQL can answer with an index-only scan
+    - Answered from the in-process hot store, without SQL, when the window
+      lies within it
+    """
 
-    # Apply filters
-    if start_date:
-        defect_counts = defect_counts.filter(Product.timestamp >= start_date)
-    if end_date:
-        defect_counts = defect_counts.filter(Product.timestamp <= end_date)
-    if machine_id:
-        defect_counts = defect_counts.filter(Product.molding_machine_id == machine_id)
+    snapshot = hot_store.covering(db, start_date)
+    if snapshot is not None:
+        results = snapshot.defect_distribution(start_date, end_date, machine_id)
+    else:
+        bucket = case((Product.defect_count >= 5, 5), else_=Product.defect_count).label("bucket")
 
-    defect_counts = defect_counts.group_by(Product.id).subquery()
+        distribution_query = db.query(
+            bucket,
+            func.count().label("product_count")
+        )
 
-    # Count how many products fall into each bucket
-    distribution_query = db.query(
-        defect_counts.c.defect_count,
-        func.count(defect_counts.c.id).label("product_count")
-    ).group_by(defect_counts.c.defect_count).order_by(defect_counts.c.defect_count)
+        # Apply filters
+        if start_date:
+            distribution_query = distribution_query.filter(Product.timestamp >= start_date)
+        if end_date:
+            distribution_query = distribution_query.filter(Product.timestamp <= end_date)
+        if machine_id:
+            distribution_query = distribution_query.filter(Product.molding_machine_id == machine_id)
 
-    results = distribution_query.all()
+        results = distribution_query.group_by(bucket).all()
 
     # Build buckets: 0, 1, 2, 3, 4, 5+
     buckets = {0: 0, 1: 0, 2: 0, 3: 0, 4: 0, '5+': 0}
     total_products = 0
 
     for row in results:
-        count = row.defect_count
         product_count = row.product_count
         total_products += product_count
-
-        if count >= 5:
-            buckets['5+'] += product_count
-        else:
-            buckets[count] = product_count
+        buckets['5+' if row.bucket >= 5 else row.bucket] = product_count
 
     # Convert to list format
     distribution = [
@@ -391,92 +621,215 @@ async def get_defect_distribution(
 # CYCLE TIME SCATTER (Correlation Analysis)
 # ============================================================================
 
+# TABLESAMPLE SYSTEM picks whole pages, so matches are clumpy and the
+# filters drop part of the sample; ask for more than the point budget.
+_TABLESAMPLE_OVERSAMPLE = 2.0
+
+# Random and stratified samples keep each row with a fixed probability,
+# sized so a stratum almost surely yields at least its quota; the surplus
+# is dropped in Python.
+_SAMPLE_OVERSAMPLE = 2.0
+_SAMPLE_SLACK = 10
+
+
 @router.get("/cycle-time-scatter")
-async def get_cycle_time_scatter(
+@response_cache.cached("cycle-time-scatter")
+def get_cycle_time_scatter(
     db: Session = Depends(get_db),
     start_date: Optional[datetime] = Query(None),
     end_date: Optional[datetime] = Query(None),
     machine_id: Optional[str] = Query(None),
-    limit: int = Query(500, ge=100, le=2000)
+    limit: int = Query(500, ge=100, le=2000),
+    sampling: str = Query("stratified", regex="^(stratified|random|tablesample)$")
 ):
     """
     Get cycle time vs defect count for scatter plot correlation analysis.
     Shows ALL products (both accepted and rejected) to reveal true correlation.
-    """
-
-    query = db.query(
-        Product.id,
-        MachineState.cycle_time,
-        func.count(Defect.id).label("defect_count"),
-        Product.overall_reject
-    ).join(MachineState, Product.id == MachineState.product_id
-    ).outerjoin(Defect, Product.id == Defect.product_id)
 
-    # Apply filters
-    if start_date:
-        query = query.filter(Product.timestamp >= start_date)
-    if end_date:
-        query = query.filter(Product.timestamp <= end_date)
-    if machine_id:
-        query = query.filter(Product.molding_machine_id == machine_id)
-
-    # REMOVED: query = query.filter(Product.overall_reject == True)
-    # NOW SHOWS ALL PRODUCTS - both accepted (0 defects) and rejected (1+ defects)
+    **Query Pattern:**
+    - Statistics are aggregates over the whole filtered population, grouped
+      by machine and reject status; the correlation is Pearson's r from the
+      aggregated sums, so it does not depend on which points are shipped
+    - Only ``limit`` points are returned, chosen by ``sampling``:
+      - ``stratified``: random points from every machine/reject stratum in
+        proportion to its size, with at least one point per stratum
+      - ``random``: a uniform random sample of the population
+      - Both keep rows with ``random() < p`` per stratum in one scan, with
+        no sort, and trim the small surplus to the quotas in Python
+      - ``tablesample``: PostgreSQL TABLESAMPLE SYSTEM, which reads only the
+        sampled pages; fastest on large tables but clustered by page
+    - Stratified and random samples, and their statistics, are answered
+      from the in-process hot store, without SQL, when the window lies
+      within it
+    """
+    if sampling == "tablesample" and db.get_bind().dialect.name != "postgresql":
+        raise HTTPException(status_code=400, detail="tablesample sampling requires PostgreSQL")
+
+    def scatter_select(product, *columns):
+        query = select(*columns).select_from(product).join(
+            MachineState, product.machine_state
+        ).where(MachineState.cycle_time.isnot(None))
+
+        if start_date:
+            query = query.where(product.timestamp >= start_date)
+        if end_date:
+            query = query.where(product.timestamp <= end_date)
+        if machine_id:
+            query = query.where(product.molding_machine_id == machine_id)
+        return query
+
+    snapshot = hot_store.covering(db, start_date) if sampling != "tablesample" else None
+    if snapshot is not None:
+        strata = snapshot.cycle_time_strata(start_date, end_date, machine_id)
+    else:
+        cycle_time = cast(MachineState.cycle_time, Float)
+        strata = db.execute(
+            scatter_select(
+                Product,
+                Product.molding_machine_id,
+                Product.overall_reject,
+                func.count().label("n"),
+                func.sum(cycle_time).label("sum_x"),
+                func.sum(Product.defect_count).label("sum_y"),
+                func.sum(cycle_time * cycle_time).label("sum_xx"),
+                func.sum(Product.defect_count * Product.defect_count).label("sum_yy"),
+                func.sum(cycle_time * Product.defect_count).label("sum_xy"),
+            ).group_by(Product.molding_machine_id, Product.overall_reject)
+        ).all()
+
+    population = sum(row.n for row in strata)
+    sums = {
+        name: float(sum(getattr(row, name) or 0 for row in strata))
+        for name in ("sum_x", "sum_y", "sum_xx", "sum_yy", "sum_xy")
+    }
+    rejected_count = sum(row.n for row in strata if row.overall_reject)
 
-    query = query.group_by(Product.id, MachineState.cycle_time, Product.overall_reject)
-    query = query.limit(limit)
+    point_columns = (Product.id, MachineState.cycle_time, Product.defect_count, Product.overall_reject)
 
-    results = query.all()
+    if population == 0:
+        results = []
+    elif sampling in ("stratified", "random"):
+        if sampling == "stratified":
+            sizes = {(row.molding_machine_id, row.overall_reject): row.n for row in strata}
+            key_of = lambda r: (r.molding_machine_id, r.overall_reject)
+        else:
+            sizes = {None: population}
+            key_of = lambda r: None
+        quotas = _sample_quotas(sizes, limit)
+
+        if snapshot is not None:
+            results = snapshot.cycle_time_sample(
+                quotas, sampling == "stratified", start_date, end_date, machine_id
+            )
+        else:
+            keep = {
+                key: min(1.0, (quota * _SAMPLE_OVERSAMPLE + _SAMPLE_SLACK) / sizes[key])
+                for key, quota in quotas.items()
+            }
+            if sampling == "stratified":
+                threshold = case(
+                    *[
+                        (and_(Product.molding_machine_id == machine, Product.overall_reject == rejected), p)
+                        for (machine, rejected), p in keep.items()
+                    ],
+                    else_=0.0,
+                )
+            else:
+                threshold = keep[None]
+
+            drawn = {}
+            for row in db.execute(
+                scatter_select(Product, *point_columns, Product.molding_machine_id)
+                .where(_uniform_random(db) < threshold)
+            ):
+                drawn.setdefault(key_of(row), []).append(row)
+
+            results = []
+            for key, rows in drawn.items():
+                results.extend(random.sample(rows, min(len(rows), quotas[key])))
+    else:
+        percent = min(100.0, 100.0 * limit * _TABLESAMPLE_OVERSAMPLE / population)
+        sampled = aliased(Product, Product.__table__.tablesample(func.system(percent)))
+        results = db.execute(
+            scatter_select(
+                sampled, sampled.id, MachineState.cycle_time, sampled.defect_count, sampled.overall_reject
+            ).limit(limit)
+        ).all()
 
     points = [
         {
-            "cycle_time": float(r.cycle_time) if r.cycle_time else 0,
+            "cycle_time": float(r.cycle_time),
             "defect_count": r.defect_count,
             "product_id": r.id,
             "is_rejected": r.overall_reject
         }
-        for r in results if r.cycle_time is not None
+        for r in sorted(results, key=lambda r: r.id)
     ]
 
-    # Calculate correlation and statistics
-    if len(points) > 1:
-        import statistics
-        cycle_times = [p["cycle_time"] for p in points]
-        defect_counts = [p["defect_count"] for p in points]
-
-        avg_cycle = statistics.mean(cycle_times)
-        avg_defects = statistics.mean(defect_counts)
-
-        # Separate accepted vs rejected
-        accepted = [p for p in points if not p["is_rejected"]]
-        rejected = [p for p in points if p["is_rejected"]]
-
-        try:
-            correlation = statistics.correlation(cycle_times, defect_counts)
-        except:
-            correlation = 0
-    else:
-        avg_cycle = 0
-        avg_defects = 0
-        correlation = 0
-        accepted = []
-        rejected = []
-
     return {
         "points": points,
         "stats": {
-            "average_cycle_time": round(avg_cycle, 2),
-            "average_defect_count": round(avg_defects, 2),
-            "correlation": round(correlation, 3),
+            "average_cycle_time": round(sums["sum_x"] / population, 2) if population else 0,
+            "average_defect_count": round(sums["sum_y"] / population, 2) if population else 0,
+            "correlation": round(_pearson(population, **sums), 3),
             "sample_size": len(points),
-            "accepted_count": len(accepted),
-            "rejected_count": len(rejected)
+            "population_size": population,
+            "accepted_count": population - rejected_count,
+            "rejected_count": rejected_count,
+            "sampling": sampling
         }
     }
 
 
+def _uniform_random(db: Session):
+    """SQL expression for a uniform random number in [0, 1)."""
+    if db.get_bind().dialect.name == "postgresql":
+        return func.random()
+    # SQLite's random() is a signed 64-bit integer.
+    return ((func.random() % 1000000 + 1000000) % 1000000) / 1000000.0
+
+
+def _sample_quotas(sizes: dict, limit: int) -> dict:
+    """
+    Split ``limit`` points across strata in proportion to their sizes, by
+    largest remainder, giving every stratum at least one point.
+    """
+    population = sum(sizes.values())
+    if population <= limit:
+        return dict(sizes)
+
+    shares = {key: limit * size / population for key, size in sizes.items()}
+    quotas = {key: max(1, math.floor(share)) for key, share in shares.items()}
+    by_remainder = sorted(shares, key=lambda key: shares[key] - math.floor(shares[key]), reverse=True)
+    spare = limit - sum(quotas.values())
+    for key in by_remainder:
+        if spare <= 0:
+            break
+        if quotas[key] < sizes[key]:
+            quotas[key] += 1
+            spare -= 1
+    # Strata raised to one point can push the total past the limit
+    while spare < 0 and max(quotas.values()) > 1:
+        quotas[max(quotas, key=quotas.get)] -= 1
+        spare += 1
+    return quotas
+
+
+def _pearson(n: int, sum_x: float, sum_y: float, sum_xx: float, sum_yy: float, sum_xy: float) -> float:
+    """Pearson's r from aggregated sums; 0 when either variable is constant."""
+    if n < 2:
+        return 0.0
+    covariance = sum_xy - sum_x * sum_y / n
+    variance_x = sum_xx - sum_x * sum_x / n
+    variance_y = sum_yy - sum_y * sum_y / n
+    if variance_x <= 0 or variance_y <= 0:
+        return 0.0
+    return max(-1.0, min(1.0, covariance / math.sqrt(variance_x * variance_y)))
+
+
 @router.get("/machines")
-async def get_machines(
+@response_cache.cached("machines")
+def get_machines(
     db: Session = Depends(get_db)
 ):
     """
@@ -491,4 +844,167 @@ async def get_machines(
             "count": len(machine_list)
         }
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# ============================================================================
+# RAW EXPORT (Streaming)
+# ============================================================================
+
+@router.get("/products/export")
+def export_products(
+    session_factory: sessionmaker = Depends(get_session_factory),
+    format: str = Query("ndjson", regex="^(ndjson|csv|arrow)$"),
+    table: str = Query("products", regex="^(products|defects)$"),
+    start_date: Optional[datetime] = Query(None),
+    end_date: Optional[datetime] = Query(None),
+    machine_id: Optional[str] = Query(None),
+    after_timestamp: Optional[datetime] = Query(None, description="Resume after this product timestamp"),
+    after_id: Optional[int] = Query(None, description="Resume after this row id"),
+    limit: Optional[int] = Query(None, ge=1, description="Stop after this many rows")
+):
+    """
+    Stream raw rows as NDJSON, CSV or an Arrow IPC stream.
+
+    ``table=products`` returns one row per product with its machine state
+    columns; ``table=defects`` returns one row per defect with its product's
+    timestamp and machine. Rows are ordered by (timestamp, id). To resume an
+    interrupted export, pass the last row's ``timestamp`` and ``id`` as
+    ``after_timestamp`` and ``after_id``.
+
+    **Query Pattern:**
+    - Keyset pages of EXPORT_PAGE_SIZE rows, each read through a server-side
+      cursor, so server memory is bounded by one page whatever the export size
+    """
+    if (after_timestamp is None) != (after_id is None):
+        raise HTTPException(status_code=400, detail="after_timestamp and after_id must be given together")
+    try:
+        product_export.require_format(format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    after = (after_timestamp, after_id) if after_id is not None else None
+
+    def stream():
+        db = session_factory()
+        try:
+            pages = product_export.iter_pages(
+                db, table, start_date, end_date, machine_id,
+                after=after, limit=limit, page_size=settings.EXPORT_PAGE_SIZE,
+            )
+            yield from product_export.CHUNK_WRITERS[format](table, pages)
+        finally:
+            db.close()
+
+    extension = "arrows" if format == "arrow" else format
+    return StreamingResponse(
+        stream(),
+        media_type=product_export.EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{table}.{extension}"'},
+    )
+
+
+# ============================================================================
+# DASHBOARD (All Charts in One Request)
+# ============================================================================
+
+dashboard_executor = ThreadPoolExecutor(
+    max_workers=settings.DASHBOARD_MAX_WORKERS,
+    thread_name_prefix="dashboard",
+)
+
+
+@router.get("/dashboard")
+def get_dashboard(
+    session_factory: sessionmaker = Depends(get_session_factory),
+    start_date: Optional[datetime] = Query(None),
+    end_date: Optional[datetime] = Query(None),
+    machine_id: Optional[str] = Query(None),
+    interval: str = Query("day", regex="^(hour|day|week)$"),
+    top_defects_limit: int = Query(10, ge=1, le=20),
+    scatter_limit: int = Query(500, ge=100, le=2000),
+    scatter_sampling: str = Query("stratified", regex="^(stratified|random|tablesample)$")
+):
+    """
+    Every dashboard chart for one filter, in a single response.
+
+    The chart queries run concurrently, each on its own pooled connection,
+    so the response takes about as long as the slowest one. They share
+    cache entries with the individual endpoints. A chart whose query fails
+    is returned as null and named in ``errors``; the others are still
+    returned.
+    """
+    queries = {
+        "defect_rate_trend": (get_defect_rate_trend, {
+            "start_date": start_date, "end_date": end_date,
+            "machine_id": machine_id, "interval": interval,
+        }),
+        "machine_defect_heatmap": (get_machine_defect_heatmap, {
+            "start_date": start_date, "end_date": end_date,
+        }),
+        "top_defects": (get_top_defects, {
+            "start_date": start_date, "end_date": end_date,
+            "machine_id": machine_id, "limit": top_defects_limit,
+        }),
+        "machine_comparison": (get_machine_comparison, {}),
+        "defect_distribution": (get_defect_distribution, {
+            "start_date": start_date, "end_date": end_date, "machine_id": machine_id,
+        }),
+        "cycle_time_scatter": (get_cycle_time_scatter, {
+            "start_date": start_date, "end_date": end_date,
+            "machine_id": machine_id, "limit": scatter_limit,
+            "sampling": scatter_sampling,
+        }),
+    }
+
+    def run(query, params):
+        db = session_factory()
+        try:
+            return query(db=db, **params)
+        finally:
+            db.close()
+
+    futures = {
+        name: dashboard_executor.submit(run, query, params)
+        for name, (query, params) in queries.items()
+    }
+
+    response = {
+        "filters": {
+            "start_date": start_date,
+            "end_date": end_date,
+            "machine_id": machine_id,
+            "interval": interval,
+        },
+        "errors": {},
+    }
+    for name, future in futures.items():
+        try:
+            response[name] = future.result()
+        except Exception as e:
+            logger.error(f"Dashboard query {name} failed: {e}")
+            response[name] = None
+            response["errors"][name] = (
+                str(e) if settings.ENVIRONMENT == "development" else "Query failed"
+            )
+
+    return response
+
+
+# ============================================================================
+# RESPONSE CACHE STATS
+# ============================================================================
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    """
+    Hit/miss counters and occupancy of the analytics response cache,
+    for sizing CACHE_MAX_ENTRIES and CACHE_TTL_SECONDS.
+    """
+    return response_cache.stats()
+
+
+@router.get("/hot-store/stats")
+async def get_hot_store_stats():
+    """Size and dataset version of the in-process hot store."""
+    return hot_store.stats()
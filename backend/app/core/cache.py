@@ -0,0 +1,223 @@
+import functools
+import inspect
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Optional, Tuple
+from urllib.parse import urlencode
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class MemoryBackend:
+    """Thread-safe in-process LRU cache whose entries expire after ``ttl`` seconds."""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int = 512, ttl: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return _MISSING
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return _MISSING
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def size(self) -> Optional[int]:
+        return len(self._entries)
+
+
+class RedisBackend:
+    """
+    Shared cache in Redis so every API process sees the same entries.
+
+    Redis errors are logged and treated as misses, so an unreachable cache
+    sends requests to the database instead of failing them.
+    """
+
+    name = "redis"
+
+    def __init__(self, url: str, ttl: float = 300.0, prefix: str = "analytics:"):
+        try:
+            import redis
+        except ImportError as e:
+            raise ValueError("CACHE_BACKEND=redis requires the redis package") from e
+
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+        self.errors = redis.RedisError
+
+    def get(self, key: str) -> Any:
+        try:
+            value = self.client.get(self.prefix + key)
+        except self.errors as e:
+            logger.warning(f"Cache read failed, treating as a miss: {e}")
+            return _MISSING
+        return _MISSING if value is None else json.loads(value)
+
+    def set(self, key: str, value: Any) -> None:
+        # Millisecond expiry, so sub-second TTLs do not round down to zero
+        try:
+            self.client.psetex(self.prefix + key, max(1, int(self.ttl * 1000)), json.dumps(value))
+        except self.errors as e:
+            logger.warning(f"Cache write failed: {e}")
+
+    def clear(self) -> None:
+        for key in self.client.scan_iter(f"{self.prefix}*"):
+            self.client.delete(key)
+
+    def size(self) -> Optional[int]:
+        return None
+
+
+def create_backend():
+    if settings.CACHE_BACKEND == "memory":
+        return MemoryBackend(settings.CACHE_MAX_ENTRIES, settings.CACHE_TTL_SECONDS)
+    if settings.CACHE_BACKEND == "redis":
+        return RedisBackend(settings.CACHE_REDIS_URL, settings.CACHE_TTL_SECONDS)
+    raise ValueError(f"Unknown cache backend: {settings.CACHE_BACKEND}")
+
+
+def cache_key(name: str, params: Dict[str, Any]) -> str:
+    """Endpoint name plus its query parameters, sorted and with unset ones dropped."""
+    normalized = []
+    for key, value in sorted(params.items()):
+        if value is None:
+            continue
+        if isinstance(value, (datetime, date)):
+            value = value.isoformat()
+        normalized.append((key, value))
+    return f"{name}?{urlencode(normalized)}"
+
+
+class ResponseCache:
+    """
+    Caches endpoint responses per dataset version.
+
+    The version comes from ``version_loader`` and is re-read at most every
+    ``version_ttl`` seconds, so a finished load invalidates every entry
+    across processes without any explicit purge.
+    """
+
+    def __init__(
+        self,
+        backend,
+        version_loader: Callable[[Session], Any],
+        version_ttl: float = 5.0,
+        enabled: bool = True,
+    ):
+        self.backend = backend
+        self.version_loader = version_loader
+        self.version_ttl = version_ttl
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._version: Any = None
+        self._version_checked_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def version(self, db: Session) -> Any:
+        now = time.monotonic()
+        if self._version_checked_at is None or now - self._version_checked_at >= self.version_ttl:
+            version = self.version_loader(db)
+            if version != self._version:
+                logger.info(f"Dataset version changed to {version}")
+            self._version = version
+            self._version_checked_at = now
+        return self._version
+
+    def lookup(self, db: Session, key: str) -> Tuple[str, Any]:
+        versioned_key = f"v{self.version(db)}:{key}"
+        value = self.backend.get(versioned_key)
+        with self._lock:
+            if value is _MISSING:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return versioned_key, value
+
+    def cached(self, name: str) -> Callable:
+        """
+        Decorator for endpoints taking a ``db`` session. Every other argument
+        is treated as a query parameter and becomes part of the key.
+        """
+        def decorator(func: Callable) -> Callable:
+            def key_for(kwargs: Dict[str, Any]) -> str:
+                return cache_key(name, {k: v for k, v in kwargs.items() if k != "db"})
+
+            if inspect.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def wrapper(**kwargs):
+                    if not self.enabled:
+                        return await func(**kwargs)
+                    key, value = self.lookup(kwargs["db"], key_for(kwargs))
+                    if value is _MISSING:
+                        value = jsonable_encoder(await func(**kwargs))
+                        self.backend.set(key, value)
+                    return value
+            else:
+                @functools.wraps(func)
+                def wrapper(**kwargs):
+                    if not self.enabled:
+                        return func(**kwargs)
+                    key, value = self.lookup(kwargs["db"], key_for(kwargs))
+                    if value is _MISSING:
+                        value = jsonable_encoder(func(**kwargs))
+                        self.backend.set(key, value)
+                    return value
+
+            return wrapper
+        return decorator
+
+    def clear(self) -> None:
+        self.backend.clear()
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self._version = None
+            self._version_checked_at = None
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.backend.name,
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "entries": self.backend.size(),
+            "max_entries": getattr(self.backend, "max_entries", None),
+            "ttl_seconds": self.backend.ttl,
+            "dataset_version": self._version,
+        }
@@ -12,6 +12,21 @@ class Settings(BaseSettings):
     POSTGRES_PORT: str = "5432"
     POSTGRES_DB: str = "krevera"
 
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+
+    # Sync route handlers run on this many worker threads, each holding at
+    # most one connection. Worker threads shared by /analytics/dashboard
+    # requests each run one chart query on their own pooled connection.
+    # Keep API_THREADPOOL_SIZE + DASHBOARD_MAX_WORKERS at or below
+    # DB_POOL_SIZE + DB_MAX_OVERFLOW so no thread waits on the pool.
+    API_THREADPOOL_SIZE: int = 18
+    DASHBOARD_MAX_WORKERS: int = 12
+
+    # Rows per keyset page of /analytics/products/export; bounds the memory
+    # one export holds at a time.
+    EXPORT_PAGE_SIZE: int = 10000
+
     @property
     def DATABASE_URL(self) -> str:
         return f"postgresql://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@{self.POSTGRES_SERVER}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
@@ -28,6 +43,25 @@ class Settings(BaseSettings):
     AWS_ACCESS_KEY_ID: str = "test"
     AWS_SECRET_ACCESS_KEY: str = "test"
     AWS_REGION: str = "us-east-1"
+    S3_MULTIPART_THRESHOLD: int = 16 * 1024 * 1024
+    S3_MULTIPART_CHUNKSIZE: int = 16 * 1024 * 1024
+    S3_MAX_CONCURRENCY: int = 8
+
+    INGESTION_SHARDS: int = 4
+    INGESTION_BATCH_SIZE: int = 5000
+    INGESTION_WORKER_THREADS: int = 8
+
+    CACHE_ENABLED: bool = True
+    CACHE_BACKEND: str = "memory"
+    CACHE_REDIS_URL: str = "redis://redis:6379/0"
+    CACHE_MAX_ENTRIES: int = 512
+    CACHE_TTL_SECONDS: float = 300.0
+    CACHE_VERSION_CHECK_SECONDS: float = 5.0
+
+    # Column arrays for the last HOT_STORE_DAYS of products, held by each
+    # API process and used instead of SQL for windows inside that range.
+    HOT_STORE_ENABLED: bool = False
+    HOT_STORE_DAYS: float = 7.0
 
     FRONTEND_URL: str = "http://localhost:5173"
 
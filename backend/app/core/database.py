@@ -5,12 +5,23 @@ from typing import Generator
 
 from app.core.config import settings
 
+# Sessions run in UTC: date_trunc on timestamptz columns buckets in the
+# session time zone, and naive datetimes from query parameters are read
+# in it, so SQL agrees with the hot store, which works in UTC.
+# Products and their child tables share monthly partition bounds, so
+# joins and per-machine aggregates can run partition by partition.
+CONNECT_OPTIONS = (
+    "-c timezone=UTC "
+    "-c enable_partitionwise_join=on -c enable_partitionwise_aggregate=on"
+)
+
 engine = create_engine(
     settings.DATABASE_URL,
     pool_pre_ping=True,
-    pool_size=10,
-    max_overflow=20,
-    echo=settings.ENVIRONMENT == "development"
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    echo=settings.ENVIRONMENT == "development",
+    connect_args={"options": CONNECT_OPTIONS},
 )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -23,4 +34,8 @@ def get_db() -> Generator[Session, None, None]:
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def get_session_factory() -> sessionmaker:
+    """For endpoints that open several sessions of their own, e.g. to query in parallel."""
+    return SessionLocal
@@ -3,6 +3,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from sqlalchemy.exc import SQLAlchemyError
 from contextlib import asynccontextmanager
+import anyio.to_thread
 import logging
 
 from app.core.config import settings
@@ -18,6 +19,22 @@ async def lifespan(app: FastAPI):
     logger.info("Starting Krevera Analytics API...")
     logger.info(f"Environment: {settings.ENVIRONMENT}")
     logger.info(f"Database: {settings.DATABASE_URL}")
+
+    # Analytics routes are plain `def` handlers that FastAPI runs on anyio's
+    # thread pool, so blocking queries never stall the event loop.
+    anyio.to_thread.current_default_thread_limiter().total_tokens = settings.API_THREADPOOL_SIZE
+    logger.info(f"Request thread pool: {settings.API_THREADPOOL_SIZE} threads")
+
+    threads = settings.API_THREADPOOL_SIZE + settings.DASHBOARD_MAX_WORKERS
+    connections = settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW
+    if threads > connections:
+        logger.warning(
+            f"{threads} request and dashboard threads share {connections} pooled connections; "
+            f"requests may time out waiting for one"
+        )
+
+    if settings.HOT_STORE_ENABLED:
+        analytics.hot_store.refresh_in_background()
     yield
     logger.info("Shutting down Krevera Analytics API...")
     engine.dispose()
@@ -6,9 +6,15 @@ Exports all SQLAlchemy models for easy importing.
 from app.models.product import Product
 from app.models.machine_state import MachineState
 from app.models.defect import Defect
+from app.models.dataset_ingestion import DatasetIngestion, IngestionCheckpoint
+from app.models.hourly_rollups import MachineHourlyRollup, MachineDefectHourlyRollup
 
 __all__ = [
     "Product",
     "MachineState",
     "Defect",
+    "DatasetIngestion",
+    "IngestionCheckpoint",
+    "MachineHourlyRollup",
+    "MachineDefectHourlyRollup",
 ]
\ No newline at end of file
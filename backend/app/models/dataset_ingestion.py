@@ -0,0 +1,83 @@
+from sqlalchemy import Column, BigInteger, String, DateTime, Float, ForeignKey, Integer, Index
+from datetime import datetime
+
+from app.core.database import Base
+
+
+class DatasetIngestion(Base):
+    __tablename__ = "dataset_ingestions"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    dataset_hash = Column(String(64), nullable=False)
+    source_url = Column(String(2048), nullable=True)
+    s3_uri = Column(String(512), nullable=True)
+    size_bytes = Column(BigInteger, nullable=True)
+    mode = Column(String(20), nullable=False, default="replace")
+    status = Column(String(20), nullable=False, default="running")
+    products = Column(Integer, nullable=False, default=0)
+    machine_states = Column(Integer, nullable=False, default=0)
+    defects = Column(Integer, nullable=False, default=0)
+    started_at = Column(DateTime(timezone=True), nullable=False, default=datetime.utcnow)
+    loaded_at = Column(DateTime(timezone=True), nullable=True)
+    # Set once the materialized views reflect this load.
+    views_refreshed_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index('idx_dataset_ingestions_hash_status', 'dataset_hash', 'status'),
+        Index('idx_dataset_ingestions_status_loaded', 'status', 'loaded_at'),
+    )
+
+    def __repr__(self) -> str:
+        return (
+            f"<DatasetIngestion(id={self.id}, "
+            f"hash={self.dataset_hash}, "
+            f"status={self.status})>"
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "dataset_hash": self.dataset_hash,
+            "source_url": self.source_url,
+            "s3_uri": self.s3_uri,
+            "size_bytes": self.size_bytes,
+            "mode": self.mode,
+            "status": self.status,
+            "products": self.products,
+            "machine_states": self.machine_states,
+            "defects": self.defects,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "loaded_at": self.loaded_at.isoformat() if self.loaded_at else None,
+            "views_refreshed_at": self.views_refreshed_at.isoformat() if self.views_refreshed_at else None,
+        }
+
+
+class IngestionCheckpoint(Base):
+    """
+    Progress of one shard of a load, written in the same transaction as
+    each batch it describes, so a retried shard resumes exactly after the
+    last committed batch.
+    """
+
+    __tablename__ = "ingestion_checkpoints"
+
+    ingestion_id = Column(
+        Integer, ForeignKey("dataset_ingestions.id", ondelete="CASCADE"), primary_key=True
+    )
+    shard_index = Column(Integer, primary_key=True)
+    byte_offset = Column(BigInteger, nullable=False)
+    products = Column(Integer, nullable=False, default=0)
+    machine_states = Column(Integer, nullable=False, default=0)
+    defects = Column(Integer, nullable=False, default=0)
+    updated = Column(Integer, nullable=False, default=0)
+    unchanged = Column(Integer, nullable=False, default=0)
+    # [first, last] record timestamp written so far, as epoch seconds.
+    first_timestamp = Column(Float, nullable=True)
+    last_timestamp = Column(Float, nullable=True)
+
+    def __repr__(self) -> str:
+        return (
+            f"<IngestionCheckpoint(ingestion={self.ingestion_id}, "
+            f"shard={self.shard_index}, "
+            f"offset={self.byte_offset})>"
+        )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, BigInteger, String, Boolean, Numeric, ForeignKey, Index
+from sqlalchemy import Column, Sequence, BigInteger, String, Boolean, DateTime, Numeric, ForeignKeyConstraint, Index
 from sqlalchemy.orm import relationship
 
 from app.core.database import Base
@@ -7,10 +7,14 @@ from app.core.database import Base
 class Defect(Base):
     __tablename__ = "defects"
 
-    id = Column(BigInteger, primary_key=True, autoincrement=True)
-    product_id = Column(BigInteger, ForeignKey('products.id', ondelete='CASCADE'), nullable=False, index=True)
-    defect_type = Column(String(50), nullable=False, index=True)
-    reject = Column(Boolean, nullable=False, default=False, index=True)
+    id = Column(BigInteger, Sequence("defects_id_seq"), primary_key=True)
+    product_id = Column(BigInteger, nullable=False)
+    # Copies of the product's timestamp (the partition key of defects) and
+    # machine, so defect aggregates filter and group without the join.
+    product_timestamp = Column(DateTime(timezone=True), primary_key=True, nullable=False)
+    molding_machine_id = Column(String(50), nullable=False)
+    defect_type = Column(String(50), nullable=False)
+    reject = Column(Boolean, nullable=False, default=False)
     pixel_severity_value = Column(Numeric(10, 6), nullable=True)
     pixel_severity_reject = Column(Boolean, nullable=True)
     threshold = Column(Numeric(10, 6), nullable=True)
@@ -20,9 +24,25 @@ class Defect(Base):
     product = relationship("Product", back_populates="defects")
 
     __table_args__ = (
-        Index('idx_defects_type_reject', 'defect_type', 'reject'),
-        Index('idx_defects_severity', 'pixel_severity_value'),
-        Index('idx_defects_product_type', 'product_id', 'defect_type'),
+        ForeignKeyConstraint(
+            ['product_id', 'product_timestamp'],
+            ['products.id', 'products.timestamp'],
+            ondelete='CASCADE',
+        ),
+        # Lookups by product (details, re-ingestion) read only the type.
+        Index(
+            'idx_defects_product_covering', 'product_id', 'product_timestamp',
+            postgresql_include=['defect_type'],
+        ),
+        # Defect aggregates filter on machine and time and read only the
+        # type and product, so they can be answered by index-only scans;
+        # BRIN covers time ranges across all machines.
+        Index(
+            'idx_defects_machine_timestamp', 'molding_machine_id', 'product_timestamp',
+            postgresql_include=['defect_type', 'product_id'],
+        ),
+        Index('brin_defects_product_timestamp', 'product_timestamp', postgresql_using='brin'),
+        {"postgresql_partition_by": "RANGE (product_timestamp)"},
     )
 
     def __repr__(self) -> str:
@@ -0,0 +1,49 @@
+from sqlalchemy import Column, String, DateTime, Integer, Index
+
+from app.core.database import Base
+
+
+class MachineHourlyRollup(Base):
+    """Product totals per machine and hour, maintained by ingestion."""
+
+    __tablename__ = "machine_hourly_rollups"
+
+    molding_machine_id = Column(String(50), primary_key=True)
+    hour = Column(DateTime(timezone=True), primary_key=True)
+    total_products = Column(Integer, nullable=False, default=0)
+    rejected_products = Column(Integer, nullable=False, default=0)
+    defective_products = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index('idx_machine_hourly_rollups_hour', 'hour'),
+    )
+
+    def __repr__(self) -> str:
+        return (
+            f"<MachineHourlyRollup(machine={self.molding_machine_id}, "
+            f"hour={self.hour}, "
+            f"total={self.total_products})>"
+        )
+
+
+class MachineDefectHourlyRollup(Base):
+    """Defect counts per machine, defect type and hour, maintained by ingestion."""
+
+    __tablename__ = "machine_defect_hourly_rollups"
+
+    molding_machine_id = Column(String(50), primary_key=True)
+    defect_type = Column(String(50), primary_key=True)
+    hour = Column(DateTime(timezone=True), primary_key=True)
+    defect_count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index('idx_machine_defect_hourly_rollups_hour', 'hour'),
+    )
+
+    def __repr__(self) -> str:
+        return (
+            f"<MachineDefectHourlyRollup(machine={self.molding_machine_id}, "
+            f"defect_type={self.defect_type}, "
+            f"hour={self.hour}, "
+            f"count={self.defect_count})>"
+        )
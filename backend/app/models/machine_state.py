@@ -1,4 +1,4 @@
-from sqlalchemy import Column, BigInteger, Integer, Numeric, Boolean, ForeignKey, Index
+from sqlalchemy import Column, Sequence, BigInteger, DateTime, Integer, Numeric, Boolean, ForeignKeyConstraint, Index
 from sqlalchemy.orm import relationship
 
 from app.core.database import Base
@@ -7,8 +7,11 @@ from app.core.database import Base
 class MachineState(Base):
     __tablename__ = "machine_states"
 
-    id = Column(BigInteger, primary_key=True, autoincrement=True)
-    product_id = Column(BigInteger, ForeignKey('products.id', ondelete='CASCADE'), nullable=False, unique=True, index=True)
+    id = Column(BigInteger, Sequence("machine_states_id_seq"), primary_key=True)
+    product_id = Column(BigInteger, nullable=False)
+    # Copy of the product's timestamp: machine states are partitioned on it
+    # by the same monthly ranges as products, so joins stay partition-wise.
+    product_timestamp = Column(DateTime(timezone=True), primary_key=True, nullable=False)
 
     cycle_time = Column(Numeric(10, 3), nullable=True)
     vtop_time = Column(Numeric(10, 3), nullable=True)
@@ -86,9 +89,18 @@ class MachineState(Base):
     product = relationship("Product", back_populates="machine_state")
 
     __table_args__ = (
-        Index('idx_machine_states_cycle_time', 'cycle_time'),
-        Index('idx_machine_states_shot_count', 'shot_count'),
-        Index('idx_machine_states_barrel_temps', 'barrel_1', 'barrel_2', 'barrel_3'),
+        ForeignKeyConstraint(
+            ['product_id', 'product_timestamp'],
+            ['products.id', 'products.timestamp'],
+            ondelete='CASCADE',
+        ),
+        # Includes cycle_time so the scatter plot and hot store read it from
+        # the index they join through.
+        Index(
+            'uq_machine_states_product', 'product_id', 'product_timestamp',
+            unique=True, postgresql_include=['cycle_time'],
+        ),
+        {"postgresql_partition_by": "RANGE (product_timestamp)"},
     )
 
     def __repr__(self) -> str:
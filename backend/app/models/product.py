@@ -1,4 +1,4 @@
-from sqlalchemy import Column, BigInteger, String, DateTime, Boolean, Integer, Numeric, Index
+from sqlalchemy import Column, Sequence, BigInteger, String, DateTime, Boolean, Integer, Numeric, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
@@ -8,12 +8,16 @@ from app.core.database import Base
 class Product(Base):
     __tablename__ = "products"
 
-    id = Column(BigInteger, primary_key=True, autoincrement=True)
-    version = Column(String(10), nullable=False, index=True)
-    timestamp = Column(DateTime(timezone=True), nullable=False, index=True)
-    molding_machine_id = Column(String(50), nullable=False, index=True)
-    overall_reject = Column(Boolean, nullable=False, default=False, index=True)
+    id = Column(BigInteger, Sequence("products_id_seq"), primary_key=True)
+    version = Column(String(10), nullable=False)
+    # Part of the primary key because it is the partition key: PostgreSQL
+    # only allows keys on partitioned tables that include it.
+    timestamp = Column(DateTime(timezone=True), primary_key=True, nullable=False)
+    molding_machine_id = Column(String(50), nullable=False)
+    overall_reject = Column(Boolean, nullable=False, default=False)
     defect_count = Column(Integer, nullable=False, default=0)
+    # One bit per defect type present, positions from defect_registry.
+    defect_mask = Column(Integer, nullable=False, default=0)
     total_severity_score = Column(Numeric(10, 6), nullable=True)
     created_at = Column(DateTime(timezone=True), nullable=False, default=datetime.utcnow)
 
@@ -30,9 +34,14 @@ class Product(Base):
         cascade="all, delete-orphan"
     )
 
+    # Indexes follow the endpoint query shapes (scripts/audit_indexes.py):
+    # machine + time filters, wide time ranges scanned for aggregates, and
+    # the export's (timestamp, id) keyset.
     __table_args__ = (
-        Index('idx_products_machine_timestamp', 'molding_machine_id', 'timestamp'),
-        Index('idx_products_reject_timestamp', 'overall_reject', 'timestamp'),
+        Index('idx_products_machine_timestamp_defects', 'molding_machine_id', 'timestamp', 'defect_count'),
+        Index('idx_products_timestamp_id', 'timestamp', 'id'),
+        Index('brin_products_timestamp', 'timestamp', postgresql_using='brin'),
+        {"postgresql_partition_by": "RANGE (timestamp)"},
     )
 
     def __repr__(self) -> str:
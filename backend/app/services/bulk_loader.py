@@ -0,0 +1,457 @@
+import csv
+import io
+import logging
+import threading
+from datetime import datetime
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+from weakref import WeakKeyDictionary
+
+from sqlalchemy import Table, bindparam, func, select, text
+from sqlalchemy.orm import Session
+
+from app.models import Product, MachineState, Defect
+from app.services import partitions
+from app.services.column_mapper import machine_state_mapper
+from app.services.defect_registry import DEFECT_TYPES, mask_for
+
+logger = logging.getLogger(__name__)
+
+# Without sequences, ids are reserved from max(id). Parallel shards in one
+# process would read the same max before either commits, so reservations
+# are serialized and remembered per engine.
+_reserved_ids_lock = threading.Lock()
+_next_reserved_ids: "WeakKeyDictionary[Any, Dict[str, int]]" = WeakKeyDictionary()
+
+
+def chunked(records: Iterable[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    iterator = iter(records)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def natural_key(record: Dict[str, Any]) -> tuple:
+    """A product is identified by machine, shot timestamp and shot count."""
+    return (
+        record.get("molding_machine_id"),
+        round(record.get("timestamp"), 6),
+        record.get("molding-machine-state", {}).get("ShotCount"),
+    )
+
+
+def record_fingerprint(record: Dict[str, Any]) -> tuple:
+    object_detection = record.get("object_detection", {})
+    product = {
+        "version": record.get("version"),
+        "overall_reject": object_detection.get("reject", False),
+    }
+    state = machine_state_mapper.rows([record.get("molding-machine-state", {})])[0]
+    return _fingerprint(product, state, extract_defects(object_detection))
+
+
+def extract_defects(object_detection: Dict[str, Any]) -> List[Dict[str, Any]]:
+    defects = []
+    for defect_type in DEFECT_TYPES:
+        defect_data = object_detection.get(defect_type)
+        if defect_data and defect_data.get("reject"):
+            pixel_severity = defect_data.get("pixel_severity", {})
+            defects.append({
+                "defect_type": defect_type,
+                "reject": defect_data.get("reject", False),
+                "pixel_severity_value": pixel_severity.get("value", 0.0),
+                "pixel_severity_reject": pixel_severity.get("reject", False),
+                "threshold": None,
+                "min_value": 0.0,
+                "max_value": 1.0,
+            })
+    return defects
+
+
+def _fingerprint(product, state, defects) -> tuple:
+    return (
+        product["version"],
+        bool(product["overall_reject"]),
+        machine_state_mapper.fingerprint(state),
+        tuple(sorted(
+            (
+                defect["defect_type"],
+                _rounded(defect["pixel_severity_value"], 6),
+                bool(defect["pixel_severity_reject"]),
+            )
+            for defect in defects
+        )),
+    )
+
+
+def _rounded(value, places: int) -> Optional[float]:
+    return None if value is None else round(float(value), places)
+
+
+def _epoch(value: datetime) -> float:
+    return round(value.timestamp(), 6)
+
+
+class BulkLoader:
+    """
+    Set-based loader for products, machine_states and defects.
+
+    Ids are reserved client-side per batch so child rows can reference their
+    product without a flush round-trip. On PostgreSQL each table is streamed
+    with COPY FROM STDIN; other dialects fall back to executemany inserts.
+    """
+
+    def __init__(
+        self,
+        db: Session,
+        batch_size: int = 5000,
+        method: str = "auto",
+        tables: Optional[Dict[str, Table]] = None,
+    ):
+        if method not in ("auto", "copy", "insert"):
+            raise ValueError(f"Unknown load method: {method}")
+
+        self.db = db
+        self.batch_size = batch_size
+        self.dialect = db.get_bind().dialect.name
+
+        if method == "auto":
+            method = "copy" if self.dialect == "postgresql" else "insert"
+        if method == "copy" and self.dialect != "postgresql":
+            raise ValueError("COPY loading requires PostgreSQL")
+        self.method = method
+
+        # Tables rows are written to; ids always come from the live tables'
+        # sequences, so shadow copies can be swapped in without renumbering.
+        self.tables = tables or {
+            "products": Product.__table__,
+            "machine_states": MachineState.__table__,
+            "defects": Defect.__table__,
+        }
+        self.counts = {"products": 0, "machine_states": 0, "defects": 0}
+        # [first, last] record timestamp written so far, for rollup refreshes.
+        self.time_range: Optional[List[float]] = None
+        # Months whose partitions are known to exist in every target table.
+        self.partition_months: set = set()
+
+    def truncate(self) -> None:
+        if self.dialect == "postgresql":
+            self.db.execute(text("TRUNCATE products CASCADE"))
+        else:
+            for table in ("defects", "machine_states", "products"):
+                self.db.execute(text(f"DELETE FROM {table}"))
+        self.db.commit()
+
+    def load(
+        self,
+        records: Iterable[Dict[str, Any]],
+        on_batch: Optional[Callable[[Dict[str, int]], None]] = None,
+    ) -> Dict[str, int]:
+        """
+        Insert all records. ``on_batch`` is called with the counts after each
+        batch is written and before it commits, so whatever it writes commits
+        (or rolls back) together with the batch.
+        """
+        for batch_number, batch in enumerate(chunked(records, self.batch_size), start=1):
+            self.load_batch(batch)
+            if on_batch:
+                on_batch(dict(self.counts))
+            self.db.commit()
+            logger.info(
+                f"Loaded batch {batch_number} ({self.counts['products']} products so far)"
+            )
+        return dict(self.counts)
+
+    def load_batch(self, records: List[Dict[str, Any]]) -> None:
+        self.ensure_partitions(records)
+        products, machine_states, defects = self.build_rows(records)
+
+        self._write("products", products)
+        self._write("machine_states", machine_states)
+        self._write("defects", defects)
+
+        self.counts["products"] += len(products)
+        self.counts["machine_states"] += len(machine_states)
+        self.counts["defects"] += len(defects)
+
+    def upsert(
+        self,
+        records: Iterable[Dict[str, Any]],
+        on_batch: Optional[Callable[[Dict[str, int]], None]] = None,
+    ) -> Dict[str, int]:
+        """
+        Insert records whose natural key is new and rewrite the ones whose
+        content changed, leaving everything else in place. ``on_batch`` runs
+        inside each batch's transaction, as in ``load``.
+        """
+        self.counts.update({"updated": 0, "unchanged": 0})
+        for batch_number, batch in enumerate(chunked(records, self.batch_size), start=1):
+            self.upsert_batch(batch)
+            if on_batch:
+                on_batch(dict(self.counts))
+            self.db.commit()
+            logger.info(
+                f"Upserted batch {batch_number} ({self.counts['products']} new, "
+                f"{self.counts['updated']} updated so far)"
+            )
+        return dict(self.counts)
+
+    def upsert_batch(self, records: List[Dict[str, Any]]) -> None:
+        existing = self._existing_fingerprints(records)
+
+        new_records = []
+        changed = []
+        for record in records:
+            match = existing.pop(natural_key(record), None)
+            if match is None:
+                new_records.append(record)
+            elif match[2] != record_fingerprint(record):
+                changed.append((record, match))
+            else:
+                self.counts["unchanged"] += 1
+
+        if new_records:
+            self.load_batch(new_records)
+        if changed:
+            self._rewrite(changed)
+
+    def _existing_fingerprints(self, records: List[Dict[str, Any]]) -> Dict[tuple, tuple]:
+        """Map natural key -> (product id, machine state id, fingerprint) for stored rows."""
+        timestamps = [datetime.fromtimestamp(record.get("timestamp")) for record in records]
+        machines = {record.get("molding_machine_id") for record in records}
+
+        products = self.tables["products"]
+        states = self.tables["machine_states"]
+        rows = self.db.execute(
+            select(
+                products.c.id,
+                products.c.version,
+                products.c.timestamp,
+                products.c.molding_machine_id,
+                products.c.overall_reject,
+                states.c.id.label("state_id"),
+                *[states.c[name] for name in machine_state_mapper.column_names],
+            )
+            .select_from(products.outerjoin(
+                states,
+                (states.c.product_id == products.c.id)
+                & (states.c.product_timestamp == products.c.timestamp),
+            ))
+            .where(
+                products.c.molding_machine_id.in_(machines),
+                products.c.timestamp.between(min(timestamps), max(timestamps)),
+            )
+        ).all()
+        if not rows:
+            return {}
+
+        defects = self.tables["defects"]
+        defects_by_product: Dict[int, list] = {}
+        for defect in self.db.execute(
+            select(
+                defects.c.product_id,
+                defects.c.defect_type,
+                defects.c.pixel_severity_value,
+                defects.c.pixel_severity_reject,
+            ).where(
+                defects.c.product_id.in_([row.id for row in rows]),
+                defects.c.product_timestamp.between(min(timestamps), max(timestamps)),
+            )
+        ):
+            defects_by_product.setdefault(defect.product_id, []).append(defect._mapping)
+
+        existing = {}
+        for row in rows:
+            key = (row.molding_machine_id, _epoch(row.timestamp), row.shot_count)
+            fingerprint = _fingerprint(
+                row._mapping, row._mapping, defects_by_product.get(row.id, [])
+            )
+            existing[key] = (row.id, row.state_id, fingerprint)
+        return existing
+
+    def _rewrite(self, changed: List[tuple]) -> None:
+        records = [record for record, _ in changed]
+        product_ids = [match[0] for _, match in changed]
+        state_ids = [match[1] for _, match in changed]
+        products, machine_states, defects = self.build_rows(records, product_ids, state_ids)
+
+        products_table = self.tables["products"]
+        states_table = self.tables["machine_states"]
+        defects_table = self.tables["defects"]
+
+        self.db.execute(
+            products_table.update().where(
+                products_table.c.id == bindparam("_id"),
+                products_table.c.timestamp == bindparam("_timestamp"),
+            ),
+            [
+                {
+                    "_id": row["id"],
+                    "_timestamp": row["timestamp"],
+                    "version": row["version"],
+                    "overall_reject": row["overall_reject"],
+                    "defect_count": row["defect_count"],
+                    "defect_mask": row["defect_mask"],
+                }
+                for row in products
+            ],
+        )
+
+        missing_states = [row for row in machine_states if row["id"] is None]
+        present_states = [row for row in machine_states if row["id"] is not None]
+        if present_states:
+            self.db.execute(
+                states_table.update().where(
+                    states_table.c.id == bindparam("_id"),
+                    states_table.c.product_timestamp == bindparam("_timestamp"),
+                ),
+                [
+                    {
+                        "_id": row["id"],
+                        "_timestamp": row["product_timestamp"],
+                        **{name: row[name] for name in machine_state_mapper.column_names},
+                    }
+                    for row in present_states
+                ],
+            )
+        if missing_states:
+            for row, state_id in zip(
+                missing_states, self.reserve_ids("machine_states", len(missing_states))
+            ):
+                row["id"] = state_id
+            self._write("machine_states", missing_states)
+
+        timestamps = [row["timestamp"] for row in products]
+        self.db.execute(defects_table.delete().where(
+            defects_table.c.product_id.in_(product_ids),
+            defects_table.c.product_timestamp.between(min(timestamps), max(timestamps)),
+        ))
+        self._write("defects", defects)
+
+        self.counts["updated"] += len(products)
+
+    def build_rows(
+        self,
+        records: List[Dict[str, Any]],
+        product_ids: Optional[List[int]] = None,
+        state_ids: Optional[List[Optional[int]]] = None,
+    ):
+        if product_ids is None:
+            product_ids = self.reserve_ids("products", len(records))
+        if state_ids is None:
+            state_ids = self.reserve_ids("machine_states", len(records))
+        created_at = datetime.utcnow()
+        self._track_time_range(records)
+
+        products = []
+        machine_states = machine_state_mapper.rows(
+            [record.get("molding-machine-state", {}) for record in records]
+        )
+        defects = []
+
+        for record, product_id, state_id, state in zip(records, product_ids, state_ids, machine_states):
+            object_detection = record.get("object_detection", {})
+
+            timestamp = datetime.fromtimestamp(record.get("timestamp"))
+
+            product_defects = extract_defects(object_detection)
+            for defect in product_defects:
+                defect["product_id"] = product_id
+                defect["product_timestamp"] = timestamp
+                defect["molding_machine_id"] = record.get("molding_machine_id")
+
+            products.append({
+                "id": product_id,
+                "version": record.get("version"),
+                "timestamp": timestamp,
+                "molding_machine_id": record.get("molding_machine_id"),
+                "overall_reject": object_detection.get("reject", False),
+                "defect_count": len(product_defects),
+                "defect_mask": mask_for(defect["defect_type"] for defect in product_defects),
+                "total_severity_score": 0.0,
+                "created_at": created_at,
+            })
+            state["id"] = state_id
+            state["product_id"] = product_id
+            state["product_timestamp"] = timestamp
+            defects.extend(product_defects)
+
+        for defect, defect_id in zip(defects, self.reserve_ids("defects", len(defects))):
+            defect["id"] = defect_id
+
+        return products, machine_states, defects
+
+    def ensure_partitions(self, records: List[Dict[str, Any]]) -> None:
+        """
+        Create the monthly partitions the batch's rows fall into, before any
+        of them is written. Commits if it has to create one.
+        """
+        if self.dialect != "postgresql":
+            return
+        timestamps = [record.get("timestamp") for record in records]
+        months = set(partitions.months_between(
+            datetime.fromtimestamp(min(timestamps)), datetime.fromtimestamp(max(timestamps))
+        )) - self.partition_months
+        if months:
+            partitions.ensure_partitions(self.db, months, [table.name for table in self.tables.values()])
+            self.partition_months |= months
+
+    def _track_time_range(self, records: List[Dict[str, Any]]) -> None:
+        timestamps = [record.get("timestamp") for record in records]
+        first, last = min(timestamps), max(timestamps)
+        if self.time_range:
+            first, last = min(first, self.time_range[0]), max(last, self.time_range[1])
+        self.time_range = [first, last]
+
+    def reserve_ids(self, name: str, count: int) -> List[int]:
+        """Reserve a block of primary keys for the given table."""
+        if count == 0:
+            return []
+
+        if self.dialect == "postgresql":
+            # nextval() per generated row hands out ids that no concurrent
+            # writer can reuse, without holding a lock on the sequence.
+            result = self.db.execute(
+                text("SELECT nextval(:sequence) FROM generate_series(1, :count)"),
+                {"sequence": f"{name}_id_seq", "count": count},
+            )
+            return [row[0] for row in result]
+
+        table = self.tables[name]
+        with _reserved_ids_lock:
+            next_ids = _next_reserved_ids.setdefault(self.db.get_bind(), {})
+            stored = self.db.execute(select(func.coalesce(func.max(table.c.id), 0))).scalar() + 1
+            start = max(stored, next_ids.get(table.name, 0))
+            next_ids[table.name] = start + count
+        return list(range(start, start + count))
+
+    def _write(self, name: str, rows: List[Dict[str, Any]]) -> None:
+        if not rows:
+            return
+
+        table = self.tables[name]
+        if self.method == "copy":
+            self._copy(table, rows)
+        else:
+            self.db.execute(table.insert(), rows)
+
+    def _copy(self, table: Table, rows: List[Dict[str, Any]]) -> None:
+        columns = list(rows[0].keys())
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow([row[column] for column in columns])
+        buffer.seek(0)
+
+        column_list = ", ".join(f'"{column}"' for column in columns)
+        cursor = self.db.connection().connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY {table.name} ({column_list}) FROM STDIN WITH (FORMAT csv)",
+                buffer,
+            )
+        finally:
+            cursor.close()
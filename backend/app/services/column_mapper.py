@@ -0,0 +1,83 @@
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import Boolean, Integer, Numeric, Table
+
+from app.models import MachineState
+
+# Columns filled by the loader itself rather than copied from the source record.
+_GENERATED_COLUMNS = ("id", "product_id", "product_timestamp")
+
+
+def source_key(column: str) -> str:
+    """Source records name fields in PascalCase: cool_time_sp -> CoolTimeSp."""
+    return "".join(part[:1].upper() + part[1:] for part in column.split("_"))
+
+
+def _to_int(value: Any) -> Optional[int]:
+    return None if value is None else int(value)
+
+
+def _to_bool(value: Any) -> Optional[bool]:
+    return None if value is None else bool(value)
+
+
+class ColumnMapper:
+    """
+    Table-driven conversion from source dicts to column values.
+
+    The field list is resolved once from the table definition; a batch is
+    converted one column at a time with a single comprehension per column,
+    so the per-record cost is a dict lookup per field rather than ORM
+    attribute assignment.
+    """
+
+    def __init__(self, table: Table, exclude: Sequence[str] = _GENERATED_COLUMNS):
+        self.fields: List[Tuple[str, str, Optional[Callable[[Any], Any]]]] = []
+        self.scales: Dict[str, Optional[int]] = {}
+
+        for column in table.columns:
+            if column.name in exclude:
+                continue
+            if isinstance(column.type, Boolean):
+                convert = _to_bool
+            elif isinstance(column.type, Integer):
+                convert = _to_int
+            else:
+                convert = None
+            self.fields.append((column.name, source_key(column.name), convert))
+            self.scales[column.name] = (
+                column.type.scale if isinstance(column.type, Numeric) else None
+            )
+
+        self.column_names = [name for name, _, _ in self.fields]
+
+    def columns(self, sources: List[Dict[str, Any]]) -> Dict[str, List[Any]]:
+        """Convert a batch of source dicts into one value list per column."""
+        columns = {}
+        for name, key, convert in self.fields:
+            if convert is None:
+                columns[name] = [source.get(key) for source in sources]
+            else:
+                columns[name] = [convert(source.get(key)) for source in sources]
+        return columns
+
+    def rows(self, sources: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """The same conversion, transposed into one dict per record."""
+        names = self.column_names
+        columns = self.columns(sources)
+        return [dict(zip(names, values)) for values in zip(*(columns[name] for name in names))]
+
+    def fingerprint(self, values: Dict[str, Any]) -> tuple:
+        """Values rounded to the column scale, so stored and incoming rows compare equal."""
+        return tuple(
+            _round(values.get(name), self.scales[name]) for name in self.column_names
+        )
+
+
+def _round(value: Any, scale: Optional[int]) -> Any:
+    if value is None or scale is None:
+        return value
+    return round(float(value), scale)
+
+
+machine_state_mapper = ColumnMapper(MachineState.__table__)
@@ -0,0 +1,64 @@
+from typing import Iterable, List
+
+import numpy as np
+from sqlalchemy import case, func
+
+# Every defect type the detector reports. A type's position is its bit in
+# Product.defect_mask, so the order is fixed: only ever append.
+DEFECT_TYPES = (
+    "discoloration_defect",
+    "discoloration_patch_defect",
+    "flash_defect",
+    "short_defect",
+    "contamination_defect",
+    "splay_defect",
+    "burn_mark_defect",
+    "jetting_defect",
+    "flow_mark_defect",
+    "sink_mark_defect",
+    "knit_line_defect",
+    "void_defect",
+    "ejector_pin_mark_defect",
+)
+
+# defect_mask is a signed 32-bit integer.
+MAX_DEFECT_TYPES = 31
+
+DEFECT_BITS = {defect_type: 1 << bit for bit, defect_type in enumerate(DEFECT_TYPES)}
+
+
+def mask_for(defect_types: Iterable[str]) -> int:
+    mask = 0
+    for defect_type in defect_types:
+        mask |= DEFECT_BITS[defect_type]
+    return mask
+
+
+def types_in(mask: int) -> List[str]:
+    return [defect_type for defect_type, bit in DEFECT_BITS.items() if mask & bit]
+
+
+def sql_type_counts(mask_column) -> list:
+    """One aggregate per defect type, labelled with the type: rows whose mask has its bit."""
+    return [
+        func.sum(case((mask_column.op("&")(bit) != 0, 1), else_=0)).label(defect_type)
+        for defect_type, bit in DEFECT_BITS.items()
+    ]
+
+
+def _bit_matrix(masks: np.ndarray) -> np.ndarray:
+    """(len(masks), len(DEFECT_TYPES)) array of 0/1, one column per type."""
+    shifts = np.arange(len(DEFECT_TYPES), dtype=np.uint64)
+    return (masks.astype(np.uint64)[:, None] >> shifts) & np.uint64(1)
+
+
+def type_counts(masks: np.ndarray) -> np.ndarray:
+    """Count of masks with each type's bit set, in DEFECT_TYPES order."""
+    return _bit_matrix(masks).sum(axis=0, dtype=np.int64)
+
+
+def grouped_type_counts(masks: np.ndarray, codes: np.ndarray, groups: int) -> np.ndarray:
+    """(groups, len(DEFECT_TYPES)) counts, grouping the masks by ``codes``."""
+    counts = np.zeros((groups, len(DEFECT_TYPES)), dtype=np.int64)
+    np.add.at(counts, codes, _bit_matrix(masks).astype(np.int64))
+    return counts
@@ -0,0 +1,482 @@
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.models import MachineState, Product
+from app.services import defect_registry, ingestion_ledger
+
+logger = logging.getLogger(__name__)
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MICROS = {
+    "hour": 3600 * 10**6,
+    "day": 86400 * 10**6,
+    "week": 7 * 86400 * 10**6,
+}
+# The epoch was a Thursday; weeks start on Monday as with date_trunc('week').
+_WEEK_OFFSET = 3 * 86400 * 10**6
+
+# Rows fetched from the server-side cursor at a time while loading.
+_YIELD_PER = 10000
+
+
+def to_micros(value: datetime) -> int:
+    """
+    Microseconds since the epoch; naive datetimes are taken as UTC, as
+    PostgreSQL does in the API's sessions (database.CONNECT_OPTIONS).
+    """
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return (value - _EPOCH) // timedelta(microseconds=1)
+
+
+class TrendRow(NamedTuple):
+    time_bucket: datetime
+    total: int
+    rejected: int
+
+
+class HeatmapRow(NamedTuple):
+    molding_machine_id: str
+    defect_type: str
+    count: int
+
+
+class TopDefectRow(NamedTuple):
+    defect_type: str
+    count: int
+    total_defects: int
+    affected_products: int
+
+
+class DistributionRow(NamedTuple):
+    bucket: int
+    product_count: int
+
+
+class ComparisonRow(NamedTuple):
+    molding_machine_id: str
+    total: int
+    rejected: int
+
+
+class ScatterStratum(NamedTuple):
+    molding_machine_id: str
+    overall_reject: bool
+    n: int
+    sum_x: float
+    sum_y: float
+    sum_xx: float
+    sum_yy: float
+    sum_xy: float
+
+
+class ScatterPoint(NamedTuple):
+    id: int
+    cycle_time: float
+    defect_count: int
+    overall_reject: bool
+
+
+def top_defect_rows(counts: Dict[str, int], affected_products: int, limit: int) -> List[TopDefectRow]:
+    """The ``limit`` most common types, with totals over every type."""
+    counts = {defect_type: count for defect_type, count in counts.items() if count}
+    total_defects = sum(counts.values())
+    ranked = sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:limit]
+    return [
+        TopDefectRow(defect_type, count, total_defects, affected_products)
+        for defect_type, count in ranked
+    ]
+
+
+class HotSnapshot:
+    """
+    Column arrays for the products of one time window, as of one dataset
+    version. A snapshot is never modified; refreshing builds a new one.
+    """
+
+    def __init__(
+        self,
+        version: Any,
+        start: int,
+        covers_all: bool,
+        aware: bool,
+        product_ids: np.ndarray,
+        timestamps: np.ndarray,
+        machine_codes: np.ndarray,
+        machines: List[str],
+        reject: np.ndarray,
+        defect_count: np.ndarray,
+        defect_mask: np.ndarray,
+        cycle_time: np.ndarray,
+    ):
+        self.version = version
+        self.start = start
+        self.covers_all = covers_all
+        self.aware = aware
+        self.product_ids = product_ids
+        self.timestamps = timestamps
+        self.machine_codes = machine_codes
+        self.machines = machines
+        self.reject = reject
+        self.defect_count = defect_count
+        self.defect_mask = defect_mask
+        # NaN where the product has no machine state.
+        self.cycle_time = cycle_time
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(array.nbytes for array in (
+            self.product_ids, self.timestamps, self.machine_codes, self.reject,
+            self.defect_count, self.defect_mask, self.cycle_time,
+        ))
+
+    def covers(self, start_date: Optional[datetime]) -> bool:
+        """Whether every product from ``start_date`` on is in the snapshot."""
+        if start_date is None:
+            return self.covers_all
+        return self.covers_all or to_micros(start_date) >= self.start
+
+    def select(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        machine_id: Optional[str] = None,
+    ) -> np.ndarray:
+        selected = np.ones(len(self), dtype=bool)
+        if start_date:
+            selected &= self.timestamps >= to_micros(start_date)
+        if end_date:
+            selected &= self.timestamps <= to_micros(end_date)
+        if machine_id:
+            if machine_id not in self.machines:
+                return np.zeros(len(self), dtype=bool)
+            selected &= self.machine_codes == self.machines.index(machine_id)
+        return selected
+
+    def defect_rate_trend(
+        self,
+        interval: str,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        machine_id: Optional[str] = None,
+    ) -> List[TrendRow]:
+        selected = self.select(start_date, end_date, machine_id)
+        width = _MICROS[interval]
+        offset = _WEEK_OFFSET if interval == "week" else 0
+        buckets = (self.timestamps[selected] + offset) // width
+
+        starts, inverse = np.unique(buckets, return_inverse=True)
+        totals = np.bincount(inverse, minlength=len(starts))
+        rejected = np.bincount(inverse, weights=self.reject[selected], minlength=len(starts))
+
+        tz = timezone.utc if self.aware else None
+        return [
+            TrendRow(
+                (_EPOCH + timedelta(microseconds=int(start) * width - offset)).replace(tzinfo=tz),
+                int(total),
+                int(rejects),
+            )
+            for start, total, rejects in zip(starts, totals, rejected)
+        ]
+
+    def machine_defect_heatmap(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+    ) -> List[HeatmapRow]:
+        selected = self.select(start_date, end_date)
+        counts = defect_registry.grouped_type_counts(
+            self.defect_mask[selected], self.machine_codes[selected], len(self.machines)
+        )
+        return [
+            HeatmapRow(self.machines[code], defect_type, int(counts[code, bit]))
+            for bit, defect_type in enumerate(defect_registry.DEFECT_TYPES)
+            for code in np.flatnonzero(counts[:, bit])
+        ]
+
+    def top_defects(
+        self,
+        limit: int,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        machine_id: Optional[str] = None,
+    ) -> List[TopDefectRow]:
+        masks = self.defect_mask[self.select(start_date, end_date, machine_id)]
+        counts = defect_registry.type_counts(masks)
+        return top_defect_rows(
+            {defect_type: int(count) for defect_type, count in zip(defect_registry.DEFECT_TYPES, counts)},
+            int(np.count_nonzero(masks)),
+            limit,
+        )
+
+    def defect_distribution(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        machine_id: Optional[str] = None,
+    ) -> List[DistributionRow]:
+        defect_count = self.defect_count[self.select(start_date, end_date, machine_id)]
+        counts = np.bincount(np.minimum(defect_count, 5), minlength=6)
+        return [
+            DistributionRow(bucket, int(count))
+            for bucket, count in enumerate(counts) if count
+        ]
+
+    def machine_comparison(self) -> List[ComparisonRow]:
+        totals = np.bincount(self.machine_codes, minlength=len(self.machines))
+        rejected = np.bincount(self.machine_codes, weights=self.reject, minlength=len(self.machines))
+        return [
+            ComparisonRow(machine, int(total), int(rejects))
+            for machine, total, rejects in zip(self.machines, totals, rejected)
+            if total
+        ]
+
+    def cycle_time_strata(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        machine_id: Optional[str] = None,
+    ) -> List[ScatterStratum]:
+        """Count and sums of products with a cycle time, per machine and reject status."""
+        selected = self.select(start_date, end_date, machine_id) & ~np.isnan(self.cycle_time)
+        x = self.cycle_time[selected].astype(np.float64)
+        y = self.defect_count[selected].astype(np.float64)
+        strata = self._strata(selected)
+
+        size = 2 * len(self.machines)
+        n = np.bincount(strata, minlength=size)
+        sums = [
+            np.bincount(strata, weights=weights, minlength=size)
+            for weights in (x, y, x * x, y * y, x * y)
+        ]
+        return [
+            ScatterStratum(
+                self.machines[stratum // 2], bool(stratum % 2), int(n[stratum]),
+                *(float(column[stratum]) for column in sums),
+            )
+            for stratum in np.flatnonzero(n)
+        ]
+
+    def cycle_time_sample(
+        self,
+        quotas: Dict[Any, int],
+        stratified: bool,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        machine_id: Optional[str] = None,
+    ) -> List[ScatterPoint]:
+        """
+        Random products with a cycle time: ``quotas`` maps each (machine,
+        rejected) stratum, or None when not ``stratified``, to its point count.
+        """
+        selected = np.flatnonzero(self.select(start_date, end_date, machine_id) & ~np.isnan(self.cycle_time))
+        rng = np.random.default_rng()
+
+        if stratified:
+            strata = self._strata(selected)
+            picks = []
+            for (machine, rejected), quota in quotas.items():
+                members = selected[strata == 2 * self.machines.index(machine) + int(rejected)]
+                picks.append(rng.choice(members, size=min(quota, len(members)), replace=False))
+            rows = np.concatenate(picks) if picks else selected[:0]
+        else:
+            rows = rng.choice(selected, size=min(quotas[None], len(selected)), replace=False)
+
+        return [
+            ScatterPoint(
+                int(self.product_ids[row]),
+                # machine_states.cycle_time has three decimals
+                round(float(self.cycle_time[row]), 3),
+                int(self.defect_count[row]),
+                bool(self.reject[row]),
+            )
+            for row in rows
+        ]
+
+    def _strata(self, selected: np.ndarray) -> np.ndarray:
+        """Machine and reject status of the selected products as one code."""
+        return 2 * self.machine_codes[selected] + self.reject[selected]
+
+
+# Per-product columns read from each row: (dtype, value).
+_COLUMNS: Dict[str, Tuple[Any, Callable[[Any], Any]]] = {
+    "product_ids": (np.int64, lambda row: row.id),
+    "timestamps": (np.int64, lambda row: to_micros(row.timestamp)),
+    "reject": (bool, lambda row: row.overall_reject),
+    "defect_count": (np.int16, lambda row: row.defect_count),
+    "defect_mask": (np.uint32, lambda row: row.defect_mask),
+    "cycle_time": (np.float32, lambda row: np.nan if row.cycle_time is None else float(row.cycle_time)),
+}
+
+# Slack below an append's first record time, for float rounding of the
+# epoch timestamps checkpoints record.
+_APPEND_SLACK = timedelta(seconds=1)
+
+
+def load_snapshot(db: Session, days: float, previous: Optional[HotSnapshot] = None) -> HotSnapshot:
+    """
+    Read the products of the last ``days`` days of data into column arrays.
+
+    When every load since ``previous`` was an append, only rows from the
+    earliest record those loads wrote are read; older rows of the window
+    are carried over from ``previous``. An empty database gives an empty
+    snapshot, so its version is still recorded.
+    """
+    version = ingestion_ledger.dataset_version(db)
+    first, last = db.execute(select(func.min(Product.timestamp), func.max(Product.timestamp))).one()
+    if last is None:
+        db.commit()
+        return HotSnapshot(
+            version=version, start=0, covers_all=True, aware=False,
+            machines=[], machine_codes=np.empty(0, dtype=np.int32),
+            **{name: np.empty(0, dtype=dtype) for name, (dtype, _) in _COLUMNS.items()},
+        )
+
+    start = last - timedelta(days=days)
+    read_from = start
+    carried = None
+    if previous is not None and to_micros(start) >= previous.start:
+        appended = ingestion_ledger.appended_since(db, previous.version)
+        if appended is not None:
+            # Stored as written: naive, or read as UTC by the session
+            read_from = max(start, appended.replace(tzinfo=last.tzinfo) - _APPEND_SLACK)
+            carried = (previous.timestamps >= to_micros(start)) & (previous.timestamps < to_micros(read_from))
+
+    codes: Dict[str, int] = {}
+    chunks: Dict[str, List[np.ndarray]] = {name: [] for name in (*_COLUMNS, "machine_codes")}
+    if carried is not None:
+        codes = {machine: code for code, machine in enumerate(previous.machines)}
+        for name in chunks:
+            chunks[name].append(getattr(previous, name)[carried])
+
+    products = db.execute(
+        select(
+            Product.id,
+            Product.timestamp,
+            Product.molding_machine_id,
+            Product.overall_reject,
+            Product.defect_count,
+            Product.defect_mask,
+            MachineState.cycle_time,
+        )
+        .outerjoin(MachineState, Product.machine_state)
+        .where(Product.timestamp >= read_from),
+        execution_options={"stream_results": True, "yield_per": _YIELD_PER},
+    )
+    for rows in products.partitions():
+        for name, (dtype, value) in _COLUMNS.items():
+            chunks[name].append(np.fromiter((value(row) for row in rows), dtype=dtype, count=len(rows)))
+        chunks["machine_codes"].append(np.fromiter(
+            (codes.setdefault(row.molding_machine_id, len(codes)) for row in rows),
+            dtype=np.int32, count=len(rows),
+        ))
+    db.commit()
+
+    columns = {
+        name: np.concatenate(parts) if parts else np.empty(0, dtype=_COLUMNS.get(name, (np.int32,))[0])
+        for name, parts in chunks.items()
+    }
+    # Keep machines sorted, whatever order they were first seen in
+    machines = sorted(codes)
+    recode = np.empty(len(codes), dtype=np.int32)
+    recode[[codes[machine] for machine in machines]] = np.arange(len(machines), dtype=np.int32)
+    columns["machine_codes"] = recode[columns["machine_codes"]]
+
+    if carried is not None:
+        logger.info(f"Hot store carried over {int(carried.sum())} products, read the rest from {read_from}")
+
+    return HotSnapshot(
+        version=version,
+        start=to_micros(start),
+        covers_all=first >= start,
+        aware=last.tzinfo is not None,
+        machines=machines,
+        **columns,
+    )
+
+
+class HotStore:
+    """
+    In-process column store for the most recent ``days`` of products.
+
+    The snapshot is tagged with the dataset version it was read at, and is
+    only served while ``version_loader`` still returns that version; use
+    the response cache's loader so the two never disagree about which data
+    a response reflects. When a load finishes, requests fall back to SQL
+    while a background thread reads the new snapshot, carrying over what
+    an append left unchanged.
+    """
+
+    def __init__(
+        self,
+        session_factory: sessionmaker,
+        version_loader: Callable[[Session], Any],
+        days: float = 7.0,
+        enabled: bool = True,
+    ):
+        self.session_factory = session_factory
+        self.version_loader = version_loader
+        self.days = days
+        self.enabled = enabled
+        self.snapshot: Optional[HotSnapshot] = None
+        self._refreshing = False
+        self._lock = threading.Lock()
+
+    def covering(self, db: Session, start_date: Optional[datetime]) -> Optional[HotSnapshot]:
+        """The current snapshot if it can answer a query from ``start_date`` on."""
+        if not self.enabled:
+            return None
+        snapshot = self.snapshot
+        if snapshot is None or snapshot.version != self.version_loader(db):
+            self.refresh_in_background()
+            return None
+        return snapshot if snapshot.covers(start_date) else None
+
+    def refresh(self, db: Session) -> None:
+        snapshot = load_snapshot(db, self.days, previous=self.snapshot)
+        self.snapshot = snapshot
+        logger.info(
+            f"Hot store holds {len(snapshot)} products ({snapshot.nbytes} bytes) "
+            f"at dataset version {snapshot.version}"
+        )
+
+    def refresh_in_background(self) -> None:
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._refresh_with_own_session, name="hot-store-refresh", daemon=True).start()
+
+    def _refresh_with_own_session(self) -> None:
+        db = self.session_factory()
+        try:
+            self.refresh(db)
+        except Exception as e:
+            logger.error(f"Hot store refresh failed: {e}")
+        finally:
+            db.close()
+            with self._lock:
+                self._refreshing = False
+
+    def clear(self) -> None:
+        self.snapshot = None
+
+    def stats(self) -> Dict[str, Any]:
+        snapshot = self.snapshot
+        return {
+            "enabled": self.enabled,
+            "days": self.days,
+            "dataset_version": snapshot.version if snapshot else None,
+            "products": len(snapshot) if snapshot else 0,
+            "bytes": snapshot.nbytes if snapshot else 0,
+            "covers_all": snapshot.covers_all if snapshot else False,
+        }
@@ -0,0 +1,151 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.models import DatasetIngestion, IngestionCheckpoint
+
+
+LOAD_MODES = ("replace", "append", "swap")
+
+# Modes that leave only the loaded dataset behind.
+REPLACING_MODES = ("replace", "swap")
+
+# Loader counts a shard checkpoint records.
+CHECKPOINT_COUNTS = ("products", "machine_states", "defects", "updated", "unchanged")
+
+
+def find_loaded(db: Session, dataset_hash: str) -> Optional[DatasetIngestion]:
+    """
+    Return the ledger entry if this dataset is part of what the database holds.
+
+    A replace or swap load wipes whatever was there before, so a dataset
+    counts as present only if it completed at or after the most recent one.
+    """
+    completed = db.query(DatasetIngestion).filter(DatasetIngestion.status == "completed")
+
+    last_replace = (
+        completed.filter(DatasetIngestion.mode.in_(REPLACING_MODES))
+        .order_by(DatasetIngestion.id.desc())
+        .first()
+    )
+
+    query = completed.filter(DatasetIngestion.dataset_hash == dataset_hash)
+    if last_replace is not None:
+        query = query.filter(DatasetIngestion.id >= last_replace.id)
+    return query.order_by(DatasetIngestion.id.desc()).first()
+
+
+def dataset_version(db: Session) -> int:
+    """
+    Id of the most recently finished load. It changes whenever a load
+    completes or fails (a failed replace may have left data changed).
+    """
+    version = (
+        db.query(func.max(DatasetIngestion.id))
+        .filter(DatasetIngestion.status.in_(("completed", "failed")))
+        .scalar()
+    )
+    return version or 0
+
+
+def appended_since(db: Session, version: int) -> Optional[datetime]:
+    """
+    Earliest record time written by the loads that finished after
+    ``version``, as the loader stored it, when all of them were appends
+    whose shards left checkpoints; rows before it are as they were at
+    ``version``. None when there are no such loads or one of them may have
+    changed rows anywhere.
+    """
+    entries = (
+        db.query(DatasetIngestion.id, DatasetIngestion.mode)
+        .filter(DatasetIngestion.id > version, DatasetIngestion.status.in_(("completed", "failed")))
+        .all()
+    )
+    if not entries or any(entry.mode != "append" for entry in entries):
+        return None
+
+    first, checkpointed = (
+        db.query(func.min(IngestionCheckpoint.first_timestamp), func.count(IngestionCheckpoint.ingestion_id.distinct()))
+        .filter(IngestionCheckpoint.ingestion_id.in_([entry.id for entry in entries]))
+        .one()
+    )
+    if first is None or checkpointed < len(entries):
+        return None
+    return datetime.fromtimestamp(first)
+
+
+def start_load(db: Session, dataset_info: Dict[str, Any]) -> DatasetIngestion:
+    entry = DatasetIngestion(
+        dataset_hash=dataset_info["hash"],
+        source_url=dataset_info.get("url"),
+        s3_uri=dataset_info.get("s3_uri"),
+        size_bytes=dataset_info.get("size_bytes"),
+        mode=dataset_info.get("mode", "replace"),
+        status="running",
+    )
+    db.add(entry)
+    db.commit()
+    return entry
+
+
+def get_load(db: Session, ingestion_id: int) -> DatasetIngestion:
+    entry = db.get(DatasetIngestion, ingestion_id)
+    if entry is None:
+        raise ValueError(f"Unknown ingestion: {ingestion_id}")
+    return entry
+
+
+def get_checkpoint(db: Session, ingestion_id: int, shard_index: int) -> Dict[str, Any]:
+    """The progress a shard committed on an earlier attempt, or {} if it has none."""
+    checkpoint = db.get(IngestionCheckpoint, (ingestion_id, shard_index))
+    if checkpoint is None:
+        return {}
+    time_range = None
+    if checkpoint.first_timestamp is not None:
+        time_range = [checkpoint.first_timestamp, checkpoint.last_timestamp]
+    return {
+        "offset": checkpoint.byte_offset,
+        "counts": {key: getattr(checkpoint, key) for key in CHECKPOINT_COUNTS},
+        "time_range": time_range,
+    }
+
+
+def save_checkpoint(
+    db: Session,
+    ingestion_id: int,
+    shard_index: int,
+    offset: int,
+    counts: Dict[str, int],
+    time_range: Optional[List[float]],
+) -> None:
+    """Record a shard's progress without committing; the caller's batch commit makes it durable."""
+    checkpoint = db.get(IngestionCheckpoint, (ingestion_id, shard_index))
+    if checkpoint is None:
+        checkpoint = IngestionCheckpoint(ingestion_id=ingestion_id, shard_index=shard_index)
+        db.add(checkpoint)
+    checkpoint.byte_offset = offset
+    for key in CHECKPOINT_COUNTS:
+        setattr(checkpoint, key, counts.get(key, 0))
+    checkpoint.first_timestamp, checkpoint.last_timestamp = time_range or (None, None)
+    db.flush()
+
+
+def complete_load(db: Session, entry: DatasetIngestion, stats: Dict[str, int]) -> None:
+    entry.status = "completed"
+    entry.products = stats["products"]
+    entry.machine_states = stats["machine_states"]
+    entry.defects = stats["defects"]
+    entry.loaded_at = datetime.utcnow()
+    db.commit()
+
+
+def fail_load(db: Session, entry: DatasetIngestion) -> None:
+    entry.status = "failed"
+    db.commit()
+
+
+def mark_views_refreshed(db: Session, entry: DatasetIngestion) -> None:
+    entry.views_refreshed_at = datetime.utcnow()
+    db.commit()
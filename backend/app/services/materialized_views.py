@@ -0,0 +1,127 @@
+import logging
+from typing import Dict, List
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, text
+from sqlalchemy.orm import Session
+
+from app.models import DatasetIngestion
+
+logger = logging.getLogger(__name__)
+
+# The views are read like tables, but are kept off Base.metadata so
+# create_all never creates them as tables.
+metadata = MetaData()
+
+machine_comparison = Table(
+    "mv_machine_comparison",
+    metadata,
+    Column("molding_machine_id", String(50), primary_key=True),
+    Column("total_products", Integer),
+    Column("rejected_products", Integer),
+)
+
+machine_defect_heatmap = Table(
+    "mv_machine_defect_heatmap",
+    metadata,
+    Column("molding_machine_id", String(50), primary_key=True),
+    Column("defect_type", String(50), primary_key=True),
+    Column("defect_count", Integer),
+)
+
+daily_defect_rate = Table(
+    "mv_daily_defect_rate",
+    metadata,
+    Column("day", DateTime(timezone=True), primary_key=True),
+    Column("molding_machine_id", String(50), primary_key=True),
+    Column("total_products", Integer),
+    Column("rejected_products", Integer),
+)
+
+# Each view covers all data, for requests without a date range.
+VIEW_QUERIES: Dict[str, str] = {
+    machine_comparison.name: """
+        SELECT molding_machine_id,
+               count(*) AS total_products,
+               sum(CASE WHEN overall_reject THEN 1 ELSE 0 END) AS rejected_products
+        FROM products
+        GROUP BY molding_machine_id""",
+    machine_defect_heatmap.name: """
+        SELECT molding_machine_id, defect_type, count(*) AS defect_count
+        FROM defects
+        GROUP BY molding_machine_id, defect_type""",
+    daily_defect_rate.name: """
+        SELECT date_trunc('day', timestamp) AS day,
+               molding_machine_id,
+               count(*) AS total_products,
+               sum(CASE WHEN overall_reject THEN 1 ELSE 0 END) AS rejected_products
+        FROM products
+        GROUP BY 1, 2""",
+}
+
+VIEWS = (machine_comparison, machine_defect_heatmap, daily_defect_rate)
+
+
+def create_ddl(with_data: bool = True) -> List[str]:
+    """
+    Statements creating any missing view and its unique index, which
+    REFRESH ... CONCURRENTLY requires. Views created without data must
+    have one plain refresh before they can be read.
+    """
+    statements = []
+    for view in VIEWS:
+        key = ", ".join(column.name for column in view.primary_key.columns)
+        statements.append(
+            f"CREATE MATERIALIZED VIEW IF NOT EXISTS {view.name} AS {VIEW_QUERIES[view.name]} "
+            f"WITH {'DATA' if with_data else 'NO DATA'}"
+        )
+        statements.append(f"CREATE UNIQUE INDEX IF NOT EXISTS uq_{view.name} ON {view.name} ({key})")
+    return statements
+
+
+def refresh(db: Session) -> None:
+    """
+    Recompute every view. Populated views are refreshed concurrently, so
+    readers keep seeing the old rows until the new ones are in place.
+    No-op on other databases.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return
+
+    for statement in create_ddl():
+        db.execute(text(statement))
+    populated = _populated(db)
+    for view in VIEWS:
+        concurrently = "CONCURRENTLY " if populated[view.name] else ""
+        db.execute(text(f"REFRESH MATERIALIZED VIEW {concurrently}{view.name}"))
+    db.commit()
+
+    logger.info("Refreshed materialized views")
+
+
+def available(db: Session) -> bool:
+    """
+    The views are read only on PostgreSQL, once they hold data (a swap
+    recreates them empty) and have been refreshed after the most recently
+    finished load.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return False
+
+    latest = (
+        db.query(DatasetIngestion.views_refreshed_at)
+        .filter(DatasetIngestion.status.in_(("completed", "failed")))
+        .order_by(DatasetIngestion.id.desc())
+        .first()
+    )
+    if latest is None or latest.views_refreshed_at is None:
+        return False
+
+    populated = _populated(db)
+    return all(populated.get(view.name) for view in VIEWS)
+
+
+def _populated(db: Session) -> Dict[str, bool]:
+    return dict(db.execute(
+        text("SELECT matviewname, ispopulated FROM pg_matviews WHERE matviewname = ANY(:names)"),
+        {"names": [view.name for view in VIEWS]},
+    ).all())
@@ -0,0 +1,182 @@
+import logging
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# Partitioned tables and their partition key, parents first. Children are
+# partitioned on a copy of the product timestamp with the same monthly
+# bounds, so a product and its rows always live in same-month partitions.
+PARTITION_KEYS: Dict[str, str] = {
+    "products": "timestamp",
+    "machine_states": "product_timestamp",
+    "defects": "product_timestamp",
+}
+
+
+def month_start(value: datetime) -> date:
+    return date(value.year, value.month, 1)
+
+
+def next_month(month: date) -> date:
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def months_between(first: datetime, last: datetime) -> List[date]:
+    """Every month from the one holding ``first`` to the one holding ``last``."""
+    months = []
+    month = month_start(first)
+    while month <= month_start(last):
+        months.append(month)
+        month = next_month(month)
+    return months
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_{month:%Y_%m}"
+
+
+def partition_bounds(month: date) -> str:
+    return f"FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month(month).isoformat()}')"
+
+
+def create_partition_ddl(table: str, month: date) -> str:
+    return (
+        f"CREATE TABLE IF NOT EXISTS {partition_name(table, month)} "
+        f"PARTITION OF {table} {partition_bounds(month)}"
+    )
+
+
+def existing_partitions(db: Session, table: str) -> Set[str]:
+    return set(db.execute(
+        text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE pg_inherits.inhparent = CAST(:table AS regclass)"
+        ),
+        {"table": table},
+    ).scalars())
+
+
+def ensure_partitions(
+    db: Session,
+    months: Iterable[date],
+    tables: Optional[Iterable[str]] = None,
+) -> List[str]:
+    """
+    Create any missing monthly partitions of ``tables`` (the live tables by
+    default) and return the names created. No-op outside PostgreSQL.
+
+    Creating a partition locks its parent, so loaders call this before they
+    start inserting rather than while other writers hold the table.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return []
+
+    created = []
+    for table in tables or PARTITION_KEYS:
+        existing = existing_partitions(db, table)
+        for month in sorted(set(months)):
+            if partition_name(table, month) not in existing:
+                db.execute(text(create_partition_ddl(table, month)))
+                created.append(partition_name(table, month))
+    db.commit()
+
+    if created:
+        logger.info(f"Created partitions: {', '.join(created)}")
+    return created
+
+
+def drop_months_ddl(months: Iterable[date]) -> List[str]:
+    """
+    Statements dropping whole months of data.
+
+    Child partitions go first; the product partition is detached before it
+    is dropped, which succeeds once nothing references its rows.
+    """
+    statements = []
+    for month in sorted(months):
+        for table in reversed(PARTITION_KEYS):
+            partition = partition_name(table, month)
+            if table == "products":
+                statements.append(f"ALTER TABLE {table} DETACH PARTITION {partition}")
+            statements.append(f"DROP TABLE {partition}")
+    return statements
+
+
+def drop_partitions_before(db: Session, cutoff: datetime) -> List[date]:
+    """
+    Retention: drop every month that ends on or before ``cutoff``. This
+    replaces a DELETE over the whole range with a catalog change per table.
+    """
+    _require_postgresql(db)
+
+    expired = sorted(
+        month for month in partition_months(db)
+        if next_month(month) <= cutoff.date()
+    )
+    for statement in drop_months_ddl(expired):
+        db.execute(text(statement))
+    db.commit()
+    return expired
+
+
+def detach_month(db: Session, month: date) -> List[str]:
+    """
+    Detach one month from all three tables, leaving standalone tables to
+    archive or reload; ``attach_month`` puts them back.
+
+    Detached child tables keep a copy of their foreign key, which would stop
+    the product partition from detaching, so it is dropped with them.
+    """
+    _require_postgresql(db)
+
+    detached = []
+    for table in reversed(PARTITION_KEYS):
+        partition = partition_name(table, month)
+        db.execute(text(f"ALTER TABLE {table} DETACH PARTITION {partition}"))
+        if table != "products":
+            for constraint in db.execute(
+                text(
+                    "SELECT conname FROM pg_constraint "
+                    "WHERE conrelid = CAST(:table AS regclass) AND contype = 'f'"
+                ),
+                {"table": partition},
+            ).scalars():
+                db.execute(text(f'ALTER TABLE {partition} DROP CONSTRAINT "{constraint}"'))
+        detached.append(partition)
+    db.commit()
+    return detached
+
+
+def attach_month(db: Session, month: date) -> List[str]:
+    """
+    Attach standalone month tables, products first so the child foreign
+    keys can be validated against it.
+    """
+    _require_postgresql(db)
+
+    attached = []
+    for table in PARTITION_KEYS:
+        partition = partition_name(table, month)
+        db.execute(text(f"ALTER TABLE {table} ATTACH PARTITION {partition} {partition_bounds(month)}"))
+        attached.append(partition)
+    db.commit()
+    return attached
+
+
+def partition_months(db: Session, table: str = "products") -> Set[date]:
+    """The months ``table`` has partitions for."""
+    months = set()
+    for name in existing_partitions(db, table):
+        year, month = name[len(table) + 1:].split("_")
+        months.add(date(int(year), int(month), 1))
+    return months
+
+
+def _require_postgresql(db: Session) -> None:
+    if db.get_bind().dialect.name != "postgresql":
+        raise ValueError("Partition maintenance requires PostgreSQL")
@@ -0,0 +1,205 @@
+import csv
+import io
+import json
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import Boolean, DateTime, Integer, Numeric, select, tuple_
+from sqlalchemy.orm import Session
+
+from app.models import Defect, MachineState, Product
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+# Rows fetched from the server-side cursor at a time within one page.
+_YIELD_PER = 1000
+
+
+def _export_columns(table: str) -> list:
+    if table == "products":
+        return list(Product.__table__.columns) + [
+            column for column in MachineState.__table__.columns
+            if column.name not in ("id", "product_id", "product_timestamp")
+        ]
+    if table == "defects":
+        return [
+            column for column in Defect.__table__.columns
+            if column.name not in ("product_timestamp", "molding_machine_id")
+        ] + [Product.timestamp, Product.molding_machine_id]
+    raise ValueError(f"Unknown export table: {table}")
+
+
+def export_query(
+    table: str,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    machine_id: Optional[str] = None,
+):
+    """Filtered rows of ``table`` in (products.timestamp, id) order."""
+    columns = _export_columns(table)
+    if table == "products":
+        key = Product.id
+        query = select(*columns).select_from(Product).outerjoin(
+            MachineState, Product.machine_state
+        )
+    else:
+        key = Defect.id
+        query = select(*columns).select_from(Defect).join(
+            Product, Defect.product
+        )
+
+    if start_date:
+        query = query.where(Product.timestamp >= start_date)
+    if end_date:
+        query = query.where(Product.timestamp <= end_date)
+    if machine_id:
+        query = query.where(Product.molding_machine_id == machine_id)
+
+    return query.order_by(Product.timestamp, key), key
+
+
+def iter_pages(
+    db: Session,
+    table: str,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    machine_id: Optional[str] = None,
+    after: Optional[Tuple[datetime, int]] = None,
+    limit: Optional[int] = None,
+    page_size: int = 10000,
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Yield the export as lists of row dicts, ``page_size`` rows at most.
+
+    Each page is its own keyset query, ``(timestamp, id) > last row``, so
+    no query scans past rows it does not return and no transaction stays
+    open between pages. Within a page, rows are fetched from a server-side
+    cursor. ``after`` resumes an export from the last row a client saw.
+    """
+    query, key = export_query(table, start_date, end_date, machine_id)
+    remaining = limit
+
+    while remaining is None or remaining > 0:
+        page_query = query
+        if after is not None:
+            page_query = page_query.where(tuple_(Product.timestamp, key) > tuple_(*after))
+        size = page_size if remaining is None else min(page_size, remaining)
+
+        result = db.execute(
+            page_query.limit(size),
+            execution_options={"stream_results": True, "yield_per": _YIELD_PER},
+        )
+        page = [dict(row._mapping) for row in result]
+        db.commit()
+
+        if not page:
+            return
+        yield page
+
+        last = page[-1]
+        after = (last["timestamp"], last["id"])
+        if remaining is not None:
+            remaining -= len(page)
+        if len(page) < size:
+            return
+
+
+def _plain(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def ndjson_chunks(table: str, pages: Iterator[List[Dict[str, Any]]]) -> Iterator[bytes]:
+    for page in pages:
+        yield "".join(
+            json.dumps({name: _plain(value) for name, value in row.items()}) + "\n"
+            for row in page
+        ).encode("utf-8")
+
+
+def csv_chunks(table: str, pages: Iterator[List[Dict[str, Any]]]) -> Iterator[bytes]:
+    names = [column.name for column in _export_columns(table)]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(names)
+
+    for page in pages:
+        writer.writerows([_plain(row[name]) for name in names] for row in page)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def arrow_schema(table: str):
+    import pyarrow as pa
+
+    fields = []
+    for column in _export_columns(table):
+        if isinstance(column.type, Boolean):
+            arrow_type = pa.bool_()
+        elif isinstance(column.type, Integer):
+            arrow_type = pa.int64()
+        elif isinstance(column.type, Numeric):
+            arrow_type = pa.float64()
+        elif isinstance(column.type, DateTime):
+            arrow_type = pa.timestamp("us", tz="UTC") if column.type.timezone else pa.timestamp("us")
+        else:
+            arrow_type = pa.string()
+        fields.append(pa.field(column.name, arrow_type, nullable=column.nullable))
+    return pa.schema(fields)
+
+
+def arrow_chunks(table: str, pages: Iterator[List[Dict[str, Any]]]) -> Iterator[bytes]:
+    """An Arrow IPC stream with one record batch per page."""
+    import pyarrow as pa
+
+    schema = arrow_schema(table)
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        for page in pages:
+            writer.write_batch(pa.RecordBatch.from_pylist(
+                [{name: _plain_number(value) for name, value in row.items()} for row in page],
+                schema=schema,
+            ))
+            yield _drain(sink)
+    yield _drain(sink)
+
+
+def _plain_number(value: Any) -> Any:
+    return float(value) if isinstance(value, Decimal) else value
+
+
+def _drain(sink: io.BytesIO) -> bytes:
+    data = sink.getvalue()
+    sink.seek(0)
+    sink.truncate()
+    return data
+
+
+def require_format(format: str) -> None:
+    """Fail before the response starts if the format cannot be produced."""
+    if format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {format}")
+    if format == "arrow":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError as e:
+            raise ValueError("format=arrow requires the pyarrow package") from e
+
+
+CHUNK_WRITERS = {
+    "ndjson": ndjson_chunks,
+    "csv": csv_chunks,
+    "arrow": arrow_chunks,
+}
@@ -0,0 +1,122 @@
+import codecs
+import json
+import os
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+_SEPARATORS = " \t\r\n,"
+
+
+class RecordReader:
+    """
+    Incremental reader for dataset files.
+
+    Accepts either a JSON array of objects or newline-delimited JSON and
+    yields one record at a time while holding at most one read chunk (plus
+    the record being decoded) in memory. ``offset`` is the byte position
+    just past the last yielded record, so a later reader can resume there;
+    ``start_offset``/``end_offset`` restrict reading to the records that
+    begin inside that byte range.
+    """
+
+    def __init__(
+        self,
+        filepath: str,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        start_offset: int = 0,
+        end_offset: Optional[int] = None,
+    ):
+        self.filepath = filepath
+        self.chunk_size = chunk_size
+        self.start_offset = start_offset
+        self.end_offset = end_offset
+        self.offset = start_offset
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        decoder = json.JSONDecoder()
+        text_decoder = codecs.getincrementaldecoder("utf-8")()
+        self.offset = self.start_offset
+
+        with open(self.filepath, "rb") as f:
+            f.seek(self.start_offset)
+
+            buffer = ""
+            pos = 0
+            eof = False
+            seen_structure = False
+
+            while self.end_offset is None or self.offset < self.end_offset:
+                while pos < len(buffer) and buffer[pos] in _SEPARATORS:
+                    pos += 1
+                    self.offset += 1
+
+                if pos == len(buffer):
+                    if eof:
+                        return
+                    buffer, pos, eof = self._fill(f, text_decoder, buffer, pos)
+                    continue
+
+                char = buffer[pos]
+                if char == "[" and not seen_structure and self.start_offset == 0:
+                    seen_structure = True
+                    pos += 1
+                    self.offset += 1
+                    continue
+                if char == "]":
+                    return
+                seen_structure = True
+
+                try:
+                    record, end = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                    buffer, pos, eof = self._fill(f, text_decoder, buffer, pos)
+                    continue
+
+                if not isinstance(record, dict):
+                    raise ValueError(f"Expected a JSON object at byte {self.offset}")
+
+                segment = buffer[pos:end]
+                self.offset += len(segment) if segment.isascii() else len(segment.encode("utf-8"))
+                pos = end
+                yield record
+
+    def _fill(self, f, text_decoder, buffer: str, pos: int):
+        chunk = f.read(self.chunk_size)
+        eof = not chunk
+        return buffer[pos:] + text_decoder.decode(chunk, final=eof), 0, eof
+
+
+def plan_shards(
+    filepath: str,
+    shard_count: int,
+    on_record: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> List[Dict[str, int]]:
+    """
+    Split a dataset file into up to ``shard_count`` byte ranges of roughly
+    equal size, each starting and ending on a record boundary. ``on_record``
+    sees every record on the way, so callers can gather stats in the same pass.
+    """
+    target = max(1, os.path.getsize(filepath) // max(1, shard_count))
+    shards = []
+    reader = RecordReader(filepath)
+    start = 0
+    records = 0
+
+    for record in reader:
+        if on_record:
+            on_record(record)
+        records += 1
+        if reader.offset - start >= target and len(shards) < shard_count - 1:
+            shards.append({"start_offset": start, "end_offset": reader.offset, "records": records})
+            start = reader.offset
+            records = 0
+
+    if records:
+        shards.append({"start_offset": start, "end_offset": reader.offset, "records": records})
+
+    for index, shard in enumerate(shards):
+        shard["index"] = index
+    return shards
@@ -0,0 +1,135 @@
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import Table, case, func, insert, select, text
+from sqlalchemy.orm import Session
+
+from app.models import (
+    Product,
+    Defect,
+    DatasetIngestion,
+    MachineHourlyRollup,
+    MachineDefectHourlyRollup,
+)
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_TABLES = (MachineHourlyRollup.__table__, MachineDefectHourlyRollup.__table__)
+
+
+def hour_bucket(db: Session, column):
+    """SQL expression truncating ``column`` to the start of its hour."""
+    if db.get_bind().dialect.name == "postgresql":
+        return func.date_trunc("hour", column)
+    # Match the string format SQLAlchemy stores DateTime values in, so
+    # rollup hours compare correctly against bound datetimes.
+    return func.strftime("%Y-%m-%d %H:00:00.000000", column)
+
+
+def hour_range(first_timestamp: float, last_timestamp: float) -> Tuple[datetime, datetime]:
+    """The half-open range of whole hours covering two record timestamps."""
+    start = datetime.fromtimestamp(first_timestamp).replace(minute=0, second=0, microsecond=0)
+    end = datetime.fromtimestamp(last_timestamp).replace(minute=0, second=0, microsecond=0)
+    return start, end + timedelta(hours=1)
+
+
+def is_hour_aligned(start_date: Optional[datetime], end_date: Optional[datetime]) -> bool:
+    """
+    Whether a filter can be answered from hourly buckets: the start is on
+    an hour boundary and the end is the last second of an hour (the
+    dashboard sends T00:00:00 and T23:59:59), either whole or to its last
+    microsecond. Any other fraction of that second would cut into the hour.
+    """
+    if start_date and (start_date.minute, start_date.second, start_date.microsecond) != (0, 0, 0):
+        return False
+    if end_date and (
+        (end_date.minute, end_date.second) != (59, 59) or end_date.microsecond not in (0, 999999)
+    ):
+        return False
+    return True
+
+
+def available(db: Session) -> bool:
+    """Rollups are maintained once data has been loaded through ingestion."""
+    return db.query(DatasetIngestion.id).filter(DatasetIngestion.status == "completed").first() is not None
+
+
+def clear(db: Session) -> None:
+    for table in ROLLUP_TABLES:
+        db.execute(table.delete())
+    db.commit()
+
+
+def refresh(
+    db: Session,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    tables: Optional[Dict[str, Table]] = None,
+    commit: bool = True,
+) -> None:
+    """
+    Recompute the rollup rows for hours in [start, end), or for all hours.
+
+    ``tables`` reads other copies of products and defects, as swap loads
+    do with their shadow tables; ``commit=False`` leaves the refresh in
+    the caller's transaction.
+
+    Refreshes take an EXCLUSIVE lock on PostgreSQL so parallel shards that
+    touch the same hour apply their delete-and-insert one after another;
+    readers are not blocked.
+    """
+    products_table = tables["products"] if tables else Product.__table__
+    defects_table = tables["defects"] if tables else Defect.__table__
+
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text(
+            "LOCK TABLE " + ", ".join(table.name for table in ROLLUP_TABLES) + " IN EXCLUSIVE MODE"
+        ))
+
+    for table in ROLLUP_TABLES:
+        delete = table.delete()
+        if start is not None:
+            delete = delete.where(table.c.hour >= start, table.c.hour < end)
+        db.execute(delete)
+
+    p, d = products_table.c, defects_table.c
+    hour = hour_bucket(db, p.timestamp).label("hour")
+    defect_hour = hour_bucket(db, d.product_timestamp).label("hour")
+
+    products = select(
+        p.molding_machine_id,
+        hour,
+        func.count(p.id),
+        func.sum(case((p.overall_reject == True, 1), else_=0)),
+        func.sum(case((p.defect_count > 0, 1), else_=0)),
+    )
+    defects = select(
+        d.molding_machine_id,
+        d.defect_type,
+        defect_hour,
+        func.count(),
+    )
+
+    if start is not None:
+        products = products.where(p.timestamp >= start, p.timestamp < end)
+        defects = defects.where(d.product_timestamp >= start, d.product_timestamp < end)
+
+    db.execute(
+        insert(MachineHourlyRollup).from_select(
+            ["molding_machine_id", "hour", "total_products", "rejected_products", "defective_products"],
+            products.group_by(p.molding_machine_id, hour),
+        )
+    )
+    db.execute(
+        insert(MachineDefectHourlyRollup).from_select(
+            ["molding_machine_id", "defect_type", "hour", "defect_count"],
+            defects.group_by(d.molding_machine_id, d.defect_type, defect_hour),
+        )
+    )
+    if commit:
+        db.commit()
+
+    logger.info(
+        f"Refreshed hourly rollups for {start or 'all hours'}" + (f" to {end}" if end else "")
+    )
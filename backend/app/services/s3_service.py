@@ -1,7 +1,8 @@
 import boto3
+from boto3.s3.transfer import TransferConfig
 from botocore.exceptions import ClientError
 import logging
-from typing import Optional
+from typing import BinaryIO, Optional
 
 from app.core.config import settings
 
@@ -52,19 +53,98 @@ class S3Service:
             logger.error(f"Failed to upload to S3: {e}")
             raise
 
-    def download_file(self, object_key: str) -> bytes:
+    def upload_fileobj(
+        self,
+        fileobj: BinaryIO,
+        object_key: str,
+        part_size: Optional[int] = None,
+        max_concurrency: Optional[int] = None,
+    ) -> str:
+        """Stream a file object to S3, using parallel multipart uploads for large files."""
         try:
-            response = self.s3_client.get_object(
-                Bucket=self.bucket_name,
-                Key=object_key
+            self.s3_client.upload_fileobj(
+                fileobj,
+                self.bucket_name,
+                object_key,
+                Config=self._transfer_config(part_size, max_concurrency),
+            )
+            s3_uri = f"s3://{self.bucket_name}/{object_key}"
+            logger.info(f"Uploaded file to {s3_uri}")
+            return s3_uri
+        except ClientError as e:
+            logger.error(f"Failed to upload to S3: {e}")
+            raise
+
+    def download_file(
+        self,
+        object_key: str,
+        filepath: str,
+        part_size: Optional[int] = None,
+        max_concurrency: Optional[int] = None,
+    ) -> None:
+        """Download an object to a local file using parallel ranged GETs, without holding it in memory."""
+        try:
+            self.s3_client.download_file(
+                self.bucket_name,
+                object_key,
+                filepath,
+                Config=self._transfer_config(part_size, max_concurrency),
+            )
+            logger.info(f"Downloaded s3://{self.bucket_name}/{object_key} to {filepath}")
+        except ClientError as e:
+            logger.error(f"Failed to download from S3: {e}")
+            raise
+
+    def download_fileobj(
+        self,
+        object_key: str,
+        fileobj: BinaryIO,
+        part_size: Optional[int] = None,
+        max_concurrency: Optional[int] = None,
+    ) -> None:
+        """Stream an object into a writable file object using parallel ranged GETs."""
+        try:
+            self.s3_client.download_fileobj(
+                self.bucket_name,
+                object_key,
+                fileobj,
+                Config=self._transfer_config(part_size, max_concurrency),
             )
-            content = response['Body'].read()
             logger.info(f"Downloaded file from s3://{self.bucket_name}/{object_key}")
-            return content
         except ClientError as e:
             logger.error(f"Failed to download from S3: {e}")
             raise
 
+    def download_range(
+        self,
+        object_key: str,
+        fileobj: BinaryIO,
+        start: int,
+        end: Optional[int] = None,
+    ) -> None:
+        """Stream bytes ``start`` up to ``end`` (exclusive; default the end of the object) into a file object."""
+        byte_range = f"bytes={start}-{end - 1}" if end is not None else f"bytes={start}-"
+        try:
+            response = self.s3_client.get_object(Bucket=self.bucket_name, Key=object_key, Range=byte_range)
+            for chunk in response['Body'].iter_chunks(settings.S3_MULTIPART_CHUNKSIZE):
+                fileobj.write(chunk)
+            logger.info(f"Downloaded {byte_range} of s3://{self.bucket_name}/{object_key}")
+        except ClientError as e:
+            logger.error(f"Failed to download from S3: {e}")
+            raise
+
+    def _transfer_config(
+        self,
+        part_size: Optional[int] = None,
+        max_concurrency: Optional[int] = None,
+    ) -> TransferConfig:
+        return TransferConfig(
+            multipart_threshold=settings.S3_MULTIPART_THRESHOLD,
+            multipart_chunksize=part_size or settings.S3_MULTIPART_CHUNKSIZE,
+            max_concurrency=max_concurrency or settings.S3_MAX_CONCURRENCY,
+            use_threads=True,
+        )
+
     def file_exists(self, object_key: str) -> bool:
         try:
             self.s3_client.head_object(Bucket=self.bucket_name, Key=object_key)
@@ -0,0 +1,173 @@
+import logging
+from datetime import date
+from typing import Dict, Iterable, List
+
+from sqlalchemy import Index, MetaData, Table, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+from sqlalchemy.schema import CreateIndex
+
+from app.models import Product, MachineState, Defect
+from app.services import materialized_views, partitions, rollups
+
+logger = logging.getLogger(__name__)
+
+SHADOW_SUFFIX = "_shadow"
+
+# Parents first: foreign keys are added in this order and dropped in reverse.
+SWAPPED_TABLES: Dict[str, Table] = {
+    "products": Product.__table__,
+    "machine_states": MachineState.__table__,
+    "defects": Defect.__table__,
+}
+
+
+def shadow_name(name: str) -> str:
+    return f"{name}{SHADOW_SUFFIX}"
+
+
+def shadow_tables() -> Dict[str, Table]:
+    """Table objects pointing at the shadow copies, for use by BulkLoader."""
+    metadata = MetaData()
+    return {
+        name: table.to_metadata(metadata, name=shadow_name(name))
+        for name, table in SWAPPED_TABLES.items()
+    }
+
+
+def create_shadow_tables(db: Session) -> Dict[str, Table]:
+    """
+    Create empty, index-free copies of the live tables.
+
+    Columns, defaults and NOT NULL constraints come from the live table.
+    Keys and indexes are left off until the load finishes so inserts stay
+    append-only. The copies are partitioned like the live tables; their
+    monthly partitions are created by whoever loads into them.
+    """
+    _require_postgresql(db)
+
+    for name in reversed(SWAPPED_TABLES):
+        db.execute(text(f"DROP TABLE IF EXISTS {shadow_name(name)} CASCADE"))
+    for name, table in SWAPPED_TABLES.items():
+        db.execute(text(
+            f"CREATE TABLE {shadow_name(name)} "
+            f"(LIKE {name} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+            f"PARTITION BY {table.dialect_options['postgresql']['partition_by']}"
+        ))
+    db.commit()
+
+    return shadow_tables()
+
+
+def shadow_index_ddl() -> List[str]:
+    """DDL for the primary keys, foreign keys and indexes of the shadow tables."""
+    dialect = postgresql.dialect()
+    statements = []
+
+    for name, table in SWAPPED_TABLES.items():
+        shadow = shadow_name(name)
+        key = ", ".join(column.name for column in table.primary_key.columns)
+        statements.append(
+            f"ALTER TABLE {shadow} ADD CONSTRAINT {shadow}_pkey PRIMARY KEY ({key})"
+        )
+        for foreign_key in table.foreign_key_constraints:
+            column = foreign_key.column_keys[0]
+            target = foreign_key.referred_table.name
+            referred = ", ".join(element.column.name for element in foreign_key.elements)
+            on_delete = f" ON DELETE {foreign_key.ondelete}" if foreign_key.ondelete else ""
+            statements.append(
+                f"ALTER TABLE {shadow} ADD CONSTRAINT {shadow}_{column}_fkey "
+                f"FOREIGN KEY ({', '.join(foreign_key.column_keys)}) "
+                f"REFERENCES {shadow_name(target)} ({referred}){on_delete}"
+            )
+
+    shadows = shadow_tables()
+    for name, table in SWAPPED_TABLES.items():
+        shadow = shadows[name]
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            shadow_index = Index(
+                shadow_name(index.name),
+                *[shadow.c[column.name] for column in index.columns],
+                unique=index.unique,
+                **index.dialect_kwargs,
+            )
+            statements.append(str(CreateIndex(shadow_index).compile(dialect=dialect)))
+
+    return statements
+
+
+def build_shadow_indexes(db: Session) -> None:
+    """Build keys and indexes once, in bulk, after the shadow tables are loaded."""
+    _require_postgresql(db)
+
+    for statement in shadow_index_ddl():
+        logger.info(f"Building: {statement}")
+        db.execute(text(statement))
+    for name in SWAPPED_TABLES:
+        db.execute(text(f"ANALYZE {shadow_name(name)}"))
+    db.commit()
+
+
+def swap_ddl(months: Iterable[date] = ()) -> List[str]:
+    """
+    Statements that move the shadow tables, and their partitions for
+    ``months``, into place.
+
+    Run inside one transaction: readers block on the ACCESS EXCLUSIVE lock
+    for the duration of a few catalog updates and then see the new data.
+    Dropping the old tables drops the materialized views over them; they
+    are recreated empty, to be filled by the next refresh.
+    """
+    statements = [
+        "LOCK TABLE " + ", ".join(SWAPPED_TABLES) + " IN ACCESS EXCLUSIVE MODE",
+    ]
+
+    # The id sequences are owned by the live tables; hand them over before
+    # the old tables are dropped so they survive the swap.
+    for name in SWAPPED_TABLES:
+        statements.append(
+            f"ALTER SEQUENCE {name}_id_seq OWNED BY {shadow_name(name)}.id"
+        )
+    for name in reversed(SWAPPED_TABLES):
+        statements.append(f"DROP TABLE {name} CASCADE")
+
+    for name, table in SWAPPED_TABLES.items():
+        shadow = shadow_name(name)
+        statements.append(f"ALTER TABLE {shadow} RENAME TO {name}")
+        statements.append(f"ALTER TABLE {name} RENAME CONSTRAINT {shadow}_pkey TO {name}_pkey")
+        for foreign_key in table.foreign_key_constraints:
+            column = foreign_key.column_keys[0]
+            statements.append(
+                f"ALTER TABLE {name} RENAME CONSTRAINT {shadow}_{column}_fkey TO {name}_{column}_fkey"
+            )
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            statements.append(f"ALTER INDEX {shadow_name(index.name)} RENAME TO {index.name}")
+        for month in sorted(months):
+            statements.append(
+                f"ALTER TABLE {partitions.partition_name(shadow, month)} "
+                f"RENAME TO {partitions.partition_name(name, month)}"
+            )
+
+    statements.extend(materialized_views.create_ddl(with_data=False))
+    return statements
+
+
+def swap_in_shadow_tables(db: Session) -> None:
+    """
+    Rebuild the rollups from the shadow tables and swap the tables in, in
+    one transaction, so readers never see new tables with old rollups. The
+    rollups are aggregated before the live tables are locked.
+    """
+    _require_postgresql(db)
+
+    months = partitions.partition_months(db, shadow_name("products"))
+    rollups.refresh(db, tables=shadow_tables(), commit=False)
+    for statement in swap_ddl(months):
+        db.execute(text(statement))
+    db.commit()
+    logger.info("Swapped shadow tables into place")
+
+
+def _require_postgresql(db: Session) -> None:
+    if db.get_bind().dialect.name != "postgresql":
+        raise ValueError("Swap loading requires PostgreSQL")
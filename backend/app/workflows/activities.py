@@ -1,17 +1,37 @@
 import asyncio
+import contextlib
 import hashlib
-import json
 import httpx
+import os
+import tempfile
+import time
+from datetime import datetime
 from pathlib import Path
 from temporalio import activity
-from typing import Dict, Any
-from sqlalchemy import text
-from datetime import datetime
+from typing import Callable, Dict, Any, Iterator, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
 
+from app.core.config import settings
 from app.core.database import SessionLocal
-from app.models import Product, MachineState, Defect
+from app.services import (
+    ingestion_ledger,
+    materialized_views,
+    partitions,
+    record_reader,
+    rollups,
+    table_swap,
+)
+from app.services.bulk_loader import BulkLoader
+from app.services.record_reader import RecordReader
 from app.services.s3_service import s3_service
 
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+HEARTBEAT_EVERY_BYTES = 16 * 1024 * 1024
+# Well inside the workflow's heartbeat timeout, so a slow but healthy
+# download is not timed out between byte-count heartbeats.
+HEARTBEAT_EVERY_SECONDS = 30.0
+
 
 @activity.defn
 async def download_dataset(url: str) -> Dict[str, Any]:
@@ -21,8 +41,7 @@ async def download_dataset(url: str) -> Dict[str, Any]:
     if url.startswith("file://"):
         filepath = url.replace("file://", "")
         activity.logger.info(f"Reading local file: {filepath}")
-        with open(filepath, 'rb') as f:
-            data_bytes = f.read()
+        hasher, size_bytes = _hash_file(filepath)
     else:
         headers = {
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36',
@@ -41,6 +60,8 @@ async def download_dataset(url: str) -> Dict[str, Any]:
             'sec-ch-ua-platform': '"macOS"',
         }
 
+        filepath, bytes_written, hasher = _resume_download()
+
         max_retries = 3
         retry_delay = 2
 
@@ -48,14 +69,41 @@ async def download_dataset(url: str) -> Dict[str, Any]:
             try:
                 activity.logger.info(f"Download attempt {attempt + 1}/{max_retries}")
 
+                request_headers = dict(headers)
+                if bytes_written:
+                    activity.logger.info(f"Resuming download at byte {bytes_written}")
+                    request_headers['Range'] = f"bytes={bytes_written}-"
+                    # Range offsets must line up with the bytes already on disk
+                    request_headers['Accept-Encoding'] = 'identity'
+
                 async with httpx.AsyncClient(
                     timeout=300.0,
                     follow_redirects=True,
                     http2=True
                 ) as client:
-                    response = await client.get(url, headers=headers)
-                    response.raise_for_status()
-                    data_bytes = response.content
+                    async with client.stream("GET", url, headers=request_headers) as response:
+                        if bytes_written and response.status_code == 416:
+                            break
+                        response.raise_for_status()
+
+                        if bytes_written and response.status_code != 206:
+                            activity.logger.warning("Server ignored Range request, restarting download")
+                            bytes_written = 0
+                            hasher = hashlib.sha256()
+
+                        next_heartbeat = bytes_written + HEARTBEAT_EVERY_BYTES
+                        heartbeat_due = time.monotonic() + HEARTBEAT_EVERY_SECONDS
+                        with open(filepath, 'ab' if bytes_written else 'wb') as f:
+                            async for chunk in response.aiter_bytes():
+                                f.write(chunk)
+                                hasher.update(chunk)
+                                bytes_written += len(chunk)
+
+                                if bytes_written >= next_heartbeat or time.monotonic() >= heartbeat_due:
+                                    f.flush()
+                                    activity.heartbeat(filepath, bytes_written)
+                                    next_heartbeat = bytes_written + HEARTBEAT_EVERY_BYTES
+                                    heartbeat_due = time.monotonic() + HEARTBEAT_EVERY_SECONDS
                     break
 
             except (httpx.HTTPStatusError, httpx.RequestError) as e:
@@ -67,25 +115,76 @@ async def download_dataset(url: str) -> Dict[str, Any]:
                     activity.logger.error(f"All {max_retries} attempts failed")
                     raise
 
-        import tempfile
-        temp_file = tempfile.NamedTemporaryFile(mode='wb', delete=False, suffix='.json', dir='/tmp')
-        temp_file.write(data_bytes)
-        temp_file.close()
-        filepath = temp_file.name
+        activity.heartbeat(filepath, bytes_written)
         activity.logger.info(f"Saved to temp file: {filepath}")
 
-    data_hash = hashlib.sha256(data_bytes).hexdigest()
+        size_bytes = bytes_written
+
+    data_hash = hasher.hexdigest()
 
-    activity.logger.info(f"Downloaded {len(data_bytes)} bytes (hash: {data_hash[:8]}...)")
+    activity.logger.info(f"Downloaded {size_bytes} bytes (hash: {data_hash[:8]}...)")
 
     return {
         "url": url,
         "hash": data_hash,
-        "size_bytes": len(data_bytes),
+        "size_bytes": size_bytes,
         "filepath": filepath,
     }
 
 
+def _resume_download() -> Tuple[str, int, Any]:
+    """
+    Pick up a partial download recorded in heartbeat details by an earlier
+    attempt of this activity, or start a new temp file.
+    """
+    details = activity.info().heartbeat_details
+    if details and os.path.exists(details[0]):
+        filepath = details[0]
+        hasher, bytes_written = _hash_file(filepath)
+        return filepath, bytes_written, hasher
+
+    temp_file = tempfile.NamedTemporaryFile(mode='wb', delete=False, suffix='.json', dir='/tmp')
+    temp_file.close()
+    return temp_file.name, 0, hashlib.sha256()
+
+
+def _hash_file(filepath: str) -> Tuple[Any, int]:
+    hasher = hashlib.sha256()
+    size_bytes = 0
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(DOWNLOAD_CHUNK_SIZE), b""):
+            hasher.update(chunk)
+            size_bytes += len(chunk)
+    return hasher, size_bytes
+
+
+@activity.defn
+async def check_dataset(dataset_info: Dict[str, Any]) -> Dict[str, Any]:
+    """Report whether this dataset is already in S3 and already loaded."""
+    s3_key = _s3_key(dataset_info)
+    s3_exists = await asyncio.to_thread(s3_service.file_exists, s3_key)
+
+    db = SessionLocal()
+    try:
+        entry = ingestion_ledger.find_loaded(db, dataset_info["hash"])
+        loaded = entry.to_dict() if entry else None
+    finally:
+        db.close()
+
+    activity.logger.info(
+        f"Dataset {dataset_info['hash'][:8]}...: in S3={s3_exists}, loaded={loaded is not None}"
+    )
+
+    return {
+        "s3_uri": s3_service.get_s3_uri(s3_key) if s3_exists else None,
+        "loaded": loaded,
+    }
+
+
+def _s3_key(dataset_info: Dict[str, Any]) -> str:
+    return f"datasets/{dataset_info['hash']}.json"
+
+
 @activity.defn
 async def upload_to_s3(dataset_info: Dict[str, Any]) -> str:
     """Upload dataset to S3."""
@@ -94,121 +193,265 @@ async def upload_to_s3(dataset_info: Dict[str, Any]) -> str:
     if not filepath:
         raise ValueError("No filepath provided for S3 upload")
 
-    with open(filepath, 'rb') as f:
-        file_bytes = f.read()
+    s3_key = _s3_key(dataset_info)
 
-    s3_key = f"datasets/{dataset_info['hash']}.json"
-    s3_uri = s3_service.upload_file(file_bytes, s3_key)
+    def upload() -> str:
+        with open(filepath, 'rb') as f:
+            return s3_service.upload_fileobj(f, s3_key)
 
-    activity.logger.info(f"Uploaded {len(file_bytes)} bytes to {s3_uri}")
+    s3_uri = await asyncio.to_thread(upload)
+
+    activity.logger.info(f"Uploaded {os.path.getsize(filepath)} bytes to {s3_uri}")
     return s3_uri
 
 
 @activity.defn
-async def batch_insert_to_db(dataset_info: Dict[str, Any]) -> Dict[str, int]:
-    """Parse and insert dataset into database."""
+def prepare_load(dataset_info: Dict[str, Any]) -> Dict[str, Any]:
+    """Open a ledger entry and get the target tables ready for sharded inserts."""
+    mode = _require_mode(dataset_info)
 
-    activity.logger.info("Starting database insertion")
+    db = SessionLocal()
+    try:
+        entry = ingestion_ledger.start_load(db, dataset_info)
+        try:
+            _prepare_tables(db, mode)
+        except Exception:
+            db.rollback()
+            ingestion_ledger.fail_load(db, entry)
+            raise
+        return {"ingestion_id": entry.id}
+    finally:
+        db.close()
 
-    filepath = dataset_info.get("filepath")
-    if not filepath:
-        raise ValueError("No filepath provided")
 
-    with open(filepath, 'r') as f:
-        data = json.load(f)
+@activity.defn
+def plan_shards(dataset_info: Dict[str, Any]) -> List[Dict[str, int]]:
+    """
+    Split the dataset file into record-aligned byte ranges, and create the
+    partitions its records fall into so concurrent shards never issue DDL.
+    """
+    mode = _require_mode(dataset_info)
+    shard_count = dataset_info.get("shards")
+    if shard_count is None:
+        shard_count = settings.INGESTION_SHARDS
+    if shard_count < 1:
+        raise ValueError(f"Shard count must be positive: {shard_count}")
+
+    months = set()
+
+    def track_month(record: Dict[str, Any]) -> None:
+        if record.get("timestamp") is not None:
+            months.add(partitions.month_start(datetime.fromtimestamp(record["timestamp"])))
+
+    with _dataset_file(dataset_info) as filepath:
+        shards = record_reader.plan_shards(filepath, shard_count, on_record=track_month)
+        activity.logger.info(f"Planned {len(shards)} shards over {os.path.getsize(filepath)} bytes")
+
+    db = SessionLocal()
+    try:
+        tables = table_swap.shadow_tables() if mode == "swap" else {}
+        partitions.ensure_partitions(db, months, [table.name for table in tables.values()])
+    finally:
+        db.close()
+    return shards
 
-    activity.logger.info(f"Parsed {len(data)} records")
+
+@activity.defn
+def insert_shard(dataset_info: Dict[str, Any], shard: Dict[str, int]) -> Dict[str, int]:
+    """
+    Insert the records of one shard; a retry reloads only this shard, from
+    the checkpoint its last committed batch left in the ledger.
+    """
+    mode = _require_mode(dataset_info)
+    ingestion_id = dataset_info["ingestion_id"]
+
+    activity.logger.info(
+        f"Inserting shard {shard['index']} ({shard['records']} records, "
+        f"bytes {shard['start_offset']}-{shard['end_offset']})"
+    )
 
     db = SessionLocal()
     try:
-        activity.logger.info("Clearing existing data...")
-        db.execute(text("TRUNCATE products CASCADE"))
-        db.commit()
-
-        products_count = 0
-        machine_states_count = 0
-        defects_count = 0
-
-        batch_size = 500
-        for i, record in enumerate(data):
-            if i % batch_size == 0:
-                activity.logger.info(f"Processing batch {i // batch_size + 1} ({i}/{len(data)})")
-
-            product = Product(
-                version=record.get("version"),
-                timestamp=datetime.fromtimestamp(record.get("timestamp")),
-                molding_machine_id=record.get("molding_machine_id"),
-                overall_reject=record.get("object_detection", {}).get("reject", False),
-                defect_count=0,
-                total_severity_score=0.0,
+        checkpoint = ingestion_ledger.get_checkpoint(db, ingestion_id, shard["index"])
+        start_offset = checkpoint.get("offset", shard["start_offset"])
+        with _dataset_file(dataset_info, start_offset, shard["end_offset"]) as filepath:
+            stats = _checkpointed_load(
+                db, mode, filepath, checkpoint,
+                start_offset=start_offset, end_offset=shard["end_offset"],
+                save=lambda offset, counts, time_range: ingestion_ledger.save_checkpoint(
+                    db, ingestion_id, shard["index"], offset, counts, time_range
+                ),
             )
-            db.add(product)
-            db.flush()
-            products_count += 1
+        activity.logger.info(f"Shard {shard['index']}: inserted {stats['products']} products")
+        return stats
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
 
 
-            machine_data = record.get("molding-machine-state", {})
-            machine_state = MachineState(
-                product_id=product.id,
-                cycle_time=machine_data.get("CycleTime"),
-                shot_count=machine_data.get("ShotCount"),
-            )
-            db.add(machine_state)
-            machine_states_count += 1
-
-            object_detection = record.get("object_detection", {})
-            defect_mapping = {
-                "discoloration_defect": "discoloration_defect",
-                "discoloration_patch_defect": "discoloration_patch_defect",
-                "flash_defect": "flash_defect",
-                "short_defect": "short_defect",
-                "contamination_defect": "contamination_defect",
-                "splay_defect": "splay_defect",
-                "burn_mark_defect": "burn_mark_defect",
-                "jetting_defect": "jetting_defect",
-                "flow_mark_defect": "flow_mark_defect",
-                "sink_mark_defect": "sink_mark_defect",
-                "knit_line_defect": "knit_line_defect",
-                "void_defect": "void_defect",
-                "ejector_pin_mark_defect": "ejector_pin_mark_defect",
-            }
-
-            product_defect_count = 0
-            for defect_key, defect_type in defect_mapping.items():
-                defect_data = object_detection.get(defect_key)
-                if defect_data and defect_data.get("reject"):
-                    pixel_severity = defect_data.get("pixel_severity", {})
-                    defect = Defect(
-                        product_id=product.id,
-                        defect_type=defect_type,
-                        pixel_severity_value=pixel_severity.get("value", 0.0),
-                        pixel_severity_reject=pixel_severity.get("reject", False),
-                        reject=defect_data.get("reject", False)
-                    )
-                    db.add(defect)
-                    defects_count += 1
-                    product_defect_count += 1
-
-            product.defect_count = product_defect_count
-
-            if (i + 1) % batch_size == 0:
-                db.commit()
-
-        db.commit()
+@activity.defn
+def finalize_load(dataset_info: Dict[str, Any], ingestion_id: int, stats: Dict[str, int]) -> None:
+    """Swap in shadow tables if needed and record the load as completed."""
+    mode = _require_mode(dataset_info)
 
-        activity.logger.info(
-            f"Inserted {products_count} products, {machine_states_count} machine states"
-        )
+    db = SessionLocal()
+    try:
+        entry = ingestion_ledger.get_load(db, ingestion_id)
+        try:
+            _finalize_tables(db, mode)
+            ingestion_ledger.complete_load(db, entry, stats)
+        except Exception:
+            db.rollback()
+            ingestion_ledger.fail_load(db, entry)
+            raise
+    finally:
+        db.close()
 
-        return {
-            "products": products_count,
-            "machine_states": machine_states_count,
-            "defects": defects_count,
-        }
 
-    except Exception as e:
+@activity.defn
+def refresh_materialized_views(ingestion_id: int) -> None:
+    """Bring the dashboard's materialized views up to date with a finished load."""
+    db = SessionLocal()
+    try:
+        materialized_views.refresh(db)
+        ingestion_ledger.mark_views_refreshed(db, ingestion_ledger.get_load(db, ingestion_id))
+    except Exception:
         db.rollback()
-        activity.logger.error(f"Database insertion failed: {e}")
         raise
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+@activity.defn
+def abandon_load(ingestion_id: int) -> None:
+    """Mark a sharded load as failed after one of its shards gave up."""
+    db = SessionLocal()
+    try:
+        ingestion_ledger.fail_load(db, ingestion_ledger.get_load(db, ingestion_id))
+    finally:
+        db.close()
+
+
+@contextlib.contextmanager
+def _dataset_file(
+    dataset_info: Dict[str, Any],
+    start_offset: int = 0,
+    end_offset: Optional[int] = None,
+) -> Iterator[str]:
+    """
+    A local path holding the dataset's bytes from ``start_offset`` to
+    ``end_offset``. The worker that downloaded the dataset reads its own
+    copy; any other worker fetches just that range from S3 into a sparse
+    temp file at the same offsets, so record offsets and checkpoints stay
+    those of the dataset file.
+    """
+    filepath = dataset_info.get("filepath")
+    if filepath and os.path.exists(filepath) and (
+        dataset_info.get("size_bytes") in (None, os.path.getsize(filepath))
+    ):
+        yield filepath
+        return
+
+    if not dataset_info.get("s3_uri"):
+        raise ValueError("Dataset is neither on this worker nor in S3")
+
+    temp_file = tempfile.NamedTemporaryFile(mode='wb', delete=False, suffix='.json', dir='/tmp')
+    try:
+        if start_offset == 0 and end_offset is None:
+            temp_file.close()
+            s3_service.download_file(_s3_key(dataset_info), temp_file.name)
+        else:
+            with temp_file:
+                if end_offset is None or start_offset < end_offset:
+                    temp_file.seek(start_offset)
+                    s3_service.download_range(_s3_key(dataset_info), temp_file, start_offset, end_offset)
+        yield temp_file.name
+    finally:
+        os.unlink(temp_file.name)
+
+
+def _checkpointed_load(
+    db: Session,
+    mode: str,
+    filepath: str,
+    checkpoint: Dict[str, Any],
+    start_offset: int,
+    end_offset: Optional[int],
+    save: Callable[[int, Dict[str, int], Optional[List[float]]], None],
+) -> Dict[str, int]:
+    """
+    Load records from ``start_offset`` on top of the counts and time range
+    in ``checkpoint``. After every batch, ``save`` records the byte offset,
+    running counts and covered time range in the batch's own transaction,
+    and the activity heartbeats. Live-table loads then refresh the rollups
+    for that range.
+    """
+    base = checkpoint.get("counts", {})
+    base_range = checkpoint.get("time_range")
+    if checkpoint:
+        activity.logger.info(
+            f"Resuming at byte {start_offset} after {base.get('products', 0)} products"
+        )
+
+    reader = RecordReader(filepath, start_offset=start_offset, end_offset=end_offset)
+    loader = _loader(db, mode)
+
+    def on_batch(counts: Dict[str, int]) -> None:
+        save(reader.offset, _add_counts(base, counts), _merge_ranges(base_range, loader.time_range))
+        activity.heartbeat(reader.offset)
+
+    if mode == "append":
+        activity.logger.info("Appending new and changed records...")
+        stats = loader.upsert(reader, on_batch=on_batch)
+    else:
+        stats = loader.load(reader, on_batch=on_batch)
+
+    time_range = _merge_ranges(base_range, loader.time_range)
+    if mode != "swap" and time_range:
+        rollups.refresh(db, *rollups.hour_range(*time_range))
+
+    return _add_counts(base, stats)
+
+
+def _add_counts(base: Dict[str, int], counts: Dict[str, int]) -> Dict[str, int]:
+    return {key: base.get(key, 0) + value for key, value in counts.items()}
+
+
+def _merge_ranges(*ranges: Optional[List[float]]) -> Optional[List[float]]:
+    ranges = [time_range for time_range in ranges if time_range]
+    if not ranges:
+        return None
+    return [min(first for first, _ in ranges), max(last for _, last in ranges)]
+
+
+def _require_mode(dataset_info: Dict[str, Any]) -> str:
+    mode = dataset_info.get("mode", "replace")
+    if mode not in ingestion_ledger.LOAD_MODES:
+        raise ValueError(f"Unknown ingestion mode: {mode}")
+    return mode
+
+
+def _prepare_tables(db: Session, mode: str) -> None:
+    if mode == "swap":
+        activity.logger.info("Creating shadow tables...")
+        table_swap.create_shadow_tables(db)
+    elif mode == "replace":
+        activity.logger.info("Clearing existing data...")
+        BulkLoader(db).truncate()
+        rollups.clear(db)
+
+
+def _loader(db: Session, mode: str) -> BulkLoader:
+    if mode == "swap":
+        activity.logger.info("Loading into shadow tables...")
+        return BulkLoader(db, settings.INGESTION_BATCH_SIZE, tables=table_swap.shadow_tables())
+    return BulkLoader(db, settings.INGESTION_BATCH_SIZE)
+
+
+def _finalize_tables(db: Session, mode: str) -> None:
+    if mode == "swap":
+        activity.logger.info("Building indexes and swapping tables...")
+        table_swap.build_shadow_indexes(db)
+        table_swap.swap_in_shadow_tables(db)
@@ -1,24 +1,89 @@
+import asyncio
 from datetime import timedelta
 from temporalio import workflow
 from temporalio.common import RetryPolicy
-from typing import Dict, Any
+from temporalio.exceptions import ActivityError
+from typing import Dict, Any, List, Optional
+
+# Marks histories recorded since the ledger check and sharded load replaced
+# the single upload-then-insert sequence.
+SHARDED_LOAD_PATCH = "ledger-and-sharded-load"
 
 
 @workflow.defn
 class DataIngestionWorkflow:
     @workflow.run
-    async def run(self, url: str) -> Dict[str, Any]:
-        workflow.logger.info(f"Starting data ingestion for: {url}")
+    async def run(self, url: str, mode: str = "replace", shards: Optional[int] = None) -> Dict[str, Any]:
+        workflow.logger.info(f"Starting data ingestion ({mode}) for: {url}")
 
         dataset_info = await workflow.execute_activity(
             "download_dataset",
             url,
             start_to_close_timeout=timedelta(minutes=10),
+            heartbeat_timeout=timedelta(minutes=2),
             retry_policy=RetryPolicy(maximum_attempts=3),
         )
 
         workflow.logger.info(f"Downloaded {dataset_info['size_bytes']} bytes")
 
+        if not workflow.patched(SHARDED_LOAD_PATCH):
+            return await self._run_unsharded(url, dataset_info)
+
+        dataset_info = {**dataset_info, "mode": mode, "shards": shards}
+
+        existing = await workflow.execute_activity(
+            "check_dataset",
+            dataset_info,
+            start_to_close_timeout=timedelta(minutes=1),
+            retry_policy=RetryPolicy(maximum_attempts=3),
+        )
+
+        if existing["s3_uri"]:
+            s3_uri = existing["s3_uri"]
+            workflow.logger.info(f"Already in S3, skipping upload: {s3_uri}")
+        else:
+            s3_uri = await workflow.execute_activity(
+                "upload_to_s3",
+                dataset_info,
+                start_to_close_timeout=timedelta(minutes=5),
+                retry_policy=RetryPolicy(maximum_attempts=3),
+            )
+
+            workflow.logger.info(f"Uploaded to S3: {s3_uri}")
+
+        loaded = existing["loaded"]
+        if loaded:
+            stats = {
+                "products": loaded["products"],
+                "machine_states": loaded["machine_states"],
+                "defects": loaded["defects"],
+            }
+            workflow.logger.info(f"Dataset already loaded at {loaded['loaded_at']}, skipping insert")
+        else:
+            stats = await self._load({**dataset_info, "s3_uri": s3_uri})
+
+            workflow.logger.info(f"Inserted {stats['products']} products")
+
+        return {
+            "url": url,
+            "mode": mode,
+            "s3_uri": s3_uri,
+            "dataset_hash": dataset_info["hash"],
+            "dataset_size_bytes": dataset_info["size_bytes"],
+            "statistics": stats,
+            "skipped": {
+                "upload": existing["s3_uri"] is not None,
+                "load": loaded is not None,
+            },
+            "status": "completed",
+        }
+
+    async def _run_unsharded(self, url: str, dataset_info: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        The original command sequence, so histories started before the
+        patch replay deterministically. Its batch_insert_to_db activity is
+        no longer registered; drain such runs on the previous worker release.
+        """
         s3_uri = await workflow.execute_activity(
             "upload_to_s3",
             dataset_info,
@@ -26,8 +91,6 @@ class DataIngestionWorkflow:
             retry_policy=RetryPolicy(maximum_attempts=3),
         )
 
-        workflow.logger.info(f"Uploaded to S3: {s3_uri}")
-
         stats = await workflow.execute_activity(
             "batch_insert_to_db",
             dataset_info,
@@ -35,8 +98,6 @@ class DataIngestionWorkflow:
             retry_policy=RetryPolicy(maximum_attempts=2),
         )
 
-        workflow.logger.info(f"Inserted {stats['products']} products")
-
         return {
             "url": url,
             "s3_uri": s3_uri,
@@ -44,4 +105,64 @@ class DataIngestionWorkflow:
             "dataset_size_bytes": dataset_info["size_bytes"],
             "statistics": stats,
             "status": "completed",
-        }
\ No newline at end of file
+        }
+
+    async def _load(self, dataset_info: Dict[str, Any]) -> Dict[str, int]:
+        """Fan the insert out over one activity per shard and sum the results."""
+        load = await workflow.execute_activity(
+            "prepare_load",
+            dataset_info,
+            start_to_close_timeout=timedelta(minutes=5),
+            retry_policy=RetryPolicy(maximum_attempts=2),
+        )
+        dataset_info = {**dataset_info, "ingestion_id": load["ingestion_id"]}
+
+        try:
+            shards = await workflow.execute_activity(
+                "plan_shards",
+                dataset_info,
+                start_to_close_timeout=timedelta(minutes=10),
+                retry_policy=RetryPolicy(maximum_attempts=2),
+            )
+
+            workflow.logger.info(f"Inserting {len(shards)} shards in parallel")
+
+            results: List[Dict[str, int]] = await asyncio.gather(*[
+                workflow.execute_activity(
+                    "insert_shard",
+                    args=[dataset_info, shard],
+                    start_to_close_timeout=timedelta(minutes=30),
+                    heartbeat_timeout=timedelta(minutes=2),
+                    retry_policy=RetryPolicy(maximum_attempts=3),
+                )
+                for shard in shards
+            ])
+        except ActivityError:
+            await workflow.execute_activity(
+                "abandon_load",
+                load["ingestion_id"],
+                start_to_close_timeout=timedelta(minutes=1),
+                retry_policy=RetryPolicy(maximum_attempts=3),
+            )
+            raise
+
+        stats = {"products": 0, "machine_states": 0, "defects": 0}
+        for result in results:
+            for key, value in result.items():
+                stats[key] = stats.get(key, 0) + value
+
+        await workflow.execute_activity(
+            "finalize_load",
+            args=[dataset_info, load["ingestion_id"], stats],
+            start_to_close_timeout=timedelta(minutes=30),
+            retry_policy=RetryPolicy(maximum_attempts=2),
+        )
+
+        await workflow.execute_activity(
+            "refresh_materialized_views",
+            load["ingestion_id"],
+            start_to_close_timeout=timedelta(minutes=30),
+            retry_policy=RetryPolicy(maximum_attempts=3),
+        )
+
+        return stats
@@ -0,0 +1,87 @@
+"""
+Latency benchmark for the analytics API under concurrent load.
+
+Starts N concurrent clients, each requesting the six dashboard endpoints in
+turn, and reports p50/p99 latency and throughput. Run it against the API
+before and after a change to compare. Start the API with CACHE_ENABLED=false
+so every request reaches the database.
+
+Usage:
+    CACHE_ENABLED=false uvicorn app.main:app --port 8000
+    python scripts/benchmark_api_concurrency.py --base-url http://localhost:8000 --clients 50
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+DASHBOARD_ENDPOINTS = [
+    "/api/v1/analytics/defect-rate-trend?interval=day",
+    "/api/v1/analytics/top-defects",
+    "/api/v1/analytics/machine-comparison",
+    "/api/v1/analytics/defect-distribution",
+    "/api/v1/analytics/machine-defect-heatmap",
+    "/api/v1/analytics/cycle-time-scatter",
+]
+
+
+def percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def run_client(client: httpx.AsyncClient, requests: int, offset: int, latencies, errors) -> None:
+    for i in range(requests):
+        path = DASHBOARD_ENDPOINTS[(offset + i) % len(DASHBOARD_ENDPOINTS)]
+        started = time.perf_counter()
+        try:
+            response = await client.get(path)
+            response.raise_for_status()
+        except httpx.HTTPError:
+            errors.append(path)
+            continue
+        latencies.setdefault(path, []).append((time.perf_counter() - started) * 1000)
+
+
+async def run(base_url: str, clients: int, requests: int) -> None:
+    latencies = {}
+    errors = []
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=120.0, limits=limits) as client:
+        # Warm up connections and the server's pools
+        await asyncio.gather(*[client.get(path) for path in DASHBOARD_ENDPOINTS])
+
+        started = time.perf_counter()
+        await asyncio.gather(*[
+            run_client(client, requests, offset, latencies, errors) for offset in range(clients)
+        ])
+        elapsed = time.perf_counter() - started
+
+    everything = [latency for values in latencies.values() for latency in values]
+    if not everything:
+        print(f"All {len(errors)} requests failed")
+        return
+
+    print(f"{clients} clients x {requests} requests against {base_url} in {elapsed:.2f}s")
+    print(f"  {'endpoint':<52} {'p50 ms':>9} {'p99 ms':>9}")
+    for path, values in latencies.items():
+        print(f"  {path:<52} {statistics.median(values):>9.1f} {percentile(values, 99):>9.1f}")
+    print(f"  {'all':<52} {statistics.median(everything):>9.1f} {percentile(everything, 99):>9.1f}")
+    print(f"  throughput: {len(everything) / elapsed:,.1f} req/s, errors: {len(errors)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark analytics API latency under concurrency")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=20, help="Requests per client")
+    args = parser.parse_args()
+    asyncio.run(run(args.base_url, args.clients, args.requests))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Throughput benchmark for the bulk ingestion paths.
+
+Loads a synthetic dataset with full machine telemetry through BulkLoader
+with each available method (COPY on PostgreSQL, executemany inserts
+everywhere) and reports records/sec.
+
+Usage:
+    python scripts/benchmark_ingestion.py --records 100000
+    python scripts/benchmark_ingestion.py --database-url sqlite:///bench.db
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.core.database import Base
+from app.services.bulk_loader import BulkLoader, DEFECT_TYPES
+from app.services.column_mapper import machine_state_mapper
+
+
+def generate_records(count: int, seed: int = 42):
+    rng = random.Random(seed)
+    base = datetime(2024, 1, 1).timestamp()
+    for i in range(count):
+        object_detection = {"reject": False}
+        for defect_type in rng.sample(DEFECT_TYPES, rng.choice([0, 0, 0, 1, 2, 3])):
+            object_detection["reject"] = True
+            object_detection[defect_type] = {
+                "reject": True,
+                "pixel_severity": {"value": rng.random(), "reject": rng.random() > 0.5},
+            }
+        machine_state = {key: round(rng.uniform(0.0, 500.0), 2) for _, key, _ in machine_state_mapper.fields}
+        machine_state.update({"CycleTime": rng.uniform(20.0, 35.0), "ShotCount": i})
+        yield {
+            "version": "1.0",
+            "timestamp": base + i * 30,
+            "molding_machine_id": f"molding-machine-{rng.randint(1, 12)}",
+            "object_detection": object_detection,
+            "molding-machine-state": machine_state,
+        }
+
+
+def run(database_url: str, records: int, batch_size: int) -> None:
+    engine = create_engine(database_url)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+
+    methods = ["insert"]
+    if engine.dialect.name == "postgresql":
+        methods.insert(0, "copy")
+
+    print(f"Benchmarking {records:,} records on {engine.dialect.name} (batch size {batch_size:,})")
+    for method in methods:
+        db = Session()
+        try:
+            loader = BulkLoader(db, batch_size=batch_size, method=method)
+            loader.truncate()
+
+            started = time.perf_counter()
+            stats = loader.load(generate_records(records))
+            elapsed = time.perf_counter() - started
+
+            print(
+                f"  {method:<7} {elapsed:8.2f}s  {stats['products'] / elapsed:12,.0f} products/s  "
+                f"({stats['defects']:,} defects)"
+            )
+        finally:
+            db.close()
+
+    engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bulk ingestion throughput")
+    parser.add_argument("--database-url", default=settings.DATABASE_URL)
+    parser.add_argument("--records", type=int, default=50000)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+    run(args.database_url, args.records, args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Throughput benchmark for streaming S3 uploads and downloads.
+
+Uploads a generated file through S3Service.upload_fileobj for every
+combination of part size and concurrency, downloads it back with
+download_fileobj, and reports MB/s. Runs against the configured
+S3_ENDPOINT_URL (LocalStack in docker-compose).
+
+Usage:
+    python scripts/benchmark_s3.py --size-mb 512 --part-sizes 8,16,64 --concurrency 1,4,8,16
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.s3_service import s3_service
+
+MB = 1024 * 1024
+
+
+def make_file(size_mb: int) -> str:
+    temp_file = tempfile.NamedTemporaryFile(mode='wb', delete=False, suffix='.bin')
+    block = os.urandom(MB)
+    for _ in range(size_mb):
+        temp_file.write(block)
+    temp_file.close()
+    return temp_file.name
+
+
+def run(size_mb: int, part_sizes, concurrencies) -> None:
+    filepath = make_file(size_mb)
+    object_key = "benchmarks/s3-throughput.bin"
+
+    print(f"Benchmarking {size_mb} MB against {s3_service.s3_client.meta.endpoint_url}")
+    print(f"  {'part size':>10} {'threads':>8} {'upload MB/s':>12} {'download MB/s':>14}")
+    try:
+        for part_size in part_sizes:
+            for concurrency in concurrencies:
+                started = time.perf_counter()
+                with open(filepath, 'rb') as f:
+                    s3_service.upload_fileobj(f, object_key, part_size * MB, concurrency)
+                upload_rate = size_mb / (time.perf_counter() - started)
+
+                started = time.perf_counter()
+                with tempfile.TemporaryFile() as f:
+                    s3_service.download_fileobj(object_key, f, part_size * MB, concurrency)
+                download_rate = size_mb / (time.perf_counter() - started)
+
+                print(f"  {part_size:>8}MB {concurrency:>8} {upload_rate:>12.1f} {download_rate:>14.1f}")
+    finally:
+        s3_service.s3_client.delete_object(Bucket=s3_service.bucket_name, Key=object_key)
+        os.unlink(filepath)
+
+
+def parse_list(value: str):
+    return [int(item) for item in value.split(",")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark S3 multipart transfer throughput")
+    parser.add_argument("--size-mb", type=int, default=256)
+    parser.add_argument("--part-sizes", type=parse_list, default=[8, 16, 64])
+    parser.add_argument("--concurrency", type=parse_list, default=[1, 4, 8, 16])
+    args = parser.parse_args()
+    run(args.size_mb, args.part_sizes, args.concurrency)
+
+
+if __name__ == "__main__":
+    main()
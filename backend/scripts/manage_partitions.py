@@ -0,0 +1,68 @@
+"""
+Monthly partition maintenance for products, machine_states and defects.
+
+Usage:
+    python scripts/manage_partitions.py list
+    python scripts/manage_partitions.py ensure --from 2024-01 --to 2024-06
+    python scripts/manage_partitions.py drop-before 2024-01-01
+    python scripts/manage_partitions.py detach 2023-12
+    python scripts/manage_partitions.py attach 2023-12
+"""
+import argparse
+import os
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.services import partitions
+
+
+def parse_month(value: str) -> datetime:
+    return datetime.strptime(value, "%Y-%m")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Manage monthly table partitions")
+    parser.add_argument("--database-url", default=settings.DATABASE_URL)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("list", help="List the months that have partitions")
+
+    ensure = commands.add_parser("ensure", help="Create missing partitions for a month range")
+    ensure.add_argument("--from", dest="first", type=parse_month, required=True)
+    ensure.add_argument("--to", dest="last", type=parse_month, required=True)
+
+    drop = commands.add_parser("drop-before", help="Drop every month ending on or before a date")
+    drop.add_argument("cutoff", type=datetime.fromisoformat)
+
+    for name in ("detach", "attach"):
+        command = commands.add_parser(name, help=f"{name.capitalize()} one month in all three tables")
+        command.add_argument("month", type=parse_month)
+
+    args = parser.parse_args()
+    db = sessionmaker(bind=create_engine(args.database_url))()
+    try:
+        if args.command == "list":
+            for month in sorted(partitions.partition_months(db)):
+                print(f"{month:%Y-%m}")
+        elif args.command == "ensure":
+            created = partitions.ensure_partitions(db, partitions.months_between(args.first, args.last))
+            print(f"Created {len(created)} partitions")
+        elif args.command == "drop-before":
+            dropped = partitions.drop_partitions_before(db, args.cutoff)
+            print("Dropped " + (", ".join(f"{month:%Y-%m}" for month in dropped) or "nothing"))
+        elif args.command == "detach":
+            print("Detached " + ", ".join(partitions.detach_month(db, partitions.month_start(args.month))))
+        elif args.command == "attach":
+            print("Attached " + ", ".join(partitions.attach_month(db, partitions.month_start(args.month))))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
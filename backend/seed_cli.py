@@ -2,15 +2,18 @@ import asyncio
 import argparse
 import sys
 from datetime import datetime
+from typing import Optional
 from temporalio.client import Client
 
 from app.workflows.ingestion import DataIngestionWorkflow
 from app.core.config import settings
 
 
-async def seed_database(url: str) -> None:
+async def seed_database(url: str, mode: str = "replace", shards: Optional[int] = None) -> None:
     print(f"🚀 Starting data ingestion workflow")
     print(f"📊 Dataset URL: {url}")
+    print(f"🔁 Mode: {mode}")
+    print(f"🧩 Shards: {shards if shards is not None else 'worker default (INGESTION_SHARDS)'}")
     print(f"⏰ Started at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print()
 
@@ -25,7 +28,7 @@ async def seed_database(url: str) -> None:
         print(f"🎬 Starting workflow: {workflow_id}")
         handle = await client.start_workflow(
             DataIngestionWorkflow.run,
-            url,
+            args=[url, mode, shards],
             id=workflow_id,
             task_queue="data-ingestion",
         )
@@ -44,10 +47,18 @@ async def seed_database(url: str) -> None:
         print(f"🔐 Dataset Hash: {result['dataset_hash'][:16]}...")
         print(f"📦 Dataset Size: {result['dataset_size_bytes']:,} bytes")
         print()
+        if result['skipped']['upload']:
+            print("♻️  Dataset already in S3, upload skipped")
+        if result['skipped']['load']:
+            print("♻️  Dataset already loaded, database insert skipped")
+            print()
         print("📊 Records Inserted:")
         print(f"   Products:        {result['statistics']['products']:,}")
         print(f"   Machine States:  {result['statistics']['machine_states']:,}")
         print(f"   Defects:         {result['statistics']['defects']:,}")
+        if "updated" in result['statistics']:
+            print(f"   Updated:         {result['statistics']['updated']:,}")
+            print(f"   Unchanged:       {result['statistics']['unchanged']:,}")
         print()
         print("⏰ Completed at:", datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
         print()
@@ -63,8 +74,24 @@ async def seed_database(url: str) -> None:
 def main():
     parser = argparse.ArgumentParser(description="Seed database with manufacturing quality data")
     parser.add_argument("--url", required=True, help="URL of dataset JSON file to download and ingest")
+    parser.add_argument(
+        "--mode",
+        choices=["replace", "append", "swap"],
+        default="replace",
+        help=(
+            "replace: truncate and reload everything; "
+            "append: insert new records and update changed ones; "
+            "swap: reload into shadow tables and swap them in atomically (PostgreSQL)"
+        ),
+    )
+    parser.add_argument(
+        "--shards",
+        type=int,
+        default=None,
+        help="Number of parallel insert activities the dataset is split into (default: the worker's INGESTION_SHARDS)",
+    )
     args = parser.parse_args()
-    asyncio.run(seed_database(args.url))
+    asyncio.run(seed_database(args.url, args.mode, args.shards))
 
 
 if __name__ == "__main__":
@@ -1,5 +1,7 @@
 import pytest
 import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from typing import Generator
 from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, Session
@@ -10,7 +12,10 @@ import random
 
 from app.main import app
 from app.core.database import Base, get_db
-from app.models import Product, MachineState, Defect
+from app.models import Product, MachineState, Defect, DatasetIngestion
+from app.services import rollups
+from app.services.bulk_loader import BulkLoader
+from app.services.defect_registry import mask_for
 
 
 TEST_DATABASE_URL = "sqlite:///:memory:"
@@ -69,6 +74,19 @@ def db_engine():
     engine.dispose()
 
 
+@pytest.fixture
+def sql_statements(db_engine) -> Generator[list, None, None]:
+    """
+    Every SQL statement run on the test engine, in order. Clear the list
+    right before the part of a test whose queries it checks.
+    """
+    statements = []
+    listen = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db_engine, "before_cursor_execute", listen)
+    yield statements
+    event.remove(db_engine, "before_cursor_execute", listen)
+
+
 @pytest.fixture(scope="function")
 def db_session(db_engine) -> Generator[Session, None, None]:
     TestSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=db_engine)
@@ -81,6 +99,19 @@ def db_session(db_engine) -> Generator[Session, None, None]:
         session.close()
 
 
+@pytest.fixture(autouse=True)
+def clear_response_cache():
+    """Analytics responses are cached per process; start every test cold."""
+    from app.api.endpoints.analytics import hot_store, response_cache
+
+    response_cache.clear()
+    response_cache.version_ttl = 0
+    hot_store.clear()
+    yield
+    response_cache.clear()
+    hot_store.clear()
+
+
 @pytest.fixture(scope="function")
 def client(db_session) -> Generator[TestClient, None, None]:
     def override_get_db():
@@ -119,6 +150,7 @@ def sample_machine_state(db_session, sample_product) -> MachineState:
     machine_state = MachineState(
         id=get_next_machine_state_id(),
         product_id=sample_product.id,
+        product_timestamp=sample_product.timestamp,
         cycle_time=25.5,
         shot_count=1000,
     )
@@ -133,6 +165,8 @@ def sample_defect(db_session, sample_product) -> Defect:
     defect = Defect(
         id=get_next_defect_id(),
         product_id=sample_product.id,
+        product_timestamp=sample_product.timestamp,
+        molding_machine_id=sample_product.molding_machine_id,
         defect_type="flash_defect",
         pixel_severity_value=0.75,
         pixel_severity_reject=True,
@@ -157,13 +191,15 @@ def populated_db(db_session) -> Session:
     ]
 
     for i in range(100):
+        product_defect_types = random.sample(defect_types, random.randint(0, 3))
         product = Product(
             id=get_next_product_id(),
             version="1.0",
             timestamp=base_timestamp + timedelta(hours=i),
             molding_machine_id=random.choice(machines),
             overall_reject=random.choice([True, False]),
-            defect_count=random.randint(0, 3),
+            defect_count=len(product_defect_types),
+            defect_mask=mask_for(product_defect_types),
             total_severity_score=random.uniform(0, 3.0),
         )
         db_session.add(product)
@@ -172,28 +208,62 @@ def populated_db(db_session) -> Session:
         machine_state = MachineState(
             id=get_next_machine_state_id(),
             product_id=product.id,
+            product_timestamp=product.timestamp,
             cycle_time=random.uniform(20.0, 35.0),
             shot_count=random.randint(500, 2000),
         )
         db_session.add(machine_state)
 
-        defect_count = product.defect_count
-        if defect_count > 0:
-            for _ in range(defect_count):
-                defect = Defect(
-                    id=get_next_defect_id(),
-                    product_id=product.id,
-                    defect_type=random.choice(defect_types),
-                    pixel_severity_value=random.uniform(0.1, 1.0),
-                    pixel_severity_reject=random.choice([True, False]),
-                    reject=random.choice([True, False]),
-                )
-                db_session.add(defect)
+        for defect_type in product_defect_types:
+            defect = Defect(
+                id=get_next_defect_id(),
+                product_id=product.id,
+                product_timestamp=product.timestamp,
+                molding_machine_id=product.molding_machine_id,
+                defect_type=defect_type,
+                pixel_severity_value=random.uniform(0.1, 1.0),
+                pixel_severity_reject=random.choice([True, False]),
+                reject=random.choice([True, False]),
+            )
+            db_session.add(defect)
 
     db_session.commit()
     return db_session
 
 
+def make_ingested_records(count: int = 120):
+    """Deterministic records spread over two days, three machines and several defect types."""
+    defect_types = ["flash_defect", "short_defect", "void_defect", "burn_mark_defect"]
+    base = datetime(2024, 3, 1).timestamp()
+    records = []
+    for i in range(count):
+        defects = defect_types[:i % 4] if i % 3 else []
+        object_detection = {"reject": bool(defects)}
+        for defect_type in defects:
+            object_detection[defect_type] = {
+                "reject": True,
+                "pixel_severity": {"value": 0.1 * (i % 10), "reject": i % 2 == 0},
+            }
+        records.append({
+            "version": "1.0",
+            "timestamp": base + i * 1500,
+            "molding_machine_id": f"molding-machine-{i % 3 + 1}",
+            "object_detection": object_detection,
+            "molding-machine-state": {"CycleTime": 20.0 + i % 15, "ShotCount": 5000 + i},
+        })
+    return records
+
+
+@pytest.fixture
+def ingested_db(db_session) -> Session:
+    """Data loaded the way ingestion loads it: bulk rows, hourly rollups and a ledger entry."""
+    BulkLoader(db_session).load(make_ingested_records())
+    rollups.refresh(db_session)
+    db_session.add(DatasetIngestion(dataset_hash="ingested", status="completed", products=120))
+    db_session.commit()
+    return db_session
+
+
 @pytest.fixture
 def mock_s3_service(monkeypatch):
     class MockS3Service:
@@ -213,7 +283,21 @@ def mock_s3_service(monkeypatch):
             self.uploaded_files[object_key] = file_content
             return f"s3://test-bucket/{object_key}"
 
-        def download_file(self, object_key: str) -> bytes:
+        def upload_fileobj(self, fileobj, object_key: str, part_size=None, max_concurrency=None) -> str:
+            self.uploaded_files[object_key] = fileobj.read()
+            return f"s3://test-bucket/{object_key}"
+
+        def download_file(self, object_key: str, filepath: str, part_size=None, max_concurrency=None) -> None:
+            with open(filepath, "wb") as f:
+                f.write(self._content(object_key))
+
+        def download_fileobj(self, object_key: str, fileobj, part_size=None, max_concurrency=None) -> None:
+            fileobj.write(self._content(object_key))
+
+        def download_range(self, object_key: str, fileobj, start: int, end=None) -> None:
+            fileobj.write(self._content(object_key)[start:end])
+
+        def _content(self, object_key: str) -> bytes:
             if object_key not in self.uploaded_files:
                 raise Exception("File not found")
             return self.uploaded_files[object_key]
@@ -227,4 +311,64 @@ def mock_s3_service(monkeypatch):
     mock_service = MockS3Service()
     monkeypatch.setattr("app.services.s3_service.s3_service", mock_service)
     monkeypatch.setattr("app.workflows.activities.s3_service", mock_service)
-    return mock_service
\ No newline at end of file
+    return mock_service
+
+
+@pytest.fixture
+def http_server():
+    """
+    Local HTTP server standing in for the remote dataset host.
+
+    Serves ``server.payload`` with Range support. Setting ``drop_after`` makes
+    the next response close the connection after that many body bytes, and
+    ``ignore_range`` makes the server always answer with the full body.
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            state.requests.append(dict(self.headers))
+            payload = state.payload
+            start = 0
+
+            range_header = self.headers.get("Range")
+            if range_header and not state.ignore_range:
+                start = int(range_header.split("=")[1].split("-")[0])
+                if start >= len(payload):
+                    self.send_response(416)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(206)
+                self.send_header("Content-Range", f"bytes {start}-{len(payload) - 1}/{len(payload)}")
+            else:
+                self.send_response(200)
+
+            body = payload[start:]
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+
+            if state.drop_after is not None:
+                self.wfile.write(body[:state.drop_after])
+                self.wfile.flush()
+                state.drop_after = None
+                self.close_connection = True
+                return
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    state = server
+    state.payload = b""
+    state.drop_after = None
+    state.ignore_range = False
+    state.requests = []
+    state.url = f"http://127.0.0.1:{server.server_port}/dataset.json"
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield state
+
+    server.shutdown()
+    server.server_close()
@@ -1,11 +1,28 @@
 import pytest
+import hashlib
+import httpx
 import json
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import Mock, patch, AsyncMock
 from datetime import datetime
 
-from app.workflows.activities import download_dataset, upload_to_s3, batch_insert_to_db
-from app.models import Product
+from app.workflows.activities import (
+    download_dataset,
+    check_dataset,
+    upload_to_s3,
+    prepare_load,
+    plan_shards,
+    insert_shard,
+    finalize_load,
+    refresh_materialized_views,
+    abandon_load,
+)
+from sqlalchemy import func
+
+from app.models import Product, MachineState, Defect, DatasetIngestion, MachineHourlyRollup
+from app.services import ingestion_ledger
+from app.services.bulk_loader import BulkLoader
 
 
 @pytest.mark.workflow
@@ -30,65 +47,161 @@ class TestDownloadDatasetActivity:
         assert "filepath" in result
 
     @pytest.mark.asyncio
-    async def test_download_http_success(self):
-        test_data = b'[{"id": 1}]'
+    async def test_download_http_success(self, http_server):
+        http_server.payload = b'[{"id": 1}]'
 
-        with patch('app.workflows.activities.httpx.AsyncClient') as mock_client:
-            mock_response = Mock()
-            mock_response.content = test_data
-            mock_response.raise_for_status = Mock()
+        with patch('app.workflows.activities.activity') as mock_activity:
+            mock_activity.logger = Mock()
+            mock_activity.info.return_value.heartbeat_details = []
 
-            mock_get = AsyncMock(return_value=mock_response)
-            mock_client.return_value.__aenter__.return_value.get = mock_get
+            result = await download_dataset(http_server.url)
 
-            with patch('app.workflows.activities.activity') as mock_activity:
-                mock_activity.logger = Mock()
+        assert result["size_bytes"] == len(http_server.payload)
+        assert result["hash"] == hashlib.sha256(http_server.payload).hexdigest()
+        with open(result["filepath"], 'rb') as f:
+            assert f.read() == http_server.payload
 
-                result = await download_dataset("https://example.com/data.json")
+    @pytest.mark.asyncio
+    async def test_download_http_resumes_with_range(self, http_server):
+        http_server.payload = json.dumps([{"id": i} for i in range(5000)]).encode()
+        http_server.drop_after = 10000
 
-        assert result["size_bytes"] == len(test_data)
-        assert "hash" in result
-        assert "filepath" in result
+        with patch('app.workflows.activities.activity') as mock_activity:
+            mock_activity.logger = Mock()
+            mock_activity.info.return_value.heartbeat_details = []
+            with patch('app.workflows.activities.asyncio.sleep', new_callable=AsyncMock):
+                result = await download_dataset(http_server.url)
+
+        assert len(http_server.requests) == 2
+        assert "Range" not in http_server.requests[0]
+        assert http_server.requests[1]["Range"] == "bytes=10000-"
+        assert result["size_bytes"] == len(http_server.payload)
+        assert result["hash"] == hashlib.sha256(http_server.payload).hexdigest()
+        with open(result["filepath"], 'rb') as f:
+            assert f.read() == http_server.payload
 
     @pytest.mark.asyncio
-    @pytest.mark.xfail(reason="Async mock timing issue - not critical to core functionality")
-    async def test_download_http_retry_on_failure(self):
-        test_data = b'{"data": "success"}'
+    async def test_download_http_restarts_when_range_ignored(self, http_server):
+        http_server.payload = json.dumps([{"id": i} for i in range(5000)]).encode()
+        http_server.drop_after = 10000
+        http_server.ignore_range = True
 
-        call_count = 0
+        with patch('app.workflows.activities.activity') as mock_activity:
+            mock_activity.logger = Mock()
+            mock_activity.info.return_value.heartbeat_details = []
+            with patch('app.workflows.activities.asyncio.sleep', new_callable=AsyncMock):
+                result = await download_dataset(http_server.url)
 
-        async def mock_get_with_retries(*args, **kwargs):
-            nonlocal call_count
-            call_count += 1
-            if call_count < 3:
-                raise Exception("Network error")
-            mock_response = Mock()
-            mock_response.content = test_data
-            mock_response.raise_for_status = Mock()
-            return mock_response
+        assert result["hash"] == hashlib.sha256(http_server.payload).hexdigest()
+        with open(result["filepath"], 'rb') as f:
+            assert f.read() == http_server.payload
 
-        with patch('app.workflows.activities.httpx.AsyncClient') as mock_client:
-            mock_client.return_value.__aenter__.return_value.get = AsyncMock(side_effect=mock_get_with_retries)
+    @pytest.mark.asyncio
+    async def test_download_http_resumes_from_heartbeat_details(self, http_server, tmp_path):
+        http_server.payload = json.dumps([{"id": i} for i in range(5000)]).encode()
+        partial = tmp_path / "partial.json"
+        partial.write_bytes(http_server.payload[:20000])
 
-            with patch('app.workflows.activities.activity') as mock_activity:
-                mock_activity.logger = Mock()
+        with patch('app.workflows.activities.activity') as mock_activity:
+            mock_activity.logger = Mock()
+            mock_activity.info.return_value.heartbeat_details = [str(partial), 20000]
+
+            result = await download_dataset(http_server.url)
+
+        assert http_server.requests[0]["Range"] == "bytes=20000-"
+        assert result["filepath"] == str(partial)
+        assert result["hash"] == hashlib.sha256(http_server.payload).hexdigest()
+        mock_activity.heartbeat.assert_called_with(str(partial), len(http_server.payload))
+
+    @pytest.mark.asyncio
+    async def test_download_http_heartbeats_on_time_as_well_as_bytes(self, http_server):
+        http_server.payload = b"x" * (256 * 1024)
+
+        with patch('app.workflows.activities.activity') as mock_activity:
+            mock_activity.logger = Mock()
+            mock_activity.info.return_value.heartbeat_details = []
+            with patch('app.workflows.activities.HEARTBEAT_EVERY_SECONDS', 0.0):
+                await download_dataset(http_server.url)
+
+        # Far below HEARTBEAT_EVERY_BYTES, so only the clock triggers these
+        assert mock_activity.heartbeat.call_count > 1
+
+    @pytest.mark.asyncio
+    async def test_download_http_all_retries_fail(self, http_server):
+        http_server.payload = b"not found"
+
+        with patch('app.workflows.activities.activity') as mock_activity:
+            mock_activity.logger = Mock()
+            mock_activity.info.return_value.heartbeat_details = []
+            with patch('app.workflows.activities.httpx.AsyncClient.stream') as mock_stream:
+                mock_stream.side_effect = httpx.ConnectError("Network error")
                 with patch('app.workflows.activities.asyncio.sleep', new_callable=AsyncMock):
-                    result = await download_dataset("https://example.com/data.json")
+                    with pytest.raises(httpx.ConnectError):
+                        await download_dataset(http_server.url)
+
+        assert mock_stream.call_count == 3
 
-        assert result["size_bytes"] > 0
-        assert call_count == 3
 
+@pytest.mark.workflow
+class TestCheckDatasetActivity:
     @pytest.mark.asyncio
-    async def test_download_http_all_retries_fail(self):
-        with patch('app.workflows.activities.httpx.AsyncClient') as mock_client:
-            mock_get = AsyncMock(side_effect=Exception("Network error"))
-            mock_client.return_value.__aenter__.return_value.get = mock_get
+    async def test_new_dataset(self, db_session, mock_s3_service):
+        with patch('app.workflows.activities.SessionLocal', return_value=db_session):
+            with patch('app.workflows.activities.activity') as mock_activity:
+                mock_activity.logger = Mock()
+                result = await check_dataset({"hash": "newhash"})
+
+        assert result == {"s3_uri": None, "loaded": None}
 
+    @pytest.mark.asyncio
+    async def test_already_uploaded_and_loaded(self, db_session, mock_s3_service):
+        mock_s3_service.uploaded_files["datasets/seenhash.json"] = b"[]"
+        entry = ingestion_ledger.start_load(db_session, {"hash": "seenhash", "url": "file:///data.json"})
+        ingestion_ledger.complete_load(
+            db_session, entry, {"products": 10, "machine_states": 10, "defects": 4}
+        )
+
+        with patch('app.workflows.activities.SessionLocal', return_value=db_session):
             with patch('app.workflows.activities.activity') as mock_activity:
                 mock_activity.logger = Mock()
-                with patch('app.workflows.activities.asyncio.sleep', new_callable=AsyncMock):
-                    with pytest.raises(Exception):
-                        await download_dataset("https://example.com/data.json")
+                result = await check_dataset({"hash": "seenhash"})
+
+        assert result["s3_uri"] == "s3://test-bucket/datasets/seenhash.json"
+        assert result["loaded"]["products"] == 10
+        assert result["loaded"]["defects"] == 4
+
+
+@pytest.mark.database
+class TestIngestionLedger:
+    def test_only_latest_completed_load_counts(self, db_session):
+        stats = {"products": 1, "machine_states": 1, "defects": 0}
+        first = ingestion_ledger.start_load(db_session, {"hash": "first"})
+        ingestion_ledger.complete_load(db_session, first, stats)
+        second = ingestion_ledger.start_load(db_session, {"hash": "second"})
+        ingestion_ledger.complete_load(db_session, second, stats)
+
+        assert ingestion_ledger.find_loaded(db_session, "first") is None
+        assert ingestion_ledger.find_loaded(db_session, "second").id == second.id
+
+    def test_append_loads_count_until_next_replace(self, db_session):
+        stats = {"products": 1, "machine_states": 1, "defects": 0}
+        for dataset_hash, mode in [("base", "replace"), ("daily", "append")]:
+            entry = ingestion_ledger.start_load(db_session, {"hash": dataset_hash, "mode": mode})
+            ingestion_ledger.complete_load(db_session, entry, stats)
+
+        assert ingestion_ledger.find_loaded(db_session, "base") is not None
+        assert ingestion_ledger.find_loaded(db_session, "daily") is not None
+
+        entry = ingestion_ledger.start_load(db_session, {"hash": "other", "mode": "replace"})
+        ingestion_ledger.complete_load(db_session, entry, stats)
+
+        assert ingestion_ledger.find_loaded(db_session, "daily") is None
+
+    def test_failed_load_is_not_loaded(self, db_session):
+        entry = ingestion_ledger.start_load(db_session, {"hash": "broken"})
+        ingestion_ledger.fail_load(db_session, entry)
+
+        assert ingestion_ledger.find_loaded(db_session, "broken") is None
 
 
 @pytest.mark.workflow
@@ -113,6 +226,7 @@ class TestUploadToS3Activity:
 
         assert result.startswith("s3://")
         assert "testhash123" in result
+        assert mock_s3_service.uploaded_files["datasets/testhash123.json"] == test_data
 
     @pytest.mark.asyncio
     async def test_upload_to_s3_no_filepath(self):
@@ -127,99 +241,296 @@ class TestUploadToS3Activity:
                 await upload_to_s3(dataset_info)
 
 
-@pytest.mark.workflow
-class TestBatchInsertToDbActivity:
-    @pytest.mark.asyncio
-    @pytest.mark.xfail(reason="TRUNCATE CASCADE not supported in SQLite - production uses PostgreSQL")
-    async def test_batch_insert_success(self, db_session):
-        test_data = [
-            {
-                "version": "1.0",
-                "timestamp": datetime.now().timestamp(),
-                "molding_machine_id": "molding-machine-1",
-                "object_detection": {
-                    "reject": False,
-                    "flash_defect": {
-                        "reject": True,
-                        "pixel_severity": {"value": 0.5, "reject": False}
-                    }
-                },
-                "molding-machine-state": {
-                    "CycleTime": 25.5,
-                    "ShotCount": 1000
-                }
-            }
-        ]
+def make_record(i, defects=()):
+    object_detection = {"reject": bool(defects)}
+    for defect_type in defects:
+        object_detection[defect_type] = {
+            "reject": True,
+            "pixel_severity": {"value": 0.5, "reject": True},
+        }
+    return {
+        "version": "1.0",
+        "timestamp": datetime(2024, 1, 1).timestamp() + i * 60,
+        "molding_machine_id": f"molding-machine-{i % 3 + 1}",
+        "object_detection": object_detection,
+        "molding-machine-state": {"CycleTime": 25.0 + i, "ShotCount": 1000 + i},
+    }
+
+
+def fail_on_call(failing_call):
+    """Side effect for BulkLoader.load_batch that fails once, on the given call."""
+    original = BulkLoader.load_batch
+    calls = []
+
+    def load_batch(self, records):
+        calls.append(len(records))
+        if len(calls) == failing_call:
+            raise RuntimeError("connection reset")
+        return original(self, records)
+
+    return load_batch
+
+
+@pytest.mark.database
+class TestShardedLoadActivities:
+    @pytest.fixture
+    def dataset_info(self, tmp_path):
+        path = tmp_path / "data.json"
+        path.write_text(json.dumps([make_record(i, ["flash_defect"] if i % 3 == 0 else []) for i in range(30)]))
+        return {"filepath": str(path), "hash": "shardhash", "mode": "replace", "shards": 3}
+
+    @pytest.fixture
+    def mock_activity(self, db_session):
+        with patch('app.workflows.activities.SessionLocal') as mock_session_local:
+            mock_session_local.return_value = db_session
+            with patch('app.workflows.activities.activity') as mock_activity:
+                mock_activity.logger = Mock()
+                mock_activity.info.return_value.heartbeat_details = []
+                yield mock_activity
 
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as f:
-            json.dump(test_data, f)
-            temp_path = f.name
+    def start(self, dataset_info):
+        """The dataset info the workflow hands to shards once prepare_load has run."""
+        return {**dataset_info, "ingestion_id": prepare_load(dataset_info)["ingestion_id"]}
 
-        dataset_info = {
-            "filepath": temp_path,
-            "hash": "testhash",
+    def test_sharded_load_matches_single_load(self, db_session, dataset_info, mock_activity):
+        dataset_info = self.start(dataset_info)
+        shards = plan_shards(dataset_info)
+        results = [insert_shard(dataset_info, shard) for shard in shards]
+
+        stats = {key: sum(result[key] for result in results) for key in results[0]}
+        finalize_load(dataset_info, dataset_info["ingestion_id"], stats)
+
+        assert len(shards) == 3
+        assert stats == {"products": 30, "machine_states": 30, "defects": 10}
+        assert db_session.query(Product).count() == 30
+        assert db_session.query(Defect).count() == 10
+
+        entry = db_session.get(DatasetIngestion, dataset_info["ingestion_id"])
+        assert entry.status == "completed"
+        assert entry.products == 30
+
+        rolled_up = db_session.query(func.sum(MachineHourlyRollup.total_products)).scalar()
+        assert rolled_up == 30
+
+    def test_prepare_load_clears_existing_data(self, db_session, dataset_info, mock_activity):
+        shard = plan_shards(dataset_info)[0]
+        insert_shard(self.start(dataset_info), shard)
+
+        prepare_load(dataset_info)
+
+        assert db_session.query(Product).count() == 0
+        assert db_session.query(MachineHourlyRollup).count() == 0
+
+    def test_prepare_load_rejects_unknown_mode(self, db_session, dataset_info, mock_activity):
+        with pytest.raises(ValueError, match="Unknown ingestion mode"):
+            prepare_load({**dataset_info, "mode": "merge"})
+
+        assert db_session.query(DatasetIngestion).count() == 0
+
+    def test_insert_shard_checkpoints_progress_in_ledger(self, db_session, dataset_info, mock_activity):
+        dataset_info = self.start(dataset_info)
+        shard = plan_shards(dataset_info)[0]
+
+        stats = insert_shard(dataset_info, shard)
+
+        first = make_record(0)["timestamp"]
+        last = make_record(shard["records"] - 1)["timestamp"]
+        checkpoint = ingestion_ledger.get_checkpoint(db_session, dataset_info["ingestion_id"], shard["index"])
+        assert checkpoint["offset"] == shard["end_offset"]
+        assert checkpoint["time_range"] == [first, last]
+        assert {key: checkpoint["counts"][key] for key in stats} == stats
+        assert stats["products"] == shard["records"]
+
+    def test_insert_shard_resumes_from_ledger_checkpoint(self, db_session, dataset_info, mock_activity):
+        dataset_info = self.start(dataset_info)
+        shard = plan_shards({**dataset_info, "shards": 1})[0]
+
+        with patch('app.workflows.activities.settings.INGESTION_BATCH_SIZE', 10):
+            with patch.object(BulkLoader, 'load_batch', autospec=True, side_effect=fail_on_call(2)):
+                with pytest.raises(RuntimeError):
+                    insert_shard(dataset_info, shard)
+
+            checkpoint = ingestion_ledger.get_checkpoint(db_session, dataset_info["ingestion_id"], 0)
+            assert checkpoint["counts"]["products"] == 10
+            assert db_session.query(Product).count() == 10
+
+            # Heartbeat details are not consulted, however stale they are
+            mock_activity.info.return_value.heartbeat_details = [{"offset": 0}]
+            stats = insert_shard(dataset_info, shard)
+
+        assert stats == {"products": 30, "machine_states": 30, "defects": 10}
+        assert db_session.query(Product).count() == 30
+
+    def test_retried_shard_in_append_mode_inserts_once(self, db_session, dataset_info, mock_activity):
+        dataset_info = self.start({**dataset_info, "mode": "append"})
+        shard = plan_shards(dataset_info)[1]
+
+        first = insert_shard(dataset_info, shard)
+        retry = insert_shard(dataset_info, shard)
+
+        assert retry == first
+        assert db_session.query(Product).count() == shard["records"]
+
+    def test_shards_fetch_their_range_from_s3_on_other_workers(
+        self, db_session, dataset_info, mock_activity, mock_s3_service, tmp_path
+    ):
+        with open(dataset_info["filepath"], "rb") as f:
+            mock_s3_service.uploaded_files["datasets/shardhash.json"] = f.read()
+        elsewhere = {
+            **dataset_info,
+            "filepath": str(tmp_path / "on-another-worker.json"),
+            "s3_uri": "s3://test-bucket/datasets/shardhash.json",
         }
 
-        with patch('app.workflows.activities.SessionLocal') as mock_session_local:
-            mock_session_local.return_value = db_session
+        elsewhere = self.start(elsewhere)
+        shards = plan_shards(elsewhere)
+        results = [insert_shard(elsewhere, shard) for shard in shards]
 
-            with patch('app.workflows.activities.text') as mock_text:
-                mock_text.return_value = None
+        assert shards == plan_shards(dataset_info)
+        assert sum(result["products"] for result in results) == 30
+        assert db_session.query(Defect).count() == 10
 
-                with patch('app.workflows.activities.activity') as mock_activity:
-                    mock_activity.logger = Mock()
+    def test_shard_without_local_file_or_s3_uri_fails(self, dataset_info, mock_activity, tmp_path):
+        missing = {**dataset_info, "filepath": str(tmp_path / "missing.json")}
 
-                    db_session.query(Product).delete()
-                    db_session.commit()
+        with pytest.raises(ValueError, match="neither on this worker nor in S3"):
+            plan_shards(missing)
 
-                    result = await batch_insert_to_db(dataset_info)
+    def test_refresh_materialized_views_marks_ledger(self, db_session, dataset_info, mock_activity):
+        load = prepare_load(dataset_info)
+        finalize_load(dataset_info, load["ingestion_id"], {"products": 0, "machine_states": 0, "defects": 0})
 
-        assert result["products"] == 1
-        assert result["machine_states"] == 1
-        assert result["defects"] == 1
+        refresh_materialized_views(load["ingestion_id"])
 
-    @pytest.mark.asyncio
-    async def test_batch_insert_no_filepath(self):
-        dataset_info = {"hash": "test"}
+        assert db_session.get(DatasetIngestion, load["ingestion_id"]).views_refreshed_at is not None
 
-        with patch('app.workflows.activities.activity') as mock_activity:
-            mock_activity.logger = Mock()
-            with pytest.raises(ValueError, match="No filepath provided"):
-                await batch_insert_to_db(dataset_info)
+    def test_abandon_load_marks_ledger_failed(self, db_session, dataset_info, mock_activity):
+        load = prepare_load(dataset_info)
 
-    @pytest.mark.asyncio
-    @pytest.mark.xfail(reason="TRUNCATE CASCADE not supported in SQLite - production uses PostgreSQL")
-    async def test_batch_insert_multiple_products(self, db_session):
-        test_data = [
-            {
-                "version": "1.0",
-                "timestamp": datetime.now().timestamp() + i,
-                "molding_machine_id": f"molding-machine-{i % 2 + 1}",
-                "object_detection": {"reject": False},
-                "molding-machine-state": {"CycleTime": 25.0 + i, "ShotCount": 1000 + i}
-            }
-            for i in range(10)
+        abandon_load(load["ingestion_id"])
+
+        assert db_session.get(DatasetIngestion, load["ingestion_id"]).status == "failed"
+
+    def test_plan_shards_defaults_to_setting(self, dataset_info, mock_activity):
+        with patch('app.workflows.activities.settings.INGESTION_SHARDS', 2):
+            shards = plan_shards({**dataset_info, "shards": None})
+
+        assert len(shards) == 2
+
+    def test_parallel_shards_reserve_distinct_ids(self, db_session):
+        loaders = [BulkLoader(db_session) for _ in range(4)]
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            blocks = list(pool.map(lambda loader: loader.reserve_ids("products", 50), loaders))
+
+        ids = [i for block in blocks for i in block]
+        assert len(set(ids)) == 200
+
+    def test_plan_shards_rejects_non_positive_count(self, dataset_info, mock_activity):
+        with pytest.raises(ValueError, match="Shard count must be positive"):
+            plan_shards({**dataset_info, "shards": 0})
+
+
+@pytest.mark.database
+class TestBulkLoader:
+    def test_load_assigns_ids_and_links_children(self, db_session):
+        records = [
+            make_record(0, defects=("flash_defect", "short_defect")),
+            make_record(1),
+            make_record(2, defects=("void_defect",)),
         ]
 
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as f:
-            json.dump(test_data, f)
-            temp_path = f.name
+        loader = BulkLoader(db_session, batch_size=2)
+        stats = loader.load(records)
 
-        dataset_info = {"filepath": temp_path, "hash": "testhash"}
+        assert loader.method == "insert"
+        assert stats == {"products": 3, "machine_states": 3, "defects": 3}
 
-        with patch('app.workflows.activities.SessionLocal') as mock_session_local:
-            mock_session_local.return_value = db_session
+        products = db_session.query(Product).order_by(Product.id).all()
+        assert [p.id for p in products] == [1, 2, 3]
+        assert [p.defect_count for p in products] == [2, 0, 1]
+        assert products[0].machine_state.shot_count == 1000
+        assert {d.defect_type for d in products[0].defects} == {"flash_defect", "short_defect"}
+
+    def test_load_continues_ids_after_existing_rows(self, db_session, sample_product):
+        BulkLoader(db_session).load([make_record(0)])
+
+        ids = [p.id for p in db_session.query(Product).order_by(Product.id)]
+        assert ids == [sample_product.id, sample_product.id + 1]
+
+    def test_truncate_clears_all_tables(self, db_session, sample_machine_state, sample_defect):
+        BulkLoader(db_session).truncate()
+
+        assert db_session.query(Product).count() == 0
+        assert db_session.query(MachineState).count() == 0
+        assert db_session.query(Defect).count() == 0
+
+    def test_upsert_inserts_new_and_updates_changed(self, db_session):
+        BulkLoader(db_session).load([make_record(0), make_record(1), make_record(2)])
+
+        changed = make_record(1, defects=("flash_defect",))
+        changed["molding-machine-state"]["CycleTime"] = 99.0
+        stats = BulkLoader(db_session).upsert([make_record(0), changed, make_record(2), make_record(3)])
+
+        assert stats["products"] == 1
+        assert stats["updated"] == 1
+        assert stats["unchanged"] == 2
+        assert db_session.query(Product).count() == 4
+
+        product = db_session.query(Product).filter(Product.id == 2).one()
+        assert product.overall_reject is True
+        assert product.defect_count == 1
+        assert float(product.machine_state.cycle_time) == 99.0
+        assert [d.defect_type for d in product.defects] == ["flash_defect"]
+
+    def test_load_maps_full_machine_telemetry(self, db_session):
+        record = make_record(0)
+        record["molding-machine-state"].update({
+            "Barrel1": 230.5,
+            "HoldSegment2PressureSp": 810.25,
+            "ClampForceSp": 1500.0,
+            "CushionFin": 4.125,
+            "AlarmLed": 1,
+        })
+
+        BulkLoader(db_session).load([record])
+
+        state = db_session.query(MachineState).one()
+        assert float(state.barrel_1) == 230.5
+        assert float(state.hold_segment_2_pressure_sp) == 810.25
+        assert state.clamp_force_sp == 1500
+        assert float(state.cushion_fin) == 4.125
+        assert state.alarm_led is True
+        assert state.vtop_time is None
+
+    def test_upsert_detects_telemetry_changes(self, db_session):
+        record = make_record(0)
+        record["molding-machine-state"]["Barrel2"] = 220.0
+        BulkLoader(db_session).load([record])
+
+        record["molding-machine-state"]["Barrel2"] = 225.0
+        stats = BulkLoader(db_session).upsert([record])
+
+        assert stats["updated"] == 1
+        assert float(db_session.query(MachineState).one().barrel_2) == 225.0
+
+    def test_upsert_replaces_removed_defects(self, db_session):
+        BulkLoader(db_session).load([make_record(0, defects=("flash_defect", "void_defect"))])
+
+        stats = BulkLoader(db_session).upsert([make_record(0, defects=("void_defect",))])
 
-            with patch('app.workflows.activities.text') as mock_text:
-                mock_text.return_value = None
+        assert stats["updated"] == 1
+        assert [d.defect_type for d in db_session.query(Defect).all()] == ["void_defect"]
 
-                with patch('app.workflows.activities.activity') as mock_activity:
-                    mock_activity.logger = Mock()
+    def test_upsert_is_idempotent(self, db_session):
+        records = [make_record(i, defects=("short_defect",)) for i in range(5)]
+        BulkLoader(db_session).load(records)
 
-                    db_session.query(Product).delete()
-                    db_session.commit()
+        stats = BulkLoader(db_session).upsert(records)
 
-                    result = await batch_insert_to_db(dataset_info)
+        assert stats["products"] == 0
+        assert stats["updated"] == 0
+        assert stats["unchanged"] == 5
 
-        assert result["products"] == 10
-        assert result["machine_states"] == 10
\ No newline at end of file
+    def test_copy_requires_postgresql(self, db_session):
+        with pytest.raises(ValueError, match="COPY loading requires PostgreSQL"):
+            BulkLoader(db_session, method="copy")
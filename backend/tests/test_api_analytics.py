@@ -1,7 +1,23 @@
+import inspect
+import json
+import re
+import statistics
+import sys
+import threading
 import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
 from fastapi.testclient import TestClient
 from datetime import datetime, timedelta
 
+from app.api.endpoints import analytics
+from app.core.config import settings
+from app.core.database import Base, get_db, get_session_factory
+from app.models import DatasetIngestion, Defect, MachineState, Product
+from app.services import materialized_views, rollups
+from app.services.bulk_loader import BulkLoader
+from tests.conftest import make_ingested_records
+
 
 @pytest.mark.api
 class TestHealthEndpoint:
@@ -15,6 +31,25 @@ class TestHealthEndpoint:
         assert "environment" in data
 
 
+@pytest.mark.api
+class TestRouteConcurrency:
+    def test_database_routes_run_on_threadpool(self):
+        """Routes that query the database must be sync so FastAPI runs them off the event loop."""
+        database_routes = [
+            route for route in analytics.router.routes
+            if any(dependency.call is get_db for dependency in route.dependant.dependencies)
+        ]
+
+        assert database_routes
+        for route in database_routes:
+            assert not inspect.iscoroutinefunction(route.endpoint), route.path
+
+    def test_default_threads_fit_the_connection_pool(self):
+        threads = settings.API_THREADPOOL_SIZE + settings.DASHBOARD_MAX_WORKERS
+
+        assert threads <= settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW
+
+
 @pytest.mark.api
 class TestMachinesEndpoint:
     def test_get_machines_empty_database(self, client: TestClient):
@@ -103,6 +138,50 @@ class TestDefectRateEndpoint:
         assert response.status_code in [200, 404]
 
 
+@pytest.mark.api
+class TestProductsDetailsEndpoint:
+    URL = "/api/v1/analytics/products/details"
+
+    def count_queries(self, sql_statements, client, url):
+        sql_statements.clear()
+        response = client.get(url)
+        return response, len(sql_statements)
+
+    def test_query_count_does_not_grow_with_ids(self, client: TestClient, ingested_db, sql_statements):
+        few = "&".join(f"ids={i}" for i in range(1, 4))
+        many = "&".join(f"ids={i}" for i in range(1, 101))
+
+        _, few_queries = self.count_queries(sql_statements, client, f"{self.URL}?{few}")
+        response, many_queries = self.count_queries(sql_statements, client, f"{self.URL}?{many}")
+
+        assert few_queries == many_queries == 2
+        assert len(response.json()["products"]) == 100
+
+    def test_matches_single_product_endpoint(self, client: TestClient, ingested_db):
+        product = ingested_db.query(Product).filter(Product.defect_count == 3).first()
+
+        details = client.get(f"{self.URL}?ids={product.id}").json()["products"][0]
+        single = client.get(f"/api/v1/analytics/product/{product.id}/defects").json()
+
+        assert details["product"] == single["product"]
+        assert sorted(d["defect_type"] for d in details["defects"]) == sorted(d["defect_type"] for d in single["defects"])
+        assert details["machine_state"]["cycle_time"] == float(single["machine_state"]["cycle_time"])
+        assert details["machine_state"]["product_id"] == product.id
+
+    def test_keeps_request_order_and_reports_missing(self, client: TestClient, ingested_db):
+        data = client.get(f"{self.URL}?ids=7&ids=999999&ids=3&ids=7").json()
+
+        assert [entry["product"]["id"] for entry in data["products"]] == [7, 3]
+        assert data["missing"] == [999999]
+
+    def test_rejects_too_many_ids(self, client: TestClient):
+        ids = "&".join(f"ids={i}" for i in range(analytics.MAX_DETAIL_PRODUCTS + 1))
+
+        response = client.get(f"{self.URL}?{ids}")
+
+        assert response.status_code == 400
+
+
 @pytest.mark.api
 class TestTopDefectsEndpoint:
     def test_get_top_defects_empty_database(self, client: TestClient):
@@ -143,6 +222,46 @@ class TestTopDefectsEndpoint:
             assert counts == sorted(counts, reverse=True)
 
 
+@pytest.mark.api
+class TestTopDefectsSummary:
+    @pytest.fixture(params=["raw", "rollups"])
+    def loaded_db(self, request, ingested_db):
+        if request.param == "raw":
+            ingested_db.query(DatasetIngestion).delete()
+            ingested_db.commit()
+        return ingested_db
+
+    def expected(self, db, machine_id=None):
+        query = db.query(Defect).join(Product)
+        if machine_id:
+            query = query.filter(Product.molding_machine_id == machine_id)
+        defects = query.all()
+        return len(defects), len({defect.product_id for defect in defects})
+
+    def test_total_covers_types_beyond_limit(self, client: TestClient, loaded_db):
+        data = client.get("/api/v1/analytics/top-defects?limit=1").json()
+        total, affected = self.expected(loaded_db)
+
+        assert len(data["defects"]) == 1
+        assert data["summary"]["total_defects"] == total
+        assert data["defects"][0]["count"] < total
+        assert data["defects"][0]["percentage"] == pytest.approx(data["defects"][0]["count"] / total * 100)
+
+    def test_affected_products_respects_filters(self, client: TestClient, loaded_db):
+        data = client.get("/api/v1/analytics/top-defects?machine_id=molding-machine-2").json()
+        total, affected = self.expected(loaded_db, "molding-machine-2")
+
+        assert data["summary"]["total_defects"] == total
+        assert data["summary"]["affected_products"] == affected
+        assert affected < self.expected(loaded_db)[1]
+
+    def test_no_matching_defects(self, client: TestClient, loaded_db):
+        data = client.get("/api/v1/analytics/top-defects?machine_id=unknown").json()
+
+        assert data["defects"] == []
+        assert data["summary"] == {"total_defects": 0, "most_common": "N/A", "affected_products": 0}
+
+
 @pytest.mark.api
 class TestMachineComparisonEndpoint:
     def test_get_machine_comparison_empty_database(self, client: TestClient):
@@ -179,6 +298,127 @@ class TestDefectDistributionEndpoint:
         assert isinstance(data["distribution"], list)
 
 
+@pytest.mark.api
+class TestDefectDistributionBuckets:
+    def test_buckets_come_from_defect_count(self, client: TestClient, db_session, sql_statements):
+        for i, defect_count in enumerate([0, 0, 1, 2, 4, 5, 7]):
+            db_session.add(Product(
+                id=1000 + i,
+                version="1.0",
+                timestamp=datetime(2024, 3, 1, i),
+                molding_machine_id="molding-machine-1",
+                overall_reject=defect_count > 0,
+                defect_count=defect_count,
+            ))
+        db_session.commit()
+
+        sql_statements.clear()
+        data = client.get("/api/v1/analytics/defect-distribution").json()
+
+        counts = {bucket["defect_count"]: bucket["product_count"] for bucket in data["distribution"]}
+        assert counts == {0: 2, 1: 1, 2: 1, 3: 0, 4: 1, "5+": 2}
+        assert data["summary"]["total_products"] == 7
+        assert data["summary"]["zero_defects"] == 2
+        assert not any("defects" in statement for statement in sql_statements)
+
+    def test_filters_apply(self, client: TestClient, ingested_db):
+        response = client.get(
+            "/api/v1/analytics/defect-distribution?machine_id=molding-machine-1"
+            "&start_date=2024-03-01T00:00:00&end_date=2024-03-01T11:59:59"
+        )
+
+        expected = ingested_db.query(Product).filter(
+            Product.molding_machine_id == "molding-machine-1",
+            Product.timestamp <= datetime(2024, 3, 1, 11, 59, 59),
+        ).count()
+        assert response.json()["summary"]["total_products"] == expected
+
+
+@pytest.mark.api
+class TestCycleTimeScatterSampling:
+    URL = "/api/v1/analytics/cycle-time-scatter"
+
+    @pytest.fixture
+    def scatter_db(self, db_session):
+        BulkLoader(db_session).load(make_ingested_records(count=600))
+        db_session.commit()
+        return db_session
+
+    def population(self, db, machine_id=None):
+        query = db.query(Product.molding_machine_id, Product.overall_reject, Product.defect_count, MachineState.cycle_time
+                         ).join(MachineState, Product.id == MachineState.product_id)
+        if machine_id:
+            query = query.filter(Product.molding_machine_id == machine_id)
+        return query.all()
+
+    def test_stats_cover_the_whole_population(self, client: TestClient, scatter_db):
+        rows = self.population(scatter_db)
+        cycle_times = [float(row.cycle_time) for row in rows]
+        defect_counts = [row.defect_count for row in rows]
+
+        stats = client.get(f"{self.URL}?limit=100").json()["stats"]
+
+        assert stats["sample_size"] == 100
+        assert stats["population_size"] == 600
+        assert stats["rejected_count"] == sum(1 for row in rows if row.overall_reject)
+        assert stats["accepted_count"] == 600 - stats["rejected_count"]
+        assert stats["average_cycle_time"] == round(statistics.mean(cycle_times), 2)
+        assert stats["average_defect_count"] == round(statistics.mean(defect_counts), 2)
+        assert stats["correlation"] == round(statistics.correlation(cycle_times, defect_counts), 3)
+
+    def test_stratified_sample_covers_every_stratum_proportionally(self, client: TestClient, scatter_db):
+        strata = {}
+        for row in self.population(scatter_db):
+            strata.setdefault((row.molding_machine_id, row.overall_reject), 0)
+            strata[(row.molding_machine_id, row.overall_reject)] += 1
+        machine_of = {product.id: product.molding_machine_id for product in scatter_db.query(Product)}
+
+        points = client.get(f"{self.URL}?limit=100&sampling=stratified").json()["points"]
+
+        sampled = {}
+        for point in points:
+            key = (machine_of[point["product_id"]], point["is_rejected"])
+            sampled[key] = sampled.get(key, 0) + 1
+        assert len(points) == 100
+        assert set(sampled) == set(strata)
+        for key, size in strata.items():
+            assert abs(sampled[key] - 100 * size / 600) <= 1
+
+    def test_random_sample_is_bounded_by_limit(self, client: TestClient, scatter_db):
+        data = client.get(f"{self.URL}?limit=150&sampling=random&machine_id=molding-machine-1").json()
+
+        assert len(data["points"]) == 150
+        assert len({point["product_id"] for point in data["points"]}) == 150
+        assert data["stats"]["population_size"] == len(self.population(scatter_db, "molding-machine-1"))
+        assert data["stats"]["sampling"] == "random"
+
+    @pytest.mark.parametrize("sampling", ["stratified", "random"])
+    def test_sampling_does_not_sort_the_population(self, client: TestClient, scatter_db, sql_statements, sampling):
+        sql_statements.clear()
+        data = client.get(f"{self.URL}?limit=100&sampling={sampling}").json()
+
+        assert len(data["points"]) == 100
+        assert not [s for s in sql_statements if re.search(r"ORDER BY\s+random\(\)", s, re.IGNORECASE)]
+        assert not [s for s in sql_statements if "row_number" in s.lower()]
+
+    def test_small_population_is_returned_whole(self, client: TestClient, ingested_db):
+        data = client.get(f"{self.URL}?limit=500&machine_id=molding-machine-2").json()
+
+        assert data["stats"]["sample_size"] == data["stats"]["population_size"] == 40
+
+    def test_tablesample_requires_postgresql(self, client: TestClient, scatter_db):
+        response = client.get(f"{self.URL}?sampling=tablesample")
+
+        assert response.status_code == 400
+
+    def test_empty_population(self, client: TestClient, db_session):
+        data = client.get(self.URL).json()
+
+        assert data["points"] == []
+        assert data["stats"]["population_size"] == 0
+        assert data["stats"]["correlation"] == 0
+
+
 @pytest.mark.api
 class TestMachineDefectHeatmapEndpoint:
     def test_get_heatmap_empty_database(self, client: TestClient):
@@ -192,4 +432,360 @@ class TestMachineDefectHeatmapEndpoint:
         assert response.status_code == 200
         data = response.json()
 
-        assert isinstance(data, (dict, list))
\ No newline at end of file
+        assert isinstance(data, (dict, list))
+
+
+@pytest.mark.api
+class TestDefectAggregatesFromMask:
+    """Raw defect aggregates are one pass over products, counting defect_mask bits."""
+
+    WINDOW = "start_date=2024-03-01T00:30:00&end_date=2024-03-01T05:59:59"
+
+    def statements_for(self, client, sql_statements, url):
+        sql_statements.clear()
+        data = client.get(url).json()
+        return data, [statement for statement in sql_statements if "dataset_ingestions" not in statement]
+
+    def joined_counts(self, db, machine_id=None):
+        query = db.query(Defect.defect_type).join(Product, Defect.product).filter(
+            Product.timestamp >= datetime(2024, 3, 1, 0, 30),
+            Product.timestamp <= datetime(2024, 3, 1, 5, 59, 59),
+        )
+        if machine_id:
+            query = query.filter(Product.molding_machine_id == machine_id)
+        counts = {}
+        for (defect_type,) in query:
+            counts[defect_type] = counts.get(defect_type, 0) + 1
+        return counts
+
+    def test_heatmap_scans_products_once(self, client: TestClient, ingested_db, sql_statements):
+        data, statements = self.statements_for(
+            client, sql_statements, f"/api/v1/analytics/machine-defect-heatmap?{self.WINDOW}"
+        )
+
+        assert len(statements) == 1
+        assert not re.search(r"\bdefects\b", statements[0])
+        assert data["metadata"]["total_defects"] == sum(self.joined_counts(ingested_db).values())
+
+    def test_top_defects_scans_products_once(self, client: TestClient, ingested_db, sql_statements):
+        data, statements = self.statements_for(
+            client, sql_statements,
+            f"/api/v1/analytics/top-defects?{self.WINDOW}&machine_id=molding-machine-2",
+        )
+
+        assert len(statements) == 1
+        assert not re.search(r"\bdefects\b", statements[0])
+        counts = self.joined_counts(ingested_db, "molding-machine-2")
+        assert {d["defect_type"]: d["count"] for d in data["defects"]} == counts
+        assert data["summary"]["total_defects"] == sum(counts.values())
+
+    def test_loader_copies_product_machine_to_defects(self, ingested_db):
+        mismatched = ingested_db.query(Defect).join(Product, Defect.product).filter(
+            Defect.molding_machine_id != Product.molding_machine_id
+        ).count()
+
+        assert ingested_db.query(Defect).count() > 0
+        assert mismatched == 0
+
+
+@pytest.mark.api
+class TestRollupBackedEndpoints:
+    """Endpoints answer from hourly rollups after ingestion and must agree with the raw scans."""
+
+    ALIGNED = "start_date=2024-03-01T00:00:00&end_date=2024-03-01T23:59:59"
+    MISALIGNED = "start_date=2024-03-01T00:30:00&end_date=2024-03-01T23:59:59"
+
+    def raw_then_rolled_up(self, client, db, url):
+        db.query(DatasetIngestion).delete()
+        db.commit()
+        raw = client.get(url).json()
+
+        db.add(DatasetIngestion(dataset_hash="ingested", status="completed"))
+        db.commit()
+        return raw, client.get(url).json()
+
+    @pytest.mark.parametrize("url", [
+        "/api/v1/analytics/machine-comparison",
+        "/api/v1/analytics/machine-defect-heatmap",
+        f"/api/v1/analytics/machine-defect-heatmap?{ALIGNED}",
+        "/api/v1/analytics/top-defects",
+        f"/api/v1/analytics/top-defects?{ALIGNED}&machine_id=molding-machine-2",
+    ])
+    def test_rollups_match_raw_queries(self, client: TestClient, ingested_db, url):
+        raw, rolled_up = self.raw_then_rolled_up(client, ingested_db, url)
+
+        assert rolled_up == raw
+
+    def test_misaligned_filters_scan_products(self, client: TestClient, ingested_db):
+        rollups.clear(ingested_db)
+
+        response = client.get(f"/api/v1/analytics/machine-defect-heatmap?{self.MISALIGNED}")
+        assert response.json()["metadata"]["total_defects"] > 0
+
+        response = client.get(f"/api/v1/analytics/machine-defect-heatmap?{self.ALIGNED}")
+        assert response.json()["metadata"]["total_defects"] == 0
+
+
+@pytest.mark.api
+class TestMaterializedViewBackedEndpoints:
+    """Without date filters, endpoints read the materialized views once they are current."""
+
+    @pytest.fixture
+    def viewed_db(self, ingested_db, db_engine):
+        # SQLite has no materialized views; stand in tables filled by the view queries
+        materialized_views.metadata.create_all(db_engine)
+        for view in (materialized_views.machine_comparison, materialized_views.machine_defect_heatmap):
+            ingested_db.execute(text(
+                f"INSERT INTO {view.name} {materialized_views.VIEW_QUERIES[view.name]}"
+            ))
+        ingested_db.commit()
+        return ingested_db
+
+    def rolled_up_then_viewed(self, client, url, monkeypatch):
+        rolled_up = client.get(url).json()
+        analytics.response_cache.clear()
+        monkeypatch.setattr(materialized_views, "available", lambda db: True)
+        return rolled_up, client.get(url).json()
+
+    @pytest.mark.parametrize("url", [
+        "/api/v1/analytics/machine-comparison",
+        "/api/v1/analytics/machine-defect-heatmap",
+    ])
+    def test_views_match_rollups(self, client: TestClient, viewed_db, monkeypatch, url):
+        rolled_up, viewed = self.rolled_up_then_viewed(client, url, monkeypatch)
+
+        assert viewed == rolled_up
+
+    def test_views_are_read(self, client: TestClient, viewed_db, monkeypatch):
+        viewed_db.execute(materialized_views.machine_comparison.delete())
+        viewed_db.commit()
+
+        _, viewed = self.rolled_up_then_viewed(client, "/api/v1/analytics/machine-comparison", monkeypatch)
+
+        assert viewed == {"machines": []}
+
+    def test_date_filters_bypass_views(self, client: TestClient, viewed_db, monkeypatch):
+        viewed_db.execute(materialized_views.machine_defect_heatmap.delete())
+        viewed_db.commit()
+        url = "/api/v1/analytics/machine-defect-heatmap?start_date=2024-03-01T00:00:00"
+
+        rolled_up, viewed = self.rolled_up_then_viewed(client, url, monkeypatch)
+
+        assert viewed == rolled_up
+        assert viewed["metadata"]["total_defects"] > 0
+
+
+@pytest.mark.api
+class TestHotStoreBackedEndpoints:
+    WINDOW = "start_date=2024-03-01T06:00:00&end_date=2024-03-02T07:30:00"
+
+    @pytest.fixture
+    def hot_db(self, ingested_db, monkeypatch):
+        monkeypatch.setattr(analytics.hot_store, "enabled", True)
+        monkeypatch.setattr(analytics.hot_store, "refresh_in_background", lambda: None)
+        analytics.hot_store.refresh(ingested_db)
+        return ingested_db
+
+    def sql_then_hot(self, client, url, monkeypatch):
+        monkeypatch.setattr(analytics.hot_store, "enabled", False)
+        sql = client.get(url).json()
+        analytics.response_cache.clear()
+        monkeypatch.setattr(analytics.hot_store, "enabled", True)
+        return sql, client.get(url).json()
+
+    @pytest.mark.parametrize("url", [
+        f"/api/v1/analytics/top-defects?{WINDOW}",
+        f"/api/v1/analytics/top-defects?{WINDOW}&machine_id=molding-machine-3&limit=2",
+        "/api/v1/analytics/top-defects",
+        f"/api/v1/analytics/defect-distribution?{WINDOW}&machine_id=molding-machine-1",
+        "/api/v1/analytics/defect-distribution",
+    ])
+    def test_matches_sql(self, client: TestClient, hot_db, monkeypatch, url):
+        sql, hot = self.sql_then_hot(client, url, monkeypatch)
+
+        assert hot == sql
+
+    @pytest.mark.parametrize("url", [
+        f"/api/v1/analytics/cycle-time-scatter?{WINDOW}&machine_id=molding-machine-2",
+        "/api/v1/analytics/cycle-time-scatter?sampling=random",
+    ])
+    def test_cycle_time_scatter_matches_sql(self, client: TestClient, hot_db, monkeypatch, url):
+        # Under the point limit every product is drawn, so the samples agree too
+        sql, hot = self.sql_then_hot(client, url, monkeypatch)
+
+        assert hot == sql
+
+    # The trend's SQL uses date_trunc, which SQLite lacks
+    @pytest.mark.parametrize("url", [
+        "/api/v1/analytics/machine-defect-heatmap",
+        "/api/v1/analytics/top-defects",
+        "/api/v1/analytics/machine-comparison",
+        "/api/v1/analytics/defect-distribution",
+        "/api/v1/analytics/cycle-time-scatter",
+    ])
+    def test_empty_database_matches_sql(self, client: TestClient, db_session, monkeypatch, url):
+        monkeypatch.setattr(analytics.hot_store, "refresh_in_background", lambda: None)
+        analytics.hot_store.refresh(db_session)
+
+        sql, hot = self.sql_then_hot(client, url, monkeypatch)
+
+        assert len(analytics.hot_store.snapshot) == 0
+        assert hot == sql
+
+    def test_machine_comparison_matches_sql(self, client: TestClient, hot_db, monkeypatch):
+        sql, hot = self.sql_then_hot(client, "/api/v1/analytics/machine-comparison", monkeypatch)
+
+        by_machine = lambda machine: machine["machine_id"]
+        assert sorted(hot["machines"], key=by_machine) == sorted(sql["machines"], key=by_machine)
+
+    def test_heatmap_matches_sql(self, client: TestClient, hot_db, monkeypatch):
+        sql, hot = self.sql_then_hot(client, f"/api/v1/analytics/machine-defect-heatmap?{self.WINDOW}", monkeypatch)
+
+        assert sorted(map(tuple, hot.pop("cells"))) == sorted(map(tuple, sql.pop("cells")))
+        assert hot == sql
+
+    def test_trend_needs_no_sql(self, client: TestClient, hot_db, sql_statements):
+        expected_total = hot_db.query(Product).filter(
+            Product.timestamp >= datetime(2024, 3, 1, 6), Product.timestamp <= datetime(2024, 3, 2, 7, 30)
+        ).count()
+
+        sql_statements.clear()
+        response = client.get(f"/api/v1/analytics/defect-rate-trend?{self.WINDOW}&interval=hour")
+
+        data = response.json()
+        assert response.status_code == 200
+        assert data["summary"]["total_products"] == expected_total
+        assert data["data_points"][0]["timestamp"] == "2024-03-01T06:00:00"
+        # Only the dataset version lookup touches the database
+        assert not any("products" in statement for statement in sql_statements)
+
+    def test_stale_snapshot_falls_back_to_sql(self, client: TestClient, hot_db, monkeypatch):
+        calls = []
+        monkeypatch.setattr(analytics.hot_store.snapshot, "defect_distribution", lambda *args: calls.append(args))
+        hot_db.add(DatasetIngestion(dataset_hash="newer", status="completed", mode="append"))
+        hot_db.commit()
+
+        response = client.get("/api/v1/analytics/defect-distribution")
+
+        assert response.json()["summary"]["total_products"] == 120
+        assert calls == []
+
+
+@pytest.fixture
+def file_db_client(client, tmp_path):
+    """
+    Client whose dashboard sessions come from a file-backed SQLite engine, so
+    each concurrent chart query gets a connection of its own.
+    """
+    engine = create_engine(f"sqlite:///{tmp_path / 'dashboard.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    db = factory()
+    BulkLoader(db).load(make_ingested_records())
+    db.close()
+
+    def override_get_db():
+        db = factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    from app.main import app
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_session_factory] = lambda: factory
+    yield client
+    engine.dispose()
+
+
+@pytest.mark.api
+class TestDashboardEndpoint:
+    FILTERS = "start_date=2024-03-01T00:00:00&end_date=2024-03-02T23:59:59&machine_id=molding-machine-2"
+
+    @pytest.mark.parametrize("section,url", [
+        ("machine_defect_heatmap", "/api/v1/analytics/machine-defect-heatmap?start_date=2024-03-01T00:00:00&end_date=2024-03-02T23:59:59"),
+        ("top_defects", f"/api/v1/analytics/top-defects?{FILTERS}"),
+        ("machine_comparison", "/api/v1/analytics/machine-comparison"),
+        ("defect_distribution", f"/api/v1/analytics/defect-distribution?{FILTERS}"),
+        ("cycle_time_scatter", f"/api/v1/analytics/cycle-time-scatter?{FILTERS}"),
+    ])
+    def test_sections_match_individual_endpoints(self, file_db_client, section, url):
+        dashboard = file_db_client.get(f"/api/v1/analytics/dashboard?{self.FILTERS}").json()
+        analytics.response_cache.clear()
+
+        assert dashboard[section] == file_db_client.get(url).json()
+
+    def test_queries_run_on_worker_threads_with_own_sessions(self, file_db_client, monkeypatch):
+        calls = []
+        for name in ("get_defect_rate_trend", "get_machine_defect_heatmap", "get_top_defects",
+                     "get_machine_comparison", "get_defect_distribution", "get_cycle_time_scatter"):
+            def recording(**kwargs):
+                calls.append((threading.current_thread().name, kwargs["db"]))
+                return {}
+            monkeypatch.setattr(analytics, name, recording)
+
+        response = file_db_client.get("/api/v1/analytics/dashboard")
+
+        assert response.status_code == 200
+        assert len(calls) == 6
+        assert all(thread.startswith("dashboard") for thread, _ in calls)
+        assert len({id(db) for _, db in calls}) == 6
+
+    def test_failed_section_is_reported_without_failing_the_rest(self, file_db_client, monkeypatch):
+        def failing(**kwargs):
+            raise RuntimeError("boom")
+
+        monkeypatch.setattr(analytics, "get_defect_distribution", failing)
+        data = file_db_client.get("/api/v1/analytics/dashboard").json()
+
+        assert data["defect_distribution"] is None
+        assert "defect_distribution" in data["errors"]
+        assert data["machine_comparison"]["machines"]
+
+
+@pytest.mark.api
+class TestProductExportEndpoint:
+    URL = "/api/v1/analytics/products/export"
+
+    def test_streams_ndjson(self, file_db_client):
+        response = file_db_client.get(f"{self.URL}?machine_id=molding-machine-1")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        records = [json.loads(line) for line in response.text.splitlines()]
+        assert len(records) == 40
+        assert all(record["molding_machine_id"] == "molding-machine-1" for record in records)
+
+    def test_resume_with_cursor(self, file_db_client):
+        first = file_db_client.get(f"{self.URL}?limit=30").text.splitlines()
+        last = json.loads(first[-1])
+
+        rest = file_db_client.get(
+            self.URL, params={"after_timestamp": last["timestamp"], "after_id": last["id"]}
+        ).text.splitlines()
+
+        everything = file_db_client.get(self.URL).text.splitlines()
+        assert first + rest == everything
+        assert len(everything) == 120
+
+    def test_streams_csv_defects(self, file_db_client):
+        response = file_db_client.get(f"{self.URL}?format=csv&table=defects")
+
+        assert response.headers["content-type"].startswith("text/csv")
+        assert 'filename="defects.csv"' in response.headers["content-disposition"]
+        header = response.text.splitlines()[0].split(",")
+        assert "defect_type" in header and "timestamp" in header
+
+    def test_cursor_needs_both_parts(self, file_db_client):
+        response = file_db_client.get(f"{self.URL}?after_id=5")
+
+        assert response.status_code == 400
+
+    def test_arrow_without_pyarrow_is_rejected_up_front(self, file_db_client, monkeypatch):
+        monkeypatch.setitem(sys.modules, "pyarrow", None)
+
+        response = file_db_client.get(f"{self.URL}?format=arrow")
+
+        assert response.status_code == 400
+        assert "pyarrow" in response.json()["detail"]
@@ -0,0 +1,136 @@
+import pytest
+from datetime import datetime
+from unittest.mock import Mock
+
+from fastapi.testclient import TestClient
+
+from app.api.endpoints.analytics import response_cache
+from app.core import cache
+from app.core.cache import MemoryBackend, ResponseCache, cache_key
+from app.models import DatasetIngestion
+
+
+@pytest.mark.unit
+class TestMemoryBackend:
+    def test_evicts_least_recently_used(self):
+        backend = MemoryBackend(max_entries=2)
+        backend.set("a", 1)
+        backend.set("b", 2)
+        backend.get("a")
+        backend.set("c", 3)
+
+        assert backend.get("a") == 1
+        assert backend.get("b") is cache._MISSING
+        assert backend.get("c") == 3
+
+    def test_entries_expire(self, monkeypatch):
+        now = [1000.0]
+        monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+        backend = MemoryBackend(ttl=60)
+        backend.set("a", 1)
+
+        now[0] += 59
+        assert backend.get("a") == 1
+        now[0] += 2
+        assert backend.get("a") is cache._MISSING
+        assert backend.size() == 0
+
+
+@pytest.mark.unit
+class TestRedisBackend:
+    @pytest.fixture
+    def backend(self):
+        redis = pytest.importorskip("redis")
+        backend = cache.RedisBackend("redis://localhost:6379/0", ttl=0.5)
+        backend.client = Mock()
+        return backend, redis
+
+    def test_errors_are_treated_as_misses(self, backend):
+        backend, redis = backend
+        backend.client.get.side_effect = redis.ConnectionError("down")
+        backend.client.psetex.side_effect = redis.ConnectionError("down")
+
+        assert backend.get("key") is cache._MISSING
+        backend.set("key", {"a": 1})
+
+    def test_sub_second_ttl_is_kept(self, backend):
+        backend, _ = backend
+
+        backend.set("key", {"a": 1})
+
+        assert backend.client.psetex.call_args.args[1] == 500
+
+
+@pytest.mark.unit
+class TestResponseCache:
+    def test_cache_key_is_order_independent_and_drops_unset_params(self):
+        first = cache_key("top-defects", {"limit": 10, "machine_id": None, "start_date": datetime(2024, 3, 1)})
+        second = cache_key("top-defects", {"start_date": datetime(2024, 3, 1), "limit": 10})
+
+        assert first == second == "top-defects?limit=10&start_date=2024-03-01T00%3A00%3A00"
+
+    def test_version_change_invalidates_entries(self):
+        version = [1]
+        response_cache = ResponseCache(MemoryBackend(), version_loader=lambda db: version[0], version_ttl=0)
+        endpoint = Mock(return_value={"value": 1})
+        cached = response_cache.cached("endpoint")(lambda db, limit: endpoint(limit))
+
+        cached(db=None, limit=5)
+        cached(db=None, limit=5)
+        version[0] = 2
+        cached(db=None, limit=5)
+
+        assert endpoint.call_count == 2
+        assert (response_cache.hits, response_cache.misses) == (1, 2)
+
+    def test_version_is_polled_at_most_once_per_ttl(self, monkeypatch):
+        now = [1000.0]
+        monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+        loader = Mock(return_value=1)
+        response_cache = ResponseCache(MemoryBackend(), version_loader=loader, version_ttl=5)
+
+        response_cache.version(None)
+        response_cache.version(None)
+        now[0] += 5
+        response_cache.version(None)
+
+        assert loader.call_count == 2
+
+    def test_disabled_cache_always_calls_endpoint(self):
+        response_cache = ResponseCache(MemoryBackend(), version_loader=lambda db: 0, enabled=False)
+        endpoint = Mock(return_value={"value": 1})
+        cached = response_cache.cached("endpoint")(lambda db: endpoint())
+
+        cached(db=None)
+        cached(db=None)
+
+        assert endpoint.call_count == 2
+
+
+@pytest.mark.api
+class TestCachedEndpoints:
+    def test_repeated_request_is_served_from_cache(self, client: TestClient, ingested_db):
+        first = client.get("/api/v1/analytics/top-defects?limit=5").json()
+        second = client.get("/api/v1/analytics/top-defects?limit=5").json()
+
+        assert first == second
+        stats = client.get("/api/v1/analytics/cache/stats").json()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["entries"] == 1
+
+    def test_finished_load_invalidates_cached_responses(self, client: TestClient, ingested_db):
+        before = client.get("/api/v1/analytics/machines").json()
+
+        ingested_db.add(DatasetIngestion(dataset_hash="next", status="completed"))
+        ingested_db.commit()
+        after = client.get("/api/v1/analytics/machines").json()
+
+        assert after == before
+        assert response_cache.stats()["misses"] == 2
+
+    def test_distinct_params_are_cached_separately(self, client: TestClient, ingested_db):
+        client.get("/api/v1/analytics/top-defects?limit=5")
+        client.get("/api/v1/analytics/top-defects?limit=3")
+
+        assert response_cache.stats()["misses"] == 2
@@ -0,0 +1,45 @@
+import pytest
+
+from app.models import MachineState
+from app.services.column_mapper import ColumnMapper, machine_state_mapper, source_key
+
+
+@pytest.mark.unit
+class TestColumnMapper:
+    def test_source_key_is_pascal_case(self):
+        assert source_key("cycle_time") == "CycleTime"
+        assert source_key("fill_segment_xfer_1_to_2_sp") == "FillSegmentXfer1To2Sp"
+        assert source_key("barrel_n1") == "BarrelN1"
+
+    def test_maps_every_machine_state_column(self):
+        expected = {column.name for column in MachineState.__table__.columns} - {"id", "product_id", "product_timestamp"}
+
+        assert set(machine_state_mapper.column_names) == expected
+
+    def test_columns_converts_batch_column_wise(self):
+        sources = [
+            {"CycleTime": 25.5, "ShotCount": 10.0, "BuzzerAlarm": 0},
+            {"CycleTime": 26.0, "ClampForceSp": "1200"},
+        ]
+
+        columns = machine_state_mapper.columns(sources)
+
+        assert columns["cycle_time"] == [25.5, 26.0]
+        assert columns["shot_count"] == [10, None]
+        assert columns["clamp_force_sp"] == [None, 1200]
+        assert columns["buzzer_alarm"] == [False, None]
+
+    def test_rows_transposes_columns(self):
+        rows = machine_state_mapper.rows([{"CycleTime": 25.5}, {"Barrel3": 210.0}])
+
+        assert rows[0]["cycle_time"] == 25.5
+        assert rows[0]["barrel_3"] is None
+        assert rows[1]["barrel_3"] == 210.0
+        assert list(rows[0]) == machine_state_mapper.column_names
+
+    def test_fingerprint_rounds_to_column_scale(self):
+        mapper = ColumnMapper(MachineState.__table__)
+        incoming = mapper.rows([{"Barrel1": 230.504, "CycleTime": 25.5004}])[0]
+        stored = mapper.rows([{"Barrel1": 230.50, "CycleTime": 25.500}])[0]
+
+        assert mapper.fingerprint(incoming) == mapper.fingerprint(stored)
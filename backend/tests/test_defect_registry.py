@@ -0,0 +1,63 @@
+import pytest
+import numpy as np
+from sqlalchemy import func, select
+
+from app.models import Defect, Product
+from app.services import defect_registry
+from app.services.bulk_loader import BulkLoader
+from tests.conftest import make_ingested_records
+
+
+@pytest.mark.unit
+class TestDefectRegistry:
+    def test_bits_fit_the_mask_column(self):
+        assert len(defect_registry.DEFECT_TYPES) <= defect_registry.MAX_DEFECT_TYPES
+        assert len(set(defect_registry.DEFECT_BITS.values())) == len(defect_registry.DEFECT_TYPES)
+
+    def test_mask_round_trip(self):
+        mask = defect_registry.mask_for(["void_defect", "flash_defect"])
+
+        assert mask == (1 << 2) | (1 << 11)
+        assert defect_registry.types_in(mask) == ["flash_defect", "void_defect"]
+
+    def test_unknown_type_is_rejected(self):
+        with pytest.raises(KeyError):
+            defect_registry.mask_for(["unregistered_defect"])
+
+    def test_numpy_counts(self):
+        masks = np.array([
+            defect_registry.mask_for(["flash_defect"]),
+            defect_registry.mask_for(["flash_defect", "short_defect"]),
+            0,
+        ], dtype=np.uint32)
+        flash = defect_registry.DEFECT_TYPES.index("flash_defect")
+        short = defect_registry.DEFECT_TYPES.index("short_defect")
+
+        counts = defect_registry.type_counts(masks)
+        grouped = defect_registry.grouped_type_counts(masks, np.array([0, 1, 1]), groups=2)
+
+        assert counts[flash] == 2 and counts[short] == 1 and counts.sum() == 3
+        assert grouped[:, flash].tolist() == [1, 1]
+        assert grouped[:, short].tolist() == [0, 1]
+
+
+@pytest.mark.database
+class TestDefectMaskColumn:
+    def test_sql_counts_match_defect_rows(self, db_session):
+        BulkLoader(db_session).load(make_ingested_records())
+
+        row = db_session.execute(select(*defect_registry.sql_type_counts(Product.defect_mask))).one()
+        expected = dict(
+            db_session.query(Defect.defect_type, func.count()).group_by(Defect.defect_type).all()
+        )
+
+        assert {t: row._mapping[t] for t in defect_registry.DEFECT_TYPES if row._mapping[t]} == expected
+
+    def test_loader_sets_mask_from_defects(self, db_session):
+        BulkLoader(db_session).load(make_ingested_records())
+
+        for product in db_session.query(Product):
+            assert defect_registry.types_in(product.defect_mask) == sorted(
+                (d.defect_type for d in product.defects),
+                key=defect_registry.DEFECT_TYPES.index,
+            )
@@ -0,0 +1,232 @@
+import pytest
+import numpy as np
+from datetime import datetime, timedelta
+
+from app.core.database import CONNECT_OPTIONS
+from app.models import DatasetIngestion, Defect, MachineState, Product
+from app.services import defect_registry, hot_store as hot_store_module, ingestion_ledger
+from app.services.bulk_loader import BulkLoader
+from app.services.hot_store import HotStore, load_snapshot, to_micros
+from tests.conftest import make_ingested_records
+
+
+@pytest.mark.database
+class TestLoadSnapshot:
+    def test_window_covering_everything(self, ingested_db):
+        snapshot = load_snapshot(ingested_db, days=7)
+
+        assert len(snapshot) == 120
+        assert snapshot.covers_all
+        assert snapshot.covers(None)
+        assert snapshot.version == 1
+        assert snapshot.machines == ["molding-machine-1", "molding-machine-2", "molding-machine-3"]
+        assert int(snapshot.reject.sum()) == ingested_db.query(Product).filter(Product.overall_reject == True).count()
+
+    def test_partial_window(self, ingested_db):
+        last = ingested_db.query(Product.timestamp).order_by(Product.timestamp.desc()).first()[0]
+
+        snapshot = load_snapshot(ingested_db, days=0.5)
+
+        assert not snapshot.covers_all
+        assert not snapshot.covers(None)
+        assert not snapshot.covers(last - timedelta(hours=13))
+        assert snapshot.covers(last - timedelta(hours=11))
+        assert len(snapshot) == ingested_db.query(Product).filter(Product.timestamp >= last - timedelta(hours=12)).count()
+
+    def test_defect_mask_matches_defect_rows(self, ingested_db):
+        snapshot = load_snapshot(ingested_db, days=7)
+
+        bits_set = sum(bin(int(mask)).count("1") for mask in snapshot.defect_mask)
+        assert bits_set == ingested_db.query(Defect).count()
+        assert sorted({t for mask in snapshot.defect_mask for t in defect_registry.types_in(int(mask))}) == sorted(
+            row[0] for row in ingested_db.query(Defect.defect_type).distinct()
+        )
+
+    def test_cycle_times_come_from_machine_states(self, ingested_db):
+        snapshot = load_snapshot(ingested_db, days=7)
+
+        assert snapshot.cycle_time.dtype == np.float32
+        expected = dict(ingested_db.query(MachineState.product_id, MachineState.cycle_time))
+        assert {
+            int(product_id): float(cycle_time)
+            for product_id, cycle_time in zip(snapshot.product_ids, snapshot.cycle_time)
+        } == {product_id: float(cycle_time) for product_id, cycle_time in expected.items()}
+
+    def test_empty_database(self, db_session):
+        db_session.add(DatasetIngestion(dataset_hash="empty", status="completed", mode="replace"))
+        db_session.commit()
+
+        snapshot = load_snapshot(db_session, days=7)
+
+        assert len(snapshot) == 0
+        assert snapshot.covers(None)
+        assert snapshot.version == 1
+        assert snapshot.defect_distribution() == [] and snapshot.machine_comparison() == []
+
+    def test_to_micros_treats_naive_as_utc(self):
+        assert to_micros(datetime(1970, 1, 1, 0, 0, 1)) == 10**6
+
+    def test_database_sessions_run_in_utc(self):
+        # SQL date_trunc must bucket in the same zone the arrays use
+        assert "-c timezone=UTC" in CONNECT_OPTIONS
+
+
+def load_as(db, mode, records):
+    """Load records the way a one-shard ingestion in ``mode`` would, checkpoint included."""
+    entry = ingestion_ledger.start_load(db, {"hash": mode, "mode": mode})
+    loader = BulkLoader(db)
+    stats = loader.upsert(records) if mode == "append" else loader.load(records)
+    ingestion_ledger.save_checkpoint(db, entry.id, 0, 0, stats, loader.time_range)
+    ingestion_ledger.complete_load(db, entry, stats)
+
+
+def by_product(snapshot):
+    order = np.argsort(snapshot.product_ids)
+    columns = ("product_ids", "timestamps", "reject", "defect_count", "defect_mask", "cycle_time")
+    machines = [snapshot.machines[code] for code in snapshot.machine_codes[order]]
+    return machines, {name: getattr(snapshot, name)[order].tolist() for name in columns}
+
+
+@pytest.mark.database
+class TestIncrementalRefresh:
+    def test_append_matches_a_full_read(self, ingested_db):
+        previous = load_snapshot(ingested_db, days=7)
+        records = make_ingested_records(130)
+        records[119]["molding-machine-state"]["CycleTime"] = 99.0
+
+        load_as(ingested_db, "append", records[119:])
+        refreshed = load_snapshot(ingested_db, days=7, previous=previous)
+
+        assert len(refreshed) == 130
+        assert 99.0 in refreshed.cycle_time
+        assert by_product(refreshed) == by_product(load_snapshot(ingested_db, days=7))
+
+    def test_append_does_not_reread_older_rows(self, ingested_db):
+        previous = load_snapshot(ingested_db, days=7)
+        # Only rows carried over from the previous snapshot keep this
+        previous.defect_count[:] = 99
+
+        records = make_ingested_records(130)
+        load_as(ingested_db, "append", records[119:])
+        refreshed = load_snapshot(ingested_db, days=7, previous=previous)
+
+        # Record 119 is unchanged, so the append wrote from record 120 on
+        appended_from = to_micros(datetime.fromtimestamp(records[120]["timestamp"]))
+        assert (refreshed.defect_count[refreshed.timestamps < appended_from - 10**6] == 99).all()
+        assert 99 not in refreshed.defect_count[refreshed.timestamps >= appended_from]
+
+    def test_replace_reads_the_whole_window(self, ingested_db):
+        previous = load_snapshot(ingested_db, days=7)
+        previous.defect_count[:] = 99
+
+        load_as(ingested_db, "replace", [])
+
+        refreshed = load_snapshot(ingested_db, days=7, previous=previous)
+        assert 99 not in refreshed.defect_count
+        assert by_product(refreshed) == by_product(load_snapshot(ingested_db, days=7))
+
+    def test_new_machines_keep_codes_sorted(self, ingested_db):
+        previous = load_snapshot(ingested_db, days=7)
+        record = make_ingested_records(121)[120]
+        load_as(ingested_db, "append", [{**record, "molding_machine_id": "molding-machine-0"}])
+
+        refreshed = load_snapshot(ingested_db, days=7, previous=previous)
+
+        assert refreshed.machines == ["molding-machine-0", *previous.machines]
+        assert by_product(refreshed) == by_product(load_snapshot(ingested_db, days=7))
+
+
+@pytest.mark.database
+class TestSnapshotQueries:
+    def test_trend_buckets(self, ingested_db):
+        snapshot = load_snapshot(ingested_db, days=7)
+        products = ingested_db.query(Product).filter(Product.molding_machine_id == "molding-machine-2").all()
+
+        rows = snapshot.defect_rate_trend("day", machine_id="molding-machine-2")
+
+        expected = {}
+        for product in products:
+            day = product.timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+            total, rejected = expected.get(day, (0, 0))
+            expected[day] = (total + 1, rejected + product.overall_reject)
+        assert {row.time_bucket: (row.total, row.rejected) for row in rows} == expected
+
+    def test_week_buckets_start_on_monday(self, ingested_db):
+        snapshot = load_snapshot(ingested_db, days=7)
+
+        rows = snapshot.defect_rate_trend("week")
+
+        assert [row.time_bucket for row in rows] == [datetime(2024, 2, 26)]
+        assert rows[0].total == 120
+
+    def test_cycle_time_sample_fills_each_stratum_quota(self, ingested_db):
+        snapshot = load_snapshot(ingested_db, days=7)
+        strata = snapshot.cycle_time_strata()
+        quotas = {(row.molding_machine_id, row.overall_reject): 3 for row in strata}
+
+        points = snapshot.cycle_time_sample(quotas, stratified=True)
+
+        products = {p.id: p for p in ingested_db.query(Product)}
+        drawn = {}
+        for point in points:
+            product = products[point.id]
+            key = (product.molding_machine_id, product.overall_reject)
+            drawn[key] = drawn.get(key, 0) + 1
+        assert drawn == quotas
+        assert len({point.id for point in points}) == len(points)
+        assert sum(row.n for row in strata) == 120
+
+    def test_unknown_machine_selects_nothing(self, ingested_db):
+        snapshot = load_snapshot(ingested_db, days=7)
+
+        assert snapshot.defect_distribution(machine_id="missing") == []
+        assert snapshot.top_defects(10, machine_id="missing") == []
+
+
+@pytest.mark.database
+class TestHotStore:
+    def make_store(self, db_session):
+        return HotStore(lambda: db_session, version_loader=hot_store_module.ingestion_ledger.dataset_version, days=7)
+
+    def test_serves_only_the_current_version(self, ingested_db, monkeypatch):
+        store = self.make_store(ingested_db)
+        refreshes = []
+        monkeypatch.setattr(store, "refresh_in_background", lambda: refreshes.append(True))
+
+        assert store.covering(ingested_db, None) is None
+        assert refreshes == [True]
+
+        store.refresh(ingested_db)
+        assert store.covering(ingested_db, None) is store.snapshot
+
+        ingested_db.add(DatasetIngestion(dataset_hash="next", status="completed", mode="append"))
+        ingested_db.commit()
+        assert store.covering(ingested_db, None) is None
+        assert len(refreshes) == 2
+
+    def test_empty_database_is_refreshed_once_per_version(self, db_session, monkeypatch):
+        store = self.make_store(db_session)
+        refreshes = []
+        monkeypatch.setattr(store, "refresh_in_background", lambda: refreshes.append(True))
+
+        assert store.covering(db_session, None) is None
+        store.refresh(db_session)
+
+        assert store.covering(db_session, None) is store.snapshot
+        assert store.covering(db_session, None) is store.snapshot
+        assert refreshes == [True]
+
+    def test_disabled_store_is_never_used(self, ingested_db):
+        store = self.make_store(ingested_db)
+        store.refresh(ingested_db)
+        store.enabled = False
+
+        assert store.covering(ingested_db, None) is None
+
+    def test_background_refresh_uses_own_session(self, ingested_db):
+        store = self.make_store(ingested_db)
+
+        store._refresh_with_own_session()
+
+        assert len(store.snapshot) == 120
+        assert store.stats()["products"] == 120
@@ -0,0 +1,49 @@
+import pytest
+
+from app.models import DatasetIngestion
+from app.services import ingestion_ledger, materialized_views, table_swap
+
+
+@pytest.mark.unit
+class TestMaterializedViewDDL:
+    def test_every_view_gets_a_unique_index(self):
+        statements = materialized_views.create_ddl()
+
+        assert len(statements) == 2 * len(materialized_views.VIEWS)
+        assert (
+            "CREATE UNIQUE INDEX IF NOT EXISTS uq_mv_machine_defect_heatmap "
+            "ON mv_machine_defect_heatmap (molding_machine_id, defect_type)"
+        ) in statements
+        assert all(s.endswith("WITH DATA") for s in statements if "MATERIALIZED VIEW" in s)
+
+    def test_view_columns_match_queries(self):
+        for view in materialized_views.VIEWS:
+            query = materialized_views.VIEW_QUERIES[view.name]
+            for column in view.columns:
+                assert column.name in query
+
+    def test_swap_recreates_views_empty(self):
+        statements = table_swap.swap_ddl()
+        last_drop = max(i for i, s in enumerate(statements) if s.startswith("DROP TABLE"))
+        created = [
+            i for i, s in enumerate(statements) if s.startswith("CREATE MATERIALIZED VIEW")
+        ]
+
+        assert len(created) == len(materialized_views.VIEWS)
+        assert min(created) > last_drop
+        assert all(statements[i].endswith("WITH NO DATA") for i in created)
+
+
+@pytest.mark.database
+class TestMaterializedViewAvailability:
+    def test_refresh_is_noop_off_postgresql(self, db_session):
+        materialized_views.refresh(db_session)
+
+    def test_unavailable_off_postgresql(self, db_session):
+        entry = DatasetIngestion(dataset_hash="abc", status="completed")
+        db_session.add(entry)
+        db_session.commit()
+        ingestion_ledger.mark_views_refreshed(db_session, entry)
+
+        assert entry.views_refreshed_at is not None
+        assert materialized_views.available(db_session) is False
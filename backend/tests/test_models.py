@@ -57,6 +57,7 @@ class TestProductModel:
         machine_state = MachineState(
             id=get_next_machine_state_id(),
             product_id=sample_product.id,
+            product_timestamp=sample_product.timestamp,
             cycle_time=25.5,
             shot_count=1000,
         )
@@ -72,6 +73,8 @@ class TestProductModel:
             Defect(
                 id=get_next_defect_id(),
                 product_id=sample_product.id,
+                product_timestamp=sample_product.timestamp,
+                molding_machine_id=sample_product.molding_machine_id,
                 defect_type="flash_defect",
                 pixel_severity_value=0.5,
                 pixel_severity_reject=False,
@@ -80,6 +83,8 @@ class TestProductModel:
             Defect(
                 id=get_next_defect_id(),
                 product_id=sample_product.id,
+                product_timestamp=sample_product.timestamp,
+                molding_machine_id=sample_product.molding_machine_id,
                 defect_type="short_defect",
                 pixel_severity_value=0.8,
                 pixel_severity_reject=True,
@@ -97,12 +102,15 @@ class TestProductModel:
         machine_state = MachineState(
             id=get_next_machine_state_id(),
             product_id=sample_product.id,
+            product_timestamp=sample_product.timestamp,
             cycle_time=25.5,
             shot_count=1000,
         )
         defect = Defect(
             id=get_next_defect_id(),
             product_id=sample_product.id,
+            product_timestamp=sample_product.timestamp,
+            molding_machine_id=sample_product.molding_machine_id,
             defect_type="flash_defect",
             pixel_severity_value=0.5,
             pixel_severity_reject=False,
@@ -127,6 +135,7 @@ class TestMachineStateModel:
         machine_state = MachineState(
             id=get_next_machine_state_id(),
             product_id=sample_product.id,
+            product_timestamp=sample_product.timestamp,
             cycle_time=30.2,
             shot_count=1500,
         )
@@ -141,6 +150,7 @@ class TestMachineStateModel:
         machine_state = MachineState(
             id=get_next_machine_state_id(),
             product_id=99999,
+            product_timestamp=datetime.now(),
             cycle_time=25.5,
             shot_count=1000,
         )
@@ -153,6 +163,7 @@ class TestMachineStateModel:
         machine_state = MachineState(
             id=get_next_machine_state_id(),
             product_id=sample_product.id,
+            product_timestamp=sample_product.timestamp,
         )
         db_session.add(machine_state)
         db_session.commit()
@@ -172,6 +183,8 @@ class TestDefectModel:
         defect = Defect(
             id=get_next_defect_id(),
             product_id=sample_product.id,
+            product_timestamp=sample_product.timestamp,
+            molding_machine_id=sample_product.molding_machine_id,
             defect_type="contamination_defect",
             pixel_severity_value=0.65,
             pixel_severity_reject=True,
@@ -188,6 +201,8 @@ class TestDefectModel:
         defect = Defect(
             id=get_next_defect_id(),
             product_id=99999,
+            product_timestamp=datetime.now(),
+            molding_machine_id="molding-machine-1",
             defect_type="flash_defect",
             pixel_severity_value=0.5,
             pixel_severity_reject=False,
@@ -202,6 +217,8 @@ class TestDefectModel:
         defect = Defect(
             id=get_next_defect_id(),
             product_id=sample_product.id,
+            product_timestamp=sample_product.timestamp,
+            molding_machine_id=sample_product.molding_machine_id,
             defect_type="flash_defect",
         )
         db_session.add(defect)
@@ -220,6 +237,8 @@ class TestDefectModel:
             Defect(
                 id=get_next_defect_id(),
                 product_id=sample_product.id,
+                product_timestamp=sample_product.timestamp,
+                molding_machine_id=sample_product.molding_machine_id,
                 defect_type=f"defect_{i}",
                 pixel_severity_value=float(i) * 0.1,
                 pixel_severity_reject=False,
@@ -0,0 +1,75 @@
+import pytest
+from datetime import date, datetime
+
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateTable
+
+from app.models import Product, Defect
+from app.services import partitions, table_swap
+from app.services.bulk_loader import BulkLoader
+from tests.test_activities import make_record
+
+
+@pytest.mark.unit
+class TestPartitionMonths:
+    def test_months_between_spans_year_end(self):
+        assert partitions.months_between(datetime(2023, 11, 15), datetime(2024, 2, 1)) == [
+            date(2023, 11, 1), date(2023, 12, 1), date(2024, 1, 1), date(2024, 2, 1),
+        ]
+
+    def test_months_between_within_one_month(self):
+        assert partitions.months_between(datetime(2024, 3, 1), datetime(2024, 3, 31, 23)) == [date(2024, 3, 1)]
+
+    def test_partition_ddl(self):
+        assert partitions.create_partition_ddl("defects", date(2024, 12, 1)) == (
+            "CREATE TABLE IF NOT EXISTS defects_2024_12 PARTITION OF defects "
+            "FOR VALUES FROM ('2024-12-01') TO ('2025-01-01')"
+        )
+
+    def test_drop_months_removes_children_before_products(self):
+        assert partitions.drop_months_ddl([date(2024, 1, 1)]) == [
+            "DROP TABLE defects_2024_01",
+            "DROP TABLE machine_states_2024_01",
+            "ALTER TABLE products DETACH PARTITION products_2024_01",
+            "DROP TABLE products_2024_01",
+        ]
+
+
+@pytest.mark.unit
+class TestPartitionedSchema:
+    def test_tables_are_range_partitioned_on_postgresql(self):
+        for table in table_swap.SWAPPED_TABLES.values():
+            ddl = str(CreateTable(table).compile(dialect=postgresql.dialect()))
+            key = partitions.PARTITION_KEYS[table.name]
+            assert ddl.rstrip().endswith(f"PARTITION BY RANGE ({key})")
+
+    def test_primary_keys_include_the_partition_key(self):
+        for table in table_swap.SWAPPED_TABLES.values():
+            assert partitions.PARTITION_KEYS[table.name] in table.primary_key.columns
+
+    def test_swap_renames_shadow_partitions(self):
+        statements = table_swap.swap_ddl([date(2024, 1, 1)])
+
+        for name in table_swap.SWAPPED_TABLES:
+            rename = f"ALTER TABLE {name}_shadow_2024_01 RENAME TO {name}_2024_01"
+            assert statements.index(rename) > statements.index(f"ALTER TABLE {name}_shadow RENAME TO {name}")
+
+
+@pytest.mark.database
+class TestPartitionMaintenance:
+    def test_ensure_partitions_is_a_no_op_off_postgresql(self, db_session):
+        assert partitions.ensure_partitions(db_session, [date(2024, 1, 1)]) == []
+
+    def test_maintenance_requires_postgresql(self, db_session):
+        with pytest.raises(ValueError, match="Partition maintenance requires PostgreSQL"):
+            partitions.drop_partitions_before(db_session, datetime(2024, 1, 1))
+        with pytest.raises(ValueError, match="Partition maintenance requires PostgreSQL"):
+            partitions.detach_month(db_session, date(2024, 1, 1))
+
+    def test_loader_copies_product_timestamp_to_children(self, db_session):
+        BulkLoader(db_session).load([make_record(0, defects=("flash_defect",))])
+
+        product = db_session.query(Product).one()
+        defect = db_session.query(Defect).one()
+        assert defect.product_timestamp == product.timestamp
+        assert product.machine_state.product_timestamp == product.timestamp
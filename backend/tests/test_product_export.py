@@ -0,0 +1,100 @@
+import csv
+import io
+import json
+import pytest
+from datetime import datetime
+
+from app.models import Defect, Product
+from app.services import product_export
+from app.services.bulk_loader import BulkLoader
+from tests.conftest import make_ingested_records
+
+
+@pytest.fixture
+def loaded_db(db_session):
+    BulkLoader(db_session).load(make_ingested_records())
+    db_session.commit()
+    return db_session
+
+
+def rows(pages):
+    return [row for page in pages for row in page]
+
+
+@pytest.mark.database
+class TestIterPages:
+    def test_pages_cover_every_product_in_keyset_order(self, loaded_db):
+        pages = list(product_export.iter_pages(loaded_db, "products", page_size=50))
+
+        assert [len(page) for page in pages] == [50, 50, 20]
+        exported = rows(pages)
+        assert [row["id"] for row in exported] == [
+            product.id for product in loaded_db.query(Product).order_by(Product.timestamp, Product.id)
+        ]
+        assert exported[0]["cycle_time"] is not None
+
+    def test_resumes_after_cursor(self, loaded_db):
+        exported = rows(product_export.iter_pages(loaded_db, "products"))
+        cursor = (exported[69]["timestamp"], exported[69]["id"])
+
+        resumed = rows(product_export.iter_pages(loaded_db, "products", after=cursor, page_size=25))
+
+        assert [row["id"] for row in resumed] == [row["id"] for row in exported[70:]]
+
+    def test_limit_and_filters(self, loaded_db):
+        exported = rows(product_export.iter_pages(
+            loaded_db, "products",
+            start_date=datetime(2024, 3, 1, 12), machine_id="molding-machine-3",
+            limit=7, page_size=3,
+        ))
+
+        assert len(exported) == 7
+        assert all(row["molding_machine_id"] == "molding-machine-3" for row in exported)
+        assert all(row["timestamp"] >= datetime(2024, 3, 1, 12) for row in exported)
+
+    def test_defects_carry_product_timestamp(self, loaded_db):
+        exported = rows(product_export.iter_pages(loaded_db, "defects", page_size=40))
+
+        assert len(exported) == loaded_db.query(Defect).count()
+        keys = [(row["timestamp"], row["id"]) for row in exported]
+        assert keys == sorted(keys)
+        assert {"defect_type", "product_id", "molding_machine_id"} <= set(exported[0])
+
+
+@pytest.mark.database
+class TestWriters:
+    def test_ndjson_one_object_per_line(self, loaded_db):
+        pages = product_export.iter_pages(loaded_db, "products", limit=5)
+
+        lines = b"".join(product_export.ndjson_chunks("products", pages)).decode().splitlines()
+
+        assert len(lines) == 5
+        record = json.loads(lines[0])
+        assert isinstance(record["cycle_time"], float)
+        assert record["timestamp"].startswith("2024-03-01T00:00:00")
+
+    def test_csv_has_header_even_when_empty(self, loaded_db):
+        pages = product_export.iter_pages(loaded_db, "products", machine_id="missing")
+
+        text = b"".join(product_export.csv_chunks("products", pages)).decode()
+
+        header, *body = list(csv.reader(io.StringIO(text)))
+        assert header[:3] == ["id", "version", "timestamp"]
+        assert "cycle_time" in header
+        assert body == []
+
+    def test_unknown_format_and_table(self):
+        with pytest.raises(ValueError):
+            product_export.require_format("parquet")
+        with pytest.raises(ValueError):
+            product_export.export_query("machine_states")
+
+    def test_arrow_stream_round_trips(self, loaded_db):
+        pa = pytest.importorskip("pyarrow")
+        pages = product_export.iter_pages(loaded_db, "products", page_size=50)
+
+        data = b"".join(product_export.arrow_chunks("products", pages))
+
+        table = pa.ipc.open_stream(data).read_all()
+        assert table.num_rows == 120
+        assert table.schema.field("cycle_time").type == pa.float64()
@@ -0,0 +1,152 @@
+import pytest
+import json
+import tracemalloc
+
+from app.services.bulk_loader import chunked
+from app.services.record_reader import RecordReader, plan_shards
+
+
+def write_array(path, records, indent=None):
+    with open(path, 'w') as f:
+        json.dump(records, f, indent=indent)
+
+
+def write_ndjson(path, records):
+    with open(path, 'w') as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+
+
+def make_records(count):
+    return [
+        {
+            "version": "1.0",
+            "timestamp": 1700000000.0 + i,
+            "molding_machine_id": f"molding-machine-{i % 3 + 1}",
+            "object_detection": {"reject": i % 2 == 0, "note": "ünïcødé " * (i % 4)},
+            "molding-machine-state": {"CycleTime": 25.0 + i, "ShotCount": i},
+        }
+        for i in range(count)
+    ]
+
+
+@pytest.mark.unit
+class TestRecordReader:
+    def test_reads_json_array(self, tmp_path):
+        records = make_records(50)
+        path = tmp_path / "data.json"
+        write_array(path, records, indent=2)
+
+        assert list(RecordReader(str(path), chunk_size=64)) == records
+
+    def test_reads_ndjson(self, tmp_path):
+        records = make_records(50)
+        path = tmp_path / "data.ndjson"
+        write_ndjson(path, records)
+
+        assert list(RecordReader(str(path), chunk_size=64)) == records
+
+    def test_empty_array(self, tmp_path):
+        path = tmp_path / "empty.json"
+        path.write_text("[ ]")
+
+        assert list(RecordReader(str(path))) == []
+
+    def test_offset_allows_resume(self, tmp_path):
+        records = make_records(20)
+        path = tmp_path / "data.json"
+        write_array(path, records)
+
+        reader = RecordReader(str(path), chunk_size=100)
+        iterator = iter(reader)
+        head = [next(iterator) for _ in range(7)]
+        resume_at = reader.offset
+
+        tail = list(RecordReader(str(path), chunk_size=100, start_offset=resume_at))
+
+        assert head + tail == records
+
+    def test_end_offset_stops_at_range(self, tmp_path):
+        records = make_records(20)
+        path = tmp_path / "data.json"
+        write_array(path, records)
+
+        reader = RecordReader(str(path))
+        iterator = iter(reader)
+        for _ in range(5):
+            next(iterator)
+
+        head = list(RecordReader(str(path), chunk_size=100, end_offset=reader.offset))
+
+        assert head == records[:5]
+
+    def test_truncated_file_raises(self, tmp_path):
+        path = tmp_path / "broken.json"
+        path.write_text('[{"version": "1.0"}, {"version": ')
+
+        with pytest.raises(json.JSONDecodeError):
+            list(RecordReader(str(path)))
+
+    def test_non_object_record_raises(self, tmp_path):
+        path = tmp_path / "numbers.json"
+        path.write_text("[1, 2, 3]")
+
+        with pytest.raises(ValueError, match="Expected a JSON object"):
+            list(RecordReader(str(path)))
+
+    def test_peak_memory_is_independent_of_file_size(self, tmp_path):
+        path = tmp_path / "large.json"
+        write_array(path, make_records(40000))
+        file_size = path.stat().st_size
+
+        tracemalloc.start()
+        try:
+            total = 0
+            for batch in chunked(RecordReader(str(path), chunk_size=64 * 1024), 500):
+                total += len(batch)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        assert total == 40000
+        assert peak < file_size / 4
+
+
+@pytest.mark.unit
+class TestPlanShards:
+    @pytest.mark.parametrize("writer", [write_array, write_ndjson])
+    def test_shards_cover_every_record_once(self, tmp_path, writer):
+        records = make_records(103)
+        path = tmp_path / "data.json"
+        writer(path, records)
+
+        shards = plan_shards(str(path), 4)
+
+        assert len(shards) == 4
+        assert [shard["index"] for shard in shards] == [0, 1, 2, 3]
+        assert sum(shard["records"] for shard in shards) == 103
+
+        read = []
+        for shard in shards:
+            reader = RecordReader(
+                str(path), chunk_size=256,
+                start_offset=shard["start_offset"], end_offset=shard["end_offset"],
+            )
+            shard_records = list(reader)
+            assert len(shard_records) == shard["records"]
+            read.extend(shard_records)
+        assert read == records
+
+    def test_more_shards_than_records(self, tmp_path):
+        path = tmp_path / "data.json"
+        write_array(path, make_records(2))
+
+        shards = plan_shards(str(path), 8)
+
+        assert [shard["records"] for shard in shards] == [1, 1]
+
+    def test_empty_file_has_no_shards(self, tmp_path):
+        path = tmp_path / "empty.json"
+        path.write_text("[]")
+
+        assert plan_shards(str(path), 4) == []
@@ -0,0 +1,125 @@
+import pytest
+from datetime import datetime
+
+from sqlalchemy import MetaData, Table, func, text
+
+from app.models import Product, Defect, DatasetIngestion, MachineHourlyRollup, MachineDefectHourlyRollup
+from app.services import rollups
+from app.services.bulk_loader import BulkLoader
+from tests.conftest import make_ingested_records
+
+
+def product_totals(db):
+    return dict(
+        db.query(MachineHourlyRollup.molding_machine_id, func.sum(MachineHourlyRollup.total_products))
+        .group_by(MachineHourlyRollup.molding_machine_id)
+        .all()
+    )
+
+
+@pytest.mark.database
+class TestRollupRefresh:
+    def test_refresh_matches_raw_aggregates(self, db_session):
+        BulkLoader(db_session).load(make_ingested_records())
+
+        rollups.refresh(db_session)
+
+        raw = dict(
+            db_session.query(Product.molding_machine_id, func.count(Product.id))
+            .group_by(Product.molding_machine_id)
+            .all()
+        )
+        assert product_totals(db_session) == raw
+
+        rejected = db_session.query(func.sum(MachineHourlyRollup.rejected_products)).scalar()
+        assert rejected == db_session.query(Product).filter(Product.overall_reject == True).count()
+
+        defects = db_session.query(func.sum(MachineDefectHourlyRollup.defect_count)).scalar()
+        assert defects == db_session.query(Defect).count()
+
+    def test_rows_are_bucketed_by_hour(self, db_session):
+        BulkLoader(db_session).load(make_ingested_records(10))
+
+        rollups.refresh(db_session)
+
+        hours = {row.hour for row in db_session.query(MachineHourlyRollup)}
+        assert all((hour.minute, hour.second) == (0, 0) for hour in hours)
+        # 10 records 25 minutes apart span 3h45m from midnight
+        assert len(hours) == 4
+
+    def test_range_refresh_only_touches_those_hours(self, db_session):
+        records = make_ingested_records(48)
+        BulkLoader(db_session).load(records)
+        rollups.refresh(db_session)
+        db_session.query(Product).filter(
+            Product.timestamp >= datetime(2024, 3, 1, 5), Product.molding_machine_id == "molding-machine-1"
+        ).delete()
+        db_session.commit()
+
+        start, end = datetime(2024, 3, 1, 5), datetime(2024, 3, 1, 6)
+        rollups.refresh(db_session, start, end)
+
+        refreshed = db_session.query(MachineHourlyRollup).filter(MachineHourlyRollup.hour == start).all()
+        assert "molding-machine-1" not in {row.molding_machine_id for row in refreshed}
+        untouched = db_session.query(MachineHourlyRollup).filter(
+            MachineHourlyRollup.hour == datetime(2024, 3, 1, 10),
+            MachineHourlyRollup.molding_machine_id == "molding-machine-1",
+        ).count()
+        assert untouched == 1
+
+    def test_refresh_reads_other_tables_without_committing(self, db_session):
+        BulkLoader(db_session).load(make_ingested_records(10))
+        bind = db_session.get_bind()
+        db_session.execute(text("CREATE TABLE products_copy AS SELECT * FROM products ORDER BY id LIMIT 4"))
+        db_session.execute(text("CREATE TABLE defects_copy AS SELECT * FROM defects WHERE 0"))
+        db_session.commit()
+        copies = MetaData()
+        tables = {
+            "products": Table("products_copy", copies, autoload_with=bind),
+            "defects": Table("defects_copy", copies, autoload_with=bind),
+        }
+
+        rollups.refresh(db_session, tables=tables, commit=False)
+        assert sum(product_totals(db_session).values()) == 4
+
+        db_session.rollback()
+        assert db_session.query(MachineHourlyRollup).count() == 0
+
+    def test_clear_empties_rollups(self, ingested_db):
+        rollups.clear(ingested_db)
+
+        assert ingested_db.query(MachineHourlyRollup).count() == 0
+        assert ingested_db.query(MachineDefectHourlyRollup).count() == 0
+
+    def test_available_requires_completed_ingestion(self, db_session):
+        assert rollups.available(db_session) is False
+
+        db_session.add(DatasetIngestion(dataset_hash="running", status="running"))
+        db_session.commit()
+        assert rollups.available(db_session) is False
+
+        db_session.add(DatasetIngestion(dataset_hash="done", status="completed"))
+        db_session.commit()
+        assert rollups.available(db_session) is True
+
+
+@pytest.mark.unit
+class TestRollupHelpers:
+    @pytest.mark.parametrize("start_date,end_date,aligned", [
+        (None, None, True),
+        (datetime(2024, 3, 1), datetime(2024, 3, 2, 23, 59, 59), True),
+        (datetime(2024, 3, 1, 6), None, True),
+        (datetime(2024, 3, 1, 6, 30), None, False),
+        (None, datetime(2024, 3, 2), False),
+        (None, datetime(2024, 3, 2, 12, 59, 58), False),
+        (None, datetime(2024, 3, 2, 12, 59, 59, 999999), True),
+        (None, datetime(2024, 3, 2, 12, 59, 59, 500000), False),
+    ])
+    def test_is_hour_aligned(self, start_date, end_date, aligned):
+        assert rollups.is_hour_aligned(start_date, end_date) is aligned
+
+    def test_hour_range_covers_both_ends(self):
+        first = datetime(2024, 3, 1, 5, 42).timestamp()
+        last = datetime(2024, 3, 1, 7, 3).timestamp()
+
+        assert rollups.hour_range(first, last) == (datetime(2024, 3, 1, 5), datetime(2024, 3, 1, 8))
@@ -1,4 +1,5 @@
 import pytest
+import io
 from unittest.mock import Mock, patch
 from botocore.exceptions import ClientError
 
@@ -55,32 +56,82 @@ class TestS3Service:
         with pytest.raises(ClientError):
             s3_service_instance.upload_file(file_content, object_key)
 
-    def test_download_file_success(self, s3_service_instance, mock_s3_client):
-        object_key = "test/file.json"
-        expected_content = b"downloaded content"
+    def test_upload_fileobj_uses_multipart_config(self, s3_service_instance, mock_s3_client):
+        fileobj = io.BytesIO(b"test content")
+        object_key = "datasets/large.json"
+
+        result = s3_service_instance.upload_fileobj(
+            fileobj, object_key, part_size=8 * 1024 * 1024, max_concurrency=4
+        )
+
+        assert result == f"s3://{s3_service_instance.bucket_name}/{object_key}"
+        args, kwargs = mock_s3_client.upload_fileobj.call_args
+        assert args == (fileobj, s3_service_instance.bucket_name, object_key)
+        assert kwargs["Config"].multipart_chunksize == 8 * 1024 * 1024
+        assert kwargs["Config"].max_concurrency == 4
+        assert kwargs["Config"].use_threads is True
+
+    def test_upload_fileobj_client_error(self, s3_service_instance, mock_s3_client):
+        mock_s3_client.upload_fileobj.side_effect = ClientError(
+            {"Error": {"Code": "NoSuchBucket", "Message": "Bucket not found"}},
+            "upload_fileobj"
+        )
+
+        with pytest.raises(ClientError):
+            s3_service_instance.upload_fileobj(io.BytesIO(b"data"), "test/file.json")
+
+    def test_download_fileobj_streams_to_file(self, s3_service_instance, mock_s3_client):
+        fileobj = io.BytesIO()
+        object_key = "datasets/large.json"
 
+        s3_service_instance.download_fileobj(object_key, fileobj, part_size=8 * 1024 * 1024)
+
+        args, kwargs = mock_s3_client.download_fileobj.call_args
+        assert args == (s3_service_instance.bucket_name, object_key, fileobj)
+        assert kwargs["Config"].multipart_chunksize == 8 * 1024 * 1024
+
+    def test_download_fileobj_not_found(self, s3_service_instance, mock_s3_client):
+        mock_s3_client.download_fileobj.side_effect = ClientError(
+            {"Error": {"Code": "404", "Message": "Not Found"}},
+            "download_fileobj"
+        )
+
+        with pytest.raises(ClientError):
+            s3_service_instance.download_fileobj("nonexistent/file.json", io.BytesIO())
+
+    def test_download_range_requests_inclusive_byte_range(self, s3_service_instance, mock_s3_client):
         mock_response = {"Body": Mock()}
-        mock_response["Body"].read.return_value = expected_content
+        mock_response["Body"].iter_chunks.return_value = iter([b"234", b"56"])
         mock_s3_client.get_object.return_value = mock_response
+        fileobj = io.BytesIO()
 
-        result = s3_service_instance.download_file(object_key)
+        s3_service_instance.download_range("test/file.json", fileobj, 2, 7)
 
-        assert result == expected_content
+        assert fileobj.getvalue() == b"23456"
         mock_s3_client.get_object.assert_called_once_with(
             Bucket=s3_service_instance.bucket_name,
-            Key=object_key
+            Key="test/file.json",
+            Range="bytes=2-6",
         )
 
-    def test_download_file_not_found(self, s3_service_instance, mock_s3_client):
-        object_key = "nonexistent/file.json"
+    def test_download_file_writes_to_disk(self, s3_service_instance, mock_s3_client):
+        object_key = "datasets/large.json"
 
-        mock_s3_client.get_object.side_effect = ClientError(
-            {"Error": {"Code": "NoSuchKey", "Message": "Key not found"}},
-            "get_object"
+        s3_service_instance.download_file(object_key, "/tmp/large.json", part_size=8 * 1024 * 1024)
+
+        args, kwargs = mock_s3_client.download_file.call_args
+        assert args == (s3_service_instance.bucket_name, object_key, "/tmp/large.json")
+        assert kwargs["Config"].multipart_chunksize == 8 * 1024 * 1024
+        mock_s3_client.get_object.assert_not_called()
+
+    def test_download_file_not_found(self, s3_service_instance, mock_s3_client):
+        mock_s3_client.download_file.side_effect = ClientError(
+            {"Error": {"Code": "404", "Message": "Not Found"}},
+            "download_file"
         )
 
         with pytest.raises(ClientError):
-            s3_service_instance.download_file(object_key)
+            s3_service_instance.download_file("nonexistent/file.json", "/tmp/missing.json")
 
     def test_file_exists_true(self, s3_service_instance, mock_s3_client):
         object_key = "test/file.json"
@@ -142,4 +193,53 @@ class TestS3Service:
             service = S3Service()
             _ = service.s3_client
 
-            mock_s3_client.create_bucket.assert_called_once_with(Bucket="new-bucket")
\ No newline at end of file
+            mock_s3_client.create_bucket.assert_called_once_with(Bucket="new-bucket")
+
+
+@pytest.mark.s3
+class TestS3ServiceMultipartRoundTrip:
+    PART_SIZE = 5 * 1024 * 1024  # the smallest part S3 accepts
+
+    @pytest.fixture
+    def s3_service_instance(self, monkeypatch):
+        moto = pytest.importorskip("moto")
+        monkeypatch.setenv("AWS_ACCESS_KEY_ID", "test")
+        monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "test")
+
+        with moto.mock_s3(), patch('app.services.s3_service.settings') as mock_settings:
+            mock_settings.S3_ENDPOINT_URL = None
+            mock_settings.AWS_ACCESS_KEY_ID = "test"
+            mock_settings.AWS_SECRET_ACCESS_KEY = "test"
+            mock_settings.AWS_REGION = "us-east-1"
+            mock_settings.S3_BUCKET_NAME = "test-bucket"
+            mock_settings.S3_MULTIPART_THRESHOLD = self.PART_SIZE
+            mock_settings.S3_MULTIPART_CHUNKSIZE = self.PART_SIZE
+            mock_settings.S3_MAX_CONCURRENCY = 4
+            yield S3Service()
+
+    def test_multipart_parts_round_trip(self, s3_service_instance, tmp_path):
+        # Two full parts and a short last one, each part with distinct bytes.
+        content = b"".join(
+            bytes([i]) * size for i, size in enumerate((self.PART_SIZE, self.PART_SIZE, 1234))
+        )
+        object_key = "datasets/multipart.json"
+
+        s3_service_instance.upload_fileobj(io.BytesIO(content), object_key)
+        etag = s3_service_instance.s3_client.head_object(
+            Bucket=s3_service_instance.bucket_name, Key=object_key
+        )["ETag"]
+        target = tmp_path / "multipart.json"
+        s3_service_instance.download_file(object_key, str(target))
+
+        assert etag.strip('"').endswith("-3")
+        assert target.read_bytes() == content
+
+    def test_range_spanning_parts(self, s3_service_instance):
+        content = bytes(range(256)) * (2 * self.PART_SIZE // 256 + 1)
+        s3_service_instance.upload_fileobj(io.BytesIO(content), "datasets/ranged.json")
+        start, end = self.PART_SIZE - 10, self.PART_SIZE + 10
+        fileobj = io.BytesIO()
+
+        s3_service_instance.download_range("datasets/ranged.json", fileobj, start, end)
+
+        assert fileobj.getvalue() == content[start:end]
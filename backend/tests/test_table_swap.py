@@ -0,0 +1,76 @@
+import pytest
+import re
+from sqlalchemy import text
+
+from app.models import Product
+from app.services import table_swap
+from app.services.bulk_loader import BulkLoader
+from tests.test_activities import make_record
+
+
+@pytest.mark.database
+class TestTableSwap:
+    def test_shadow_tables_are_renamed_copies(self):
+        tables = table_swap.shadow_tables()
+
+        assert {name: table.name for name, table in tables.items()} == {
+            "products": "products_shadow",
+            "machine_states": "machine_states_shadow",
+            "defects": "defects_shadow",
+        }
+        assert set(tables["products"].c.keys()) == set(Product.__table__.c.keys())
+
+    def test_loader_writes_into_shadow_tables(self, db_session):
+        tables = table_swap.shadow_tables()
+        for name, table in tables.items():
+            db_session.execute(text(f"CREATE TABLE {table.name} AS SELECT * FROM {name} WHERE 0"))
+
+        stats = BulkLoader(db_session, tables=tables).load(
+            [make_record(0, defects=("flash_defect",)), make_record(1)]
+        )
+
+        assert stats == {"products": 2, "machine_states": 2, "defects": 1}
+        assert db_session.query(Product).count() == 0
+        assert len(db_session.execute(tables["products"].select()).all()) == 2
+        assert len(db_session.execute(tables["defects"].select()).all()) == 1
+
+    def test_every_built_index_is_renamed_on_swap(self):
+        built = {
+            match.group(1)
+            for statement in table_swap.shadow_index_ddl()
+            for match in [re.match(r"CREATE (?:UNIQUE )?INDEX (\w+)", statement)]
+            if match
+        }
+        renamed = {
+            match.group(1)
+            for statement in table_swap.swap_ddl()
+            for match in [re.match(r"ALTER INDEX (\w+) RENAME", statement)]
+            if match
+        }
+
+        assert built
+        assert built == renamed
+
+    def test_sequences_change_owner_before_old_tables_are_dropped(self):
+        statements = table_swap.swap_ddl()
+
+        assert statements[0].startswith("LOCK TABLE products, machine_states, defects")
+        first_drop = next(i for i, s in enumerate(statements) if s.startswith("DROP TABLE"))
+        for name in table_swap.SWAPPED_TABLES:
+            owner_change = statements.index(
+                f"ALTER SEQUENCE {name}_id_seq OWNED BY {name}_shadow.id"
+            )
+            assert owner_change < first_drop
+
+    def test_swap_requires_postgresql(self, db_session):
+        with pytest.raises(ValueError, match="Swap loading requires PostgreSQL"):
+            table_swap.create_shadow_tables(db_session)
+
+    def test_shadow_indexes_keep_access_method_and_included_columns(self):
+        statements = table_swap.shadow_index_ddl()
+
+        assert "CREATE INDEX brin_products_timestamp_shadow ON products_shadow USING brin (timestamp)" in statements
+        assert (
+            "CREATE INDEX idx_defects_product_covering_shadow ON defects_shadow "
+            "(product_id, product_timestamp) INCLUDE (defect_type)"
+        ) in statements
@@ -1,10 +1,21 @@
 import asyncio
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from temporalio.client import Client
 from temporalio.worker import Worker
 
 from app.workflows.ingestion import DataIngestionWorkflow
-from app.workflows.activities import download_dataset, upload_to_s3, batch_insert_to_db
+from app.workflows.activities import (
+    download_dataset,
+    check_dataset,
+    upload_to_s3,
+    prepare_load,
+    plan_shards,
+    insert_shard,
+    finalize_load,
+    refresh_materialized_views,
+    abandon_load,
+)
 from app.core.config import settings
 
 logging.basicConfig(level=logging.INFO)
@@ -22,7 +33,21 @@ async def main():
         client,
         task_queue="data-ingestion",
         workflows=[DataIngestionWorkflow],
-        activities=[download_dataset, upload_to_s3, batch_insert_to_db],
+        activities=[
+            download_dataset,
+            check_dataset,
+            upload_to_s3,
+            prepare_load,
+            plan_shards,
+            insert_shard,
+            finalize_load,
+            refresh_materialized_views,
+            abandon_load,
+        ],
+        # Shard inserts are blocking database work and run on these threads,
+        # so one worker inserts several shards at once.
+        activity_executor=ThreadPoolExecutor(max_workers=settings.INGESTION_WORKER_THREADS),
+        max_concurrent_activities=settings.INGESTION_WORKER_THREADS,
     )
 
     logger.info("✅ Temporal worker started and ready to process workflows")
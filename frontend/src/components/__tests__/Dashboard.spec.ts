@@ -1,4 +1,4 @@
-import { describe, it, expect, vi } from 'vitest'
+import { describe, it, expect, vi, beforeEach } from 'vitest'
 import { mount } from '@vue/test-utils'
 import Dashboard from '@/views/Dashboard.vue'
 
@@ -16,9 +16,21 @@ vi.mock('@/services/analytics', () => ({
   fetchCycleTimeScatter: vi.fn().mockResolvedValue({ points: [], stats: {} }),
   fetchMachines: vi.fn().mockResolvedValue({ machines: [], count: 0 }),
   fetchDefectDistribution: vi.fn().mockResolvedValue({ distribution: [] }),
-  fetchMachineDefectHeatmap: vi.fn().mockResolvedValue({ heatmap: [] })
+  fetchMachineDefectHeatmap: vi.fn().mockResolvedValue({ heatmap: [] }),
+  fetchDashboard: vi.fn().mockResolvedValue({
+    defect_rate_trend: { data_points: [], summary: {} },
+    machine_defect_heatmap: { cells: [] },
+    top_defects: { defects: [], summary: {} },
+    machine_comparison: { machines: [] },
+    defect_distribution: { distribution: [] },
+    cycle_time_scatter: { points: [], stats: {} },
+    errors: {},
+    filters: {}
+  })
 }))
 
+import { fetchDashboard } from '@/services/analytics'
+
 
 vi.mock('echarts/core', () => ({
   use: vi.fn(),
@@ -33,6 +45,10 @@ vi.mock('echarts/core', () => ({
 }))
 
 describe('Dashboard', () => {
+  beforeEach(() => {
+    vi.clearAllMocks()
+  })
+
   it('renders dashboard layout', () => {
     const wrapper = mount(Dashboard, {
       global: {
@@ -164,4 +180,42 @@ describe('Dashboard', () => {
     expect(vm.startDate).toBe('2025-01-01')
     expect(vm.endDate).toBe('2025-01-31')
   })
-})
\ No newline at end of file
+
+
+  it('loads every chart with one dashboard request per filter change', async () => {
+    const wrapper = mount(Dashboard, {
+      global: {
+        stubs: {
+          FiltersSidebar: true,
+          ChartCard: true,
+          DefectRateTrend: true,
+          TopDefects: true,
+          MachineComparison: true,
+          DefectDistribution: true,
+          CycleTimeScatter: true,
+          MachineDefectHeatmap: true
+        }
+      }
+    })
+    const vm = wrapper.vm as any
+
+    await vi.waitFor(() => {
+      expect(fetchDashboard).toHaveBeenCalledTimes(1)
+    })
+
+    vm.filters = {
+      machine: 'molding-machine-1',
+      startDate: '2025-01-01',
+      endDate: '2025-01-31'
+    }
+
+    await vi.waitFor(() => {
+      expect(fetchDashboard).toHaveBeenCalledTimes(2)
+    })
+    expect(fetchDashboard).toHaveBeenLastCalledWith({
+      machine_id: 'molding-machine-1',
+      start_date: '2025-01-01',
+      end_date: '2025-01-31'
+    })
+  })
+})
@@ -1,7 +1,8 @@
 import { describe, it, expect, vi, beforeEach } from 'vitest'
 import { mount } from '@vue/test-utils'
-import { nextTick } from 'vue'
+import { nextTick, ref } from 'vue'
 import MachineComparison from '@/components/MachineComparison.vue'
+import { dashboardKey } from '@/services/dashboard'
 
 
 vi.mock('echarts/core', () => ({
@@ -167,4 +168,44 @@ describe('MachineComparison', () => {
     wrapper.unmount()
     expect(mockInstance.dispose).toHaveBeenCalled()
   })
-})
\ No newline at end of file
+
+
+  it('renders from the dashboard response instead of fetching', async () => {
+    const response = ref<any>(null)
+    const loading = ref(true)
+    const wrapper = mount(MachineComparison, {
+      global: {
+        provide: { [dashboardKey as symbol]: { loading, error: ref(null), response } }
+      }
+    })
+
+    response.value = { machine_comparison: mockData, errors: {} }
+    loading.value = false
+
+    await vi.waitFor(() => {
+      expect(echarts.init).toHaveBeenCalled()
+    })
+    expect(fetchMachineComparison).not.toHaveBeenCalled()
+    expect(wrapper.find('.error-notification').exists()).toBe(false)
+  })
+
+
+  it('shows the dashboard error for a failed chart', async () => {
+    const wrapper = mount(MachineComparison, {
+      global: {
+        provide: {
+          [dashboardKey as symbol]: {
+            loading: ref(false),
+            error: ref(null),
+            response: ref({ machine_comparison: null, errors: { machine_comparison: 'query timed out' } })
+          }
+        }
+      }
+    })
+
+    await vi.waitFor(() => {
+      expect(wrapper.text()).toContain('query timed out')
+    })
+    expect(fetchMachineComparison).not.toHaveBeenCalled()
+  })
+})
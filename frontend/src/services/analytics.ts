@@ -71,12 +71,15 @@ export async function fetchMachineDefectHeatmap(filters: Omit<AnalyticsFilters,
 }
 
 
-export async function fetchCycleTimeScatter(filters: AnalyticsFilters & { limit?: number } = {}) {
+export async function fetchCycleTimeScatter(
+  filters: AnalyticsFilters & { limit?: number; sampling?: 'stratified' | 'random' | 'tablesample' } = {}
+) {
   const params = new URLSearchParams();
   if (filters.machine_id) params.append('machine_id', filters.machine_id);
   if (filters.start_date) params.append('start_date', filters.start_date + 'T00:00:00');
   if (filters.end_date) params.append('end_date', filters.end_date + 'T23:59:59');
   if (filters.limit) params.append('limit', filters.limit.toString());
+  if (filters.sampling) params.append('sampling', filters.sampling);
 
   const query = params.toString() ? `?${params}` : '';
   const response = await axios.get(`${API_BASE_URL}/api/v1/analytics/cycle-time-scatter${query}`);
@@ -84,6 +87,23 @@ export async function fetchCycleTimeScatter(filters: AnalyticsFilters & { limit?
 }
 
 
+export async function fetchDashboard(
+  filters: AnalyticsFilters & { top_defects_limit?: number; scatter_limit?: number } = {}
+) {
+  const params = new URLSearchParams();
+  if (filters.machine_id) params.append('machine_id', filters.machine_id);
+  if (filters.start_date) params.append('start_date', filters.start_date + 'T00:00:00');
+  if (filters.end_date) params.append('end_date', filters.end_date + 'T23:59:59');
+  if (filters.interval) params.append('interval', filters.interval);
+  if (filters.top_defects_limit) params.append('top_defects_limit', filters.top_defects_limit.toString());
+  if (filters.scatter_limit) params.append('scatter_limit', filters.scatter_limit.toString());
+
+  const query = params.toString() ? `?${params}` : '';
+  const response = await axios.get(`${API_BASE_URL}/api/v1/analytics/dashboard${query}`);
+  return response.data;
+}
+
+
 export async function fetchProductDefects(productId: number) {
   const response = await axios.get(`${API_BASE_URL}/api/v1/analytics/product/${productId}/defects`);
   return response.data;
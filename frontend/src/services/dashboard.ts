@@ -0,0 +1,51 @@
+import { inject, onMounted, watch, type InjectionKey, type Ref } from 'vue';
+
+export type DashboardChart =
+  | 'defect_rate_trend'
+  | 'machine_defect_heatmap'
+  | 'top_defects'
+  | 'machine_comparison'
+  | 'defect_distribution'
+  | 'cycle_time_scatter';
+
+export interface DashboardState {
+  loading: Ref<boolean>;
+  error: Ref<string | null>;
+  // The /analytics/dashboard response; a chart whose query failed is null
+  // and named in `errors`.
+  response: Ref<(Record<DashboardChart, any> & { errors: Record<string, string> }) | null>;
+}
+
+export const dashboardKey: InjectionKey<DashboardState> = Symbol('dashboard');
+
+/**
+ * Feed a chart from the dashboard response when it is rendered inside the
+ * dashboard view, so the view makes one request for every chart. Returns
+ * false for a standalone chart, which fetches its own data.
+ */
+export function useDashboardChart(
+  chart: DashboardChart,
+  render: (data: any) => unknown,
+  loading: Ref<boolean>,
+  error: Ref<string | null>
+): boolean {
+  const dashboard = inject(dashboardKey, null);
+  if (!dashboard) return false;
+
+  onMounted(() => {
+    watch([dashboard.loading, dashboard.response], ([isLoading, response]) => {
+      if (isLoading) {
+        loading.value = true;
+        return;
+      }
+      const data = response?.[chart];
+      if (data == null) {
+        loading.value = false;
+        error.value = dashboard.error.value || response?.errors?.[chart] || 'Failed to load chart data';
+        return;
+      }
+      render(data);
+    }, { immediate: true });
+  });
+  return true;
+}
@@ -3,18 +3,22 @@ set -e
 
 # Check if URL provided
 if [ -z "$1" ]; then
-    echo "Usage: ./seed.sh <dataset-url>"
+    echo "Usage: ./seed.sh <dataset-url> [replace|append|swap]"
     echo ""
     echo "Example:"
     echo "  ./seed.sh https://static.krevera.com/dataset.json"
+    echo "  ./seed.sh https://static.krevera.com/daily.json append"
+    echo "  ./seed.sh https://static.krevera.com/dataset.json swap"
     exit 1
 fi
 
 DATASET_URL=$1
+MODE=${2:-replace}
 
 echo "🌱 Seeding database with dataset from:"
 echo "   $DATASET_URL"
+echo "   (mode: $MODE)"
 echo ""
 
 # Run seed command
-docker-compose exec backend python seed_cli.py --url "$DATASET_URL"
+docker-compose exec backend python seed_cli.py --url "$DATASET_URL" --mode "$MODE"